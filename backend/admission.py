@@ -0,0 +1,248 @@
+"""
+Admission control for LLM-backed endpoints.
+
+All LLM routes share one concurrency budget (LLM_MAX_CONCURRENCY, roughly what the OpenAI
+account sustains) and each route also has its own cap, bounded wait queue and deadline.
+Waiters are served by priority class, then arrival, across routes, so an urgent chat turn
+overtakes a queued report regeneration.
+
+A request is refused up front instead of piling up in the event loop:
+    429  the route's queue is full of equal/higher-priority work
+    503  the estimated wait already exceeds the deadline, the deadline expired while
+         queued, or a higher-priority request took the queue slot (preempted)
+    504  admitted but the work itself overran the deadline (cancelled, stops token spend)
+Every refusal carries Retry-After, estimated from the route's recent service time.
+
+Config (per route, e.g. CHAT): ADMISSION_<ROUTE>_CONCURRENCY, ADMISSION_<ROUTE>_QUEUE,
+ADMISSION_<ROUTE>_DEADLINE (seconds).
+"""
+import os
+import math
+import time
+import heapq
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+
+import metrics
+
+# Priority classes (lower is served first)
+URGENT, INTERACTIVE, BACKGROUND = 0, 1, 2
+PRIORITY_NAMES = {URGENT: "urgent", INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "12"))
+EWMA_ALPHA = 0.2
+
+
+class RoutePolicy:
+    __slots__ = ("concurrency", "queue", "deadline")
+
+    def __init__(self, route, concurrency, queue, deadline):
+        prefix = f"ADMISSION_{route.upper()}_"
+        self.concurrency = int(os.getenv(prefix + "CONCURRENCY", concurrency))
+        self.queue = int(os.getenv(prefix + "QUEUE", queue))
+        self.deadline = float(os.getenv(prefix + "DEADLINE", deadline))
+
+
+POLICIES = {
+    "chat": RoutePolicy("chat", 8, 32, 45),
+    "complaint_analyze": RoutePolicy("complaint_analyze", 4, 16, 45),
+    "analyze_region": RoutePolicy("analyze_region", 2, 4, 90),
+    "insight": RoutePolicy("insight", 1, 2, 60),
+    "report_batch": RoutePolicy("report_batch", 4, 64, 180),
+}
+
+
+class Overloaded(Exception):
+    def __init__(self, status_code: int, reason: str, retry_after: int, route: str):
+        super().__init__(f"{route}: {reason}")
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+        self.route = route
+
+
+class _Waiter:
+    __slots__ = ("route", "priority", "future", "granted")
+
+    def __init__(self, route, priority, future):
+        self.route = route
+        self.priority = priority
+        self.future = future
+        self.granted = False
+
+
+class AdmissionController:
+    """Lives on the event loop thread; no locking needed."""
+
+    def __init__(self, policies, max_concurrency):
+        self.policies = policies
+        self.max_concurrency = max_concurrency
+        self.in_flight = {route: 0 for route in policies}
+        self.waiting = {route: 0 for route in policies}
+        self.service_seconds = {route: policy.deadline / 6 for route, policy in policies.items()}
+        self.shed = {}  # (route, priority, reason) -> count
+        self._total_in_flight = 0
+        self._heap = []  # (priority, seq, waiter)
+        self._seq = itertools.count()
+
+    # --- Estimates ---
+
+    def retry_after(self, route) -> int:
+        policy = self.policies[route]
+        backlog = self.waiting[route] + self.in_flight[route] + 1
+        return max(1, math.ceil(self.service_seconds[route] * backlog / policy.concurrency))
+
+    def _estimated_wait(self, route, priority) -> float:
+        ahead = sum(1 for p, _, w in self._heap if w.route == route and p <= priority and not w.future.done())
+        return self.service_seconds[route] * (ahead + 1) / self.policies[route].concurrency
+
+    # --- Slots ---
+
+    def _has_slot(self, route) -> bool:
+        return (self._total_in_flight < self.max_concurrency
+                and self.in_flight[route] < self.policies[route].concurrency)
+
+    def _take_slot(self, route):
+        self.in_flight[route] += 1
+        self._total_in_flight += 1
+
+    def _release_slot(self, route):
+        self.in_flight[route] -= 1
+        self._total_in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """Grant free slots to the best waiters; waiters blocked by their own route cap stay queued."""
+        blocked = []
+        while self._heap and self._total_in_flight < self.max_concurrency:
+            entry = heapq.heappop(self._heap)
+            waiter = entry[2]
+            if waiter.future.done():  # timed out / cancelled / preempted
+                continue
+            if self.in_flight[waiter.route] >= self.policies[waiter.route].concurrency:
+                blocked.append(entry)
+                continue
+            self.waiting[waiter.route] -= 1
+            self._take_slot(waiter.route)
+            waiter.granted = True
+            waiter.future.set_result(None)
+        for entry in blocked:
+            heapq.heappush(self._heap, entry)
+
+    def _shed(self, route, priority, status_code, reason):
+        key = (route, PRIORITY_NAMES[priority], reason)
+        self.shed[key] = self.shed.get(key, 0) + 1
+        metrics.admission_shed.inc(1, *key)
+        return Overloaded(status_code, reason, self.retry_after(route), route)
+
+    def _preempt(self, route, priority) -> bool:
+        """Drop the newest lowest-priority waiter of `route` if it ranks below `priority`."""
+        victim = None
+        for entry in self._heap:
+            waiter = entry[2]
+            if waiter.route != route or waiter.future.done() or entry[0] <= priority:
+                continue
+            if victim is None or entry[:2] > victim[:2]:
+                victim = entry
+        if victim is None:
+            return False
+        waiter = victim[2]
+        self.waiting[route] -= 1
+        waiter.future.set_exception(self._shed(route, waiter.priority, 503, "preempted"))
+        return True
+
+    async def acquire(self, route, priority, deadline) -> float:
+        """Wait for a slot until `deadline` (monotonic). Returns seconds spent queued."""
+        start = time.monotonic()
+        if self._has_slot(route) and not self.waiting[route]:
+            self._take_slot(route)
+            return 0.0
+        if start + self._estimated_wait(route, priority) > deadline:
+            raise self._shed(route, priority, 503, "deadline")
+        if self.waiting[route] >= self.policies[route].queue and not self._preempt(route, priority):
+            raise self._shed(route, priority, 429, "queue_full")
+
+        waiter = _Waiter(route, priority, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._heap, (priority, next(self._seq), waiter))
+        self.waiting[route] += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), deadline - start)
+        except asyncio.TimeoutError:
+            if not waiter.granted:
+                self.waiting[route] -= 1
+                waiter.future.cancel()
+                raise self._shed(route, priority, 503, "deadline")
+        except asyncio.CancelledError:  # client went away while queued
+            if waiter.granted:
+                self._release_slot(route)
+            else:
+                self.waiting[route] -= 1
+                waiter.future.cancel()
+            raise
+        # a grant racing the timeout still counts as admitted
+        return time.monotonic() - start
+
+    def release(self, route, seconds: float):
+        self.service_seconds[route] += EWMA_ALPHA * (seconds - self.service_seconds[route])
+        self._release_slot(route)
+
+    @asynccontextmanager
+    async def slot(self, route: str, priority: int = INTERACTIVE):
+        """`async with controller.slot("chat", URGENT): ...` - raises Overloaded when refused."""
+        deadline = time.monotonic() + self.policies[route].deadline
+        queued = await self.acquire(route, priority, deadline)
+        metrics.admission_wait.observe(queued, route, PRIORITY_NAMES[priority])
+        start = time.monotonic()
+        timeout = asyncio.timeout(deadline - start)
+        try:
+            async with timeout:
+                yield
+        except TimeoutError:
+            if timeout.expired():
+                raise self._shed(route, priority, 504, "deadline_exceeded")
+            raise
+        finally:
+            self.release(route, time.monotonic() - start)
+
+    def snapshot(self):
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self._total_in_flight,
+            "routes": {
+                route: {
+                    "in_flight": self.in_flight[route],
+                    "queued": self.waiting[route],
+                    "concurrency": policy.concurrency,
+                    "queue_limit": policy.queue,
+                    "deadline_seconds": policy.deadline,
+                    "service_seconds": round(self.service_seconds[route], 3),
+                    "retry_after": self.retry_after(route),
+                }
+                for route, policy in self.policies.items()
+            },
+            "shed": {
+                f"{route}/{priority}/{reason}": count
+                for (route, priority, reason), count in sorted(self.shed.items())
+            },
+        }
+
+
+controller = AdmissionController(POLICIES, LLM_MAX_CONCURRENCY)
+slot = controller.slot
+
+metrics.registry.register(metrics.Gauge(
+    "admission_queue_depth", "Requests waiting for an LLM slot.",
+    lambda: dict(((route,), n) for route, n in controller.waiting.items()), ("route",)))
+metrics.registry.register(metrics.Gauge(
+    "admission_in_flight", "Admitted LLM-backed requests in progress.",
+    lambda: dict(((route,), n) for route, n in controller.in_flight.items()), ("route",)))
+
+
+def chat_priority(message: str, has_image: bool) -> int:
+    """Photos and high-urgency wording (싱크홀, 화재, 부상 ...) are likely hazard reports."""
+    from agents.classifier import HIGH_URGENCY_RULE
+
+    if has_image or HIGH_URGENCY_RULE.search(message or ""):
+        return URGENT
+    return INTERACTIVE
@@ -0,0 +1,240 @@
+"""
+SQLite checkpointer for the region analysis graph.
+
+The graph saves a checkpoint after every step (and the outputs of nodes that finished in a
+step that did not), so a run whose `report` node failed or timed out resumes from there
+instead of paying for `analyze` again. Checkpoints live in complaints.db
+(analysis_checkpoints / analysis_checkpoint_writes, see models.py), keyed by run id
+(LangGraph's thread_id), so a resume can happen on another worker or after a restart.
+
+Same storage layout as LangGraph's own SqliteSaver (whole serialized checkpoint per row),
+written through the app's SQLAlchemy engine instead of a second sqlite3 connection.
+Runs older than ANALYSIS_CHECKPOINT_TTL seconds are pruned (at most hourly).
+
+    python -m agents.analysis_checkpoints prune [--older-than 604800]
+    python -m agents.analysis_checkpoints list [--limit 20]
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects.sqlite import insert
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+
+from models import AnalysisCheckpoint, AnalysisCheckpointWrite
+
+logger = logging.getLogger(__name__)
+
+TTL_SECONDS = float(os.getenv("ANALYSIS_CHECKPOINT_TTL", str(7 * 24 * 3600)))
+PRUNE_INTERVAL_SECONDS = 3600
+
+
+def _checkpoint_columns():
+    c = AnalysisCheckpoint
+    return select(c.thread_id, c.checkpoint_ns, c.checkpoint_id, c.parent_checkpoint_id, c.type, c.checkpoint, c.meta.label("meta"))
+
+
+def _run_config(thread_id, checkpoint_ns, checkpoint_id):
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}}
+
+
+class SqliteCheckpointSaver(BaseCheckpointSaver):
+    def __init__(self, bind=None, serde=None):
+        super().__init__(serde=serde)
+        if bind is None:
+            from database import engine as bind
+        self.bind = bind
+        self._pruned_at = 0.0
+
+    # --- Reading ---
+    def _tuple(self, conn, row):
+        writes = conn.execute(
+            select(AnalysisCheckpointWrite.task_id, AnalysisCheckpointWrite.channel, AnalysisCheckpointWrite.type,
+                   AnalysisCheckpointWrite.value, AnalysisCheckpointWrite.task_path, AnalysisCheckpointWrite.idx)
+            .where(AnalysisCheckpointWrite.thread_id == row.thread_id,
+                   AnalysisCheckpointWrite.checkpoint_ns == row.checkpoint_ns,
+                   AnalysisCheckpointWrite.checkpoint_id == row.checkpoint_id)
+        ).all()
+        writes = sorted(writes, key=lambda w: writes_sort_key(w.task_path, w.task_id, w.idx))
+        return CheckpointTuple(
+            config=_run_config(row.thread_id, row.checkpoint_ns, row.checkpoint_id),
+            checkpoint=self.serde.loads_typed((row.type, row.checkpoint)),
+            metadata=json.loads(row.meta) if row.meta else {},
+            parent_config=(_run_config(row.thread_id, row.checkpoint_ns, row.parent_checkpoint_id)
+                           if row.parent_checkpoint_id else None),
+            pending_writes=[(task_id, channel, self.serde.loads_typed((type_, value))) for task_id, channel, type_, value, _, _ in writes],
+        )
+
+    def get_tuple(self, config):
+        configurable = config["configurable"]
+        query = _checkpoint_columns().where(
+            AnalysisCheckpoint.thread_id == configurable["thread_id"],
+            AnalysisCheckpoint.checkpoint_ns == configurable.get("checkpoint_ns", ""),
+        )
+        checkpoint_id = get_checkpoint_id(config)
+        if checkpoint_id:
+            query = query.where(AnalysisCheckpoint.checkpoint_id == checkpoint_id)
+        else:
+            query = query.order_by(AnalysisCheckpoint.checkpoint_id.desc()).limit(1)
+        with self.bind.connect() as conn:
+            row = conn.execute(query).first()
+            return self._tuple(conn, row) if row else None
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        query = _checkpoint_columns().order_by(AnalysisCheckpoint.checkpoint_id.desc())
+        if config:
+            configurable = config["configurable"]
+            query = query.where(AnalysisCheckpoint.thread_id == configurable["thread_id"])
+            if configurable.get("checkpoint_ns") is not None:
+                query = query.where(AnalysisCheckpoint.checkpoint_ns == configurable["checkpoint_ns"])
+            if get_checkpoint_id(config):
+                query = query.where(AnalysisCheckpoint.checkpoint_id == get_checkpoint_id(config))
+        if before and get_checkpoint_id(before):
+            query = query.where(AnalysisCheckpoint.checkpoint_id < get_checkpoint_id(before))
+        with self.bind.connect() as conn:
+            rows = conn.execute(query).all()
+            for row in rows:
+                item = self._tuple(conn, row)
+                if filter and not all(item.metadata.get(k) == v for k, v in filter.items()):
+                    continue
+                if limit is not None:
+                    if limit <= 0:
+                        return
+                    limit -= 1
+                yield item
+
+    # --- Writing ---
+    def put(self, config, checkpoint, metadata, new_versions):
+        configurable = config["configurable"]
+        thread_id, checkpoint_ns = configurable["thread_id"], configurable.get("checkpoint_ns", "")
+        type_, serialized = self.serde.dumps_typed(checkpoint)
+        serialized_meta = json.dumps(get_checkpoint_metadata(config, metadata), ensure_ascii=False, default=str)
+        with self.bind.begin() as conn:
+            conn.execute(insert(AnalysisCheckpoint).values(
+                thread_id=thread_id, checkpoint_ns=checkpoint_ns, checkpoint_id=checkpoint["id"],
+                parent_checkpoint_id=configurable.get("checkpoint_id"), type=type_,
+                checkpoint=serialized, meta=serialized_meta,
+            ).prefix_with("OR REPLACE"))
+        self.maybe_prune()
+        return _run_config(thread_id, checkpoint_ns, checkpoint["id"])
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        configurable = config["configurable"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, serialized = self.serde.dumps_typed(value)
+            rows.append({
+                "thread_id": configurable["thread_id"], "checkpoint_ns": configurable.get("checkpoint_ns", ""),
+                "checkpoint_id": configurable["checkpoint_id"], "task_id": task_id,
+                "idx": WRITES_IDX_MAP.get(channel, idx), "channel": channel, "type": type_,
+                "value": serialized, "task_path": task_path,
+            })
+        if not rows:
+            return
+        # Special writes (errors, interrupts) replace earlier ones; regular writes are written once
+        stmt = insert(AnalysisCheckpointWrite)
+        if all(channel in WRITES_IDX_MAP for channel, _ in writes):
+            stmt = stmt.prefix_with("OR REPLACE")
+        else:
+            stmt = stmt.on_conflict_do_nothing()
+        with self.bind.begin() as conn:
+            conn.execute(stmt, rows)
+
+    def delete_thread(self, thread_id):
+        with self.bind.begin() as conn:
+            conn.execute(delete(AnalysisCheckpoint).where(AnalysisCheckpoint.thread_id == thread_id))
+            conn.execute(delete(AnalysisCheckpointWrite).where(AnalysisCheckpointWrite.thread_id == thread_id))
+
+    # Async API: SQLite calls are short, run them off the event loop thread
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id):
+        return await asyncio.to_thread(self.delete_thread, thread_id)
+
+    # --- Retention ---
+    def prune(self, older_than: float = TTL_SECONDS):
+        """Delete runs whose latest checkpoint is older than `older_than` seconds. Returns the run count."""
+        cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=older_than)
+        with self.bind.begin() as conn:
+            stale = select(AnalysisCheckpoint.thread_id).group_by(AnalysisCheckpoint.thread_id).having(
+                func.max(AnalysisCheckpoint.created_at) < cutoff)
+            threads = [row[0] for row in conn.execute(stale)]
+            for i in range(0, len(threads), 500):
+                chunk = threads[i:i + 500]
+                conn.execute(delete(AnalysisCheckpoint).where(AnalysisCheckpoint.thread_id.in_(chunk)))
+                conn.execute(delete(AnalysisCheckpointWrite).where(AnalysisCheckpointWrite.thread_id.in_(chunk)))
+        if threads:
+            logger.info(f"Pruned checkpoints of {len(threads)} analysis runs")
+        return len(threads)
+
+    def maybe_prune(self):
+        if time.monotonic() - self._pruned_at < PRUNE_INTERVAL_SECONDS:
+            return
+        self._pruned_at = time.monotonic()
+        try:
+            self.prune()
+        except Exception as e:
+            logger.error(f"Checkpoint pruning failed: {e}")
+
+
+# Singleton Instance
+checkpointer = None
+_checkpointer_lock = threading.Lock()
+def get_checkpointer():
+    global checkpointer
+    with _checkpointer_lock:
+        if checkpointer is None:
+            checkpointer = SqliteCheckpointSaver()
+    return checkpointer
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Region analysis checkpoints")
+    sub = parser.add_subparsers(dest="command", required=True)
+    prune = sub.add_parser("prune", help="delete old runs")
+    prune.add_argument("--older-than", type=float, default=TTL_SECONDS, help="seconds")
+    runs = sub.add_parser("list", help="latest runs")
+    runs.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    from database import engine, migrate_schema
+    migrate_schema()
+
+    saver = SqliteCheckpointSaver(engine)
+    if args.command == "prune":
+        print(f"Pruned {saver.prune(args.older_than)} runs")
+    else:
+        with engine.connect() as conn:
+            rows = conn.execute(
+                select(AnalysisCheckpoint.thread_id, func.count(), func.max(AnalysisCheckpoint.created_at))
+                .group_by(AnalysisCheckpoint.thread_id).order_by(func.max(AnalysisCheckpoint.created_at).desc())
+                .limit(args.limit)
+            ).all()
+        for thread_id, count, last in rows:
+            print(f"{thread_id}  {count:>3} checkpoints  last {last}")
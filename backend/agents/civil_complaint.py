@@ -1,12 +1,23 @@
 from agents.openai_service import get_openai_service
+from agents.manual_index import get_manual_search_engine
+from agents.gazetteer import get_gazetteer
+from agents.triage import get_triage_queues
+from agents.image_cache import describe_photo, get_image_cache
 import json
+import re
+import time
 import logging
 import uuid
+from tracing import span, set_llm_usage, KIND_CLIENT
+import sharding
 from models import MockComplaint
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+_PHOTO_ID_RE = re.compile(r"사진 ID: ([0-9a-f]{16})")
+_COORDS_RE = re.compile(r"\d{2}\.\d+\s*,\s*\d{3}\.\d+")  # "현재 위치 전송: 35.xxx, 129.xxx"
+
 class CivilComplaintAgent:
     def __init__(self):
         self.service = get_openai_service()
@@ -102,14 +113,25 @@ class CivilComplaintAgent:
 
     # Tool Implementations (Mock/Stub for now)
     def get_location_info(self, query):
-        # In real app: Call Kakao Map API or Nominatim
-        return f"부산광역시 행정동 정보 ({query})"
+        # Offline gazetteer lookup (no external map API)
+        hit = get_gazetteer().forward(query or "")
+        if not hit or not hit.get("district"):
+            return f"'{query}'에 해당하는 부산광역시 행정구역을 찾지 못했습니다. 구/동 또는 도로명 주소를 다시 확인해 주세요."
+        area = f"부산광역시 {hit['district']}" + (f" {hit['dong']}" if hit.get("dong") else "")
+        return f"{area} (위도 {hit['lat']:.5f}, 경도 {hit['lng']:.5f}), 관할: {hit['district']}청"
 
     def search_admin_manual(self, keywords):
-        # In real app: RAG lookup from ChromaDB
-        return "관련 규정에 따르면 도로 파손 신고 시 24시간 내 현장 확인이 원칙입니다."
+        # In-process BM25 lookup over data/manuals (see agents/manual_index.py)
+        try:
+            hits = get_manual_search_engine().search(keywords or "", top_k=3)
+        except Exception as e:
+            logger.error(f"Manual Search Error: {e}")
+            hits = []
+        if not hits:
+            return "관련 행정 매뉴얼 항목을 찾지 못했습니다."
+        return "\n\n".join(f"[{h['title']}]\n{h['text']}" for h in hits)
 
-    def save_complaint_to_db(self, args, db=None):
+    def save_complaint_to_db(self, args, db=None, photo_id=None):
         if not db:
             return json.dumps({"status": "error", "message": "Database connection failed internally."})
         
@@ -126,15 +148,15 @@ class CivilComplaintAgent:
             summary = args.get("summary") or args.get("issue") or "내용 없음"
             
             # Create/Map fields
-            # Mock Coordinates if missing (For Demo Visualization)
+            # Geocode the address when the model gave no coordinates; leave unplaced rather than guess
             lat = args.get("lat")
             lng = args.get("lng")
             if not lat or not lng:
-                import random
-                # Busan Center roughly 35.179, 129.075
-                # Random offset to scatter them
-                lat = 35.179 + random.uniform(-0.02, 0.02)
-                lng = 129.075 + random.uniform(-0.02, 0.02)
+                hit = get_gazetteer().forward(args.get("location") or "")
+                lat, lng = (hit["lat"], hit["lng"]) if hit else (None, None)
+                district = hit["district"] if hit else None
+            else:
+                district = get_gazetteer().district_of(lat, lng)
 
             complaint = MockComplaint(
                 id=c_id,
@@ -145,6 +167,7 @@ class CivilComplaintAgent:
                 location=args.get("location"),
                 lat=lat,
                 lng=lng,
+                district=district,
                 category=args.get("category"),
                 
                 urgency_score=args.get("urgency_score", 5),
@@ -157,13 +180,38 @@ class CivilComplaintAgent:
                 required_personnel=args.get("required_personnel"),
                 legal_risk=args.get("legal_risk", "Low"),
                 probability_of_escalation=args.get("probability_of_escalation", 0),
-                department_in_charge=args.get("department_in_charge", "민원팀")
+                department_in_charge=args.get("department_in_charge", "민원팀"),
+
+                # Photo sent in this conversation; same photo as an earlier complaint -> linked
+                image_hash=photo_id,
+                duplicate_of=get_image_cache().linked_complaint(photo_id) if photo_id else None,
             )
             
-            db.add(complaint)
-            db.commit()
-            
-            return json.dumps({"status": "success", "message": f"민원(ID: {c_id})이 정상적으로 접수되었습니다."})
+            if sharding.ENABLED:
+                # Routed to the district's shard; upsert reads the attributes before the session closes
+                with sharding.district_session(district) as shard_db:
+                    shard_db.add(complaint)
+                    with span("db.commit", KIND_CLIENT, **{"db.system": "sqlite", "db.shard": sharding.get_shards().name_for(district)}):
+                        shard_db.commit()
+                    shard_db.refresh(complaint)
+                    get_triage_queues().upsert(complaint)
+                sharding.get_shards().remember(c_id, sharding.get_shards().name_for(district))
+            else:
+                db.add(complaint)
+                with span("db.commit", KIND_CLIENT, **{"db.system": "sqlite"}):
+                    db.commit()
+
+                get_triage_queues().upsert(complaint)
+
+            if photo_id:
+                get_image_cache().link(photo_id, c_id)
+
+            # The map word cloud picks the complaint up from the change log (agents/word_cloud.py WordCloudWorker)
+
+            message = f"민원(ID: {c_id})이 정상적으로 접수되었습니다."
+            if complaint.duplicate_of:
+                message += f" 같은 사진으로 접수된 기존 민원(ID: {complaint.duplicate_of})과 연결되었습니다."
+            return json.dumps({"status": "success", "message": message})
         except Exception as e:
             import traceback
             logger.error(f"DB Save Error: {traceback.format_exc()}")
@@ -173,6 +221,14 @@ class CivilComplaintAgent:
         """
         Generate a comprehensive AI report for a specific complaint.
         """
+        try:
+            report, _ = await self.write_report(complaint_data)
+            return report
+        except Exception as e:
+            return f"리포트 생성 실패: {str(e)}"
+
+    async def write_report(self, complaint_data: dict):
+        """generate_report without the error fallback: returns (report, model), raises on failure."""
         prompt = f"""
         당신은 부산광역시 민원 분석 전문가입니다. 아래 민원 데이터에 대한 종합 분석 리포트를 작성해주세요.
 
@@ -192,19 +248,81 @@ class CivilComplaintAgent:
         전문적인 공공기관 보고서 말투로 작성해주세요.
         """
         
+        messages = [
+            {"role": "system", "content": "You are a helpful AI assistant for city administration."},
+            {"role": "user", "content": prompt}
+        ]
+        router = self.service.router
+        model = router.choose("complaint_report", messages)
+        start = time.perf_counter()
         try:
-            response = await self.service.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are a helpful AI assistant for city administration."},
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            return response.choices[0].message.content
+            with span("openai.chat.completions", KIND_CLIENT, **{"llm.model": model, "llm.agent": "complaint_report"}) as llm_span:
+                response = await self.service.client.chat.completions.create(model=model, messages=messages)
+                set_llm_usage(llm_span, response.usage)
+            router.record("complaint_report", model, time.perf_counter() - start, response.usage)
+            return response.choices[0].message.content, model
+        except Exception:
+            router.record("complaint_report", model, time.perf_counter() - start, error=True)
+            raise
+
+    async def _describe_photo(self, image_data, db):
+        """Text note on the photo (cached vision analysis + earlier complaint with the same photo), or None."""
+        if self.service.mock_mode:
+            return None
+        try:
+            with span("vision.describe_photo") as photo_span:
+                photo = await describe_photo(self.service, get_image_cache(), image_data)
+                if photo:
+                    photo_span.set_attribute("vision.cached", photo["cached"])
         except Exception as e:
-            return f"리포트 생성 실패: {str(e)}"
+            logger.error(f"Photo analysis failed, sending the image to the chat model: {e}")
+            return None
+        if photo is None:
+            return None
+        note = f"[첨부 사진 분석 | 사진 ID: {photo['photo_id']}] {photo['description']}"
+        if photo["severity"] is not None:
+            note += f" (시각적 심각도 {photo['severity']}/10)"
+        if photo["complaint_id"]:
+            with sharding.complaint_session(db, photo["complaint_id"]) as cdb:
+                earlier = cdb.get(MockComplaint, photo["complaint_id"])
+                if earlier is not None:
+                    note += (f"\n[동일 사진 기존 민원] ID {earlier.id}: {earlier.summary} (상태: {earlier.status}). "
+                             "같은 현장의 중복 신고일 수 있음을 안내해.")
+        return note
+
+    @staticmethod
+    def _photo_id(messages):
+        """Photo ID of the latest analysed photo in the conversation (see _describe_photo), or None."""
+        for message in reversed(messages):
+            content = message.get("content") if isinstance(message, dict) else None
+            match = _PHOTO_ID_RE.search(content) if isinstance(content, str) else None
+            if match:
+                return match.group(1)
+        return None
+
+    @staticmethod
+    def _ready_to_file(messages):
+        """
+        Whether the conversation has what the save condition needs: a place (gazetteer match or
+        sent coordinates) and context beyond the opening message. From then on a turn may file.
+        """
+        said = []
+        for message in messages:
+            if not isinstance(message, dict) or message.get("role") != "user":
+                continue
+            content = message.get("content")
+            parts = content if isinstance(content, list) else [{"type": "text", "text": content}]
+            said += [part.get("text") or "" for part in parts if part.get("type") == "text"]
+        if len(said) < 2:
+            return False
+        text = "\n".join(said)
+        return bool(_COORDS_RE.search(text) or (get_gazetteer().forward(text) or {}).get("district"))
 
     async def chat(self, user_message: str, history: list = [], db=None, image_data=None):
+        with span("civil_complaint.chat", **{"chat.history_length": len(history), "chat.has_image": bool(image_data)}):
+            return await self._chat(user_message, history=history, db=db, image_data=image_data)
+
+    async def _chat(self, user_message: str, history: list, db=None, image_data=None):
         # Build messages history
         logger.info(f"DEBUG: Chat History Length: {len(history)}")
         # print(f"DEBUG: Full History: {history}") # Uncomment for deep debug
@@ -212,8 +330,14 @@ class CivilComplaintAgent:
         messages = [{"role": "system", "content": self.system_prompt}]
         messages.extend(history)
         
+        # Photos are described once by the vision model (cached by perceptual hash) and the chat
+        # model gets the description; the note stays in history, so later turns remember it
+        photo_note = await self._describe_photo(image_data, db) if image_data else None
+        if photo_note:
+            user_message = f"{user_message or '이 사진의 문제를 분석해서 민원을 접수해줘.'}\n\n{photo_note}"
+            messages.append({"role": "user", "content": user_message})
         # Handle Image Input for Vision API
-        if image_data:
+        elif image_data:
             content_payload = [
                 {"type": "text", "text": user_message or "이 사진의 문제를 분석해서 민원을 접수해줘."},
                 {"type": "image_url", "image_url": {"url": image_data}}
@@ -227,8 +351,13 @@ class CivilComplaintAgent:
             messages.append({"role": "user", "content": user_message})
 
         try:
-            # Call OpenAI Service
-            response_msg = await self.service.get_chat_response(messages, tools=self.tools)
+            # Call OpenAI Service. While details are still being collected the turn goes to the
+            # fast tier; once the conversation could be filed it goes to the "save" tier up front,
+            # because the scores save_complaint_to_db writes (urgency, safety risk, ...) are what
+            # triage and the dashboard rank by. A fast-tier turn that files anyway is kept: its
+            # chat-time scores are re-scored by the scoring pipeline (scoring_model_version NULL).
+            stage = "save" if self._ready_to_file(messages) else "turn"
+            response_msg = await self.service.get_chat_response(messages, tools=self.tools, agent="civil_complaint", stage=stage)
             
             # Check for tool calls
             if response_msg.tool_calls:
@@ -241,14 +370,15 @@ class CivilComplaintAgent:
                     
                     logger.info(f"Executing Tool: {function_name} with args: {arguments}")
                     
-                    if function_name == "get_location_info":
-                        result = self.get_location_info(arguments.get("query"))
-                    elif function_name == "search_admin_manual":
-                        result = self.search_admin_manual(arguments.get("keywords"))
-                    elif function_name == "save_complaint_to_db":
-                        result = self.save_complaint_to_db(arguments, db=db)
-                    else:
-                        result = "Unknown Tool"
+                    with span(f"tool.{function_name}", **{"tool.name": function_name}):
+                        if function_name == "get_location_info":
+                            result = self.get_location_info(arguments.get("query"))
+                        elif function_name == "search_admin_manual":
+                            result = self.search_admin_manual(arguments.get("keywords"))
+                        elif function_name == "save_complaint_to_db":
+                            result = self.save_complaint_to_db(arguments, db=db, photo_id=self._photo_id(messages))
+                        else:
+                            result = "Unknown Tool"
                         
                     messages.append({
                         "tool_call_id": tool_call.id,
@@ -258,7 +388,7 @@ class CivilComplaintAgent:
                     })
                 
                 # Get final response after tool execution
-                final_response = await self.service.get_chat_response(messages)
+                final_response = await self.service.get_chat_response(messages, agent="civil_complaint", stage="after_tool")
                 
                 # Update history (User msg + Assistant Tool Call + Tool Result + Final Response)
                 history.append({"role": "user", "content": user_message}) # Note: Simplified history management
@@ -281,6 +411,6 @@ class CivilComplaintAgent:
             if "invalid_image_format" in str(error_msg) or "unsupported image" in str(error_msg) or "invalid_base64" in str(error_msg):
                  return "죄송합니다. 보내주신 사진 형식을 시스템에서 지원하지 않습니다 😅.\n**JPG, PNG, GIF** 파일로 다시 보내주시겠습니까?", history
 
-            with open("error.log", "w") as f:
+            with open("error.log", "a") as f:
                 f.write(error_msg)
             return "죄송합니다. 시스템에 일시적인 문제가 발생했습니다. 잠시 후 다시 시도해 주세요.", history
@@ -0,0 +1,347 @@
+import os
+import re
+import json
+import math
+import zlib
+import random
+import logging
+from pathlib import Path
+
+from agents.gazetteer import get_gazetteer
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+MODEL_PATH = Path(os.getenv("CLASSIFIER_MODEL_PATH", BASE_DIR / "data" / "classifier_model.json"))
+CONFIDENCE_THRESHOLD = float(os.getenv("CLASSIFIER_CONFIDENCE_THRESHOLD", "0.75"))
+
+HASH_DIM = 1 << 15
+
+# Label space of PerceptionAgent
+CATEGORIES = ["Traffic", "Road", "Environment", "Safety", "Other"]
+URGENCIES = ["High", "Medium", "Low"]
+
+# Stored (LLM-assigned, Korean) categories -> Perception categories
+CATEGORY_MAP = {
+    "교통": "Traffic", "도로": "Road", "환경": "Environment", "소음": "Environment",
+    "안전": "Safety", "시설": "Other",
+}
+
+# Mirrors the rules in PlannerAgent's system prompt
+DEPARTMENTS = {
+    "Road": "Road Maintenance",
+    "Traffic": "Traffic Administration",
+    "Environment": "Environment Safety",
+    "Safety": "Safety Management",
+    "Other": "General Affairs",
+}
+EMERGENCY_DEPARTMENT = "Emergency Response Team"
+ESTIMATED_TIME = {"High": "24 hours", "Medium": "72 hours", "Low": "7 days"}
+
+# --- Rules ---
+CATEGORY_RULES = [
+    ("Road", re.compile(r"포트홀|싱크홀|도로.{0,4}(구멍|파손|균열|꺼짐|침하)|보도블[록럭]|노면|아스팔트")),
+    ("Environment", re.compile(r"소음|시끄|폭죽|버스킹|확성기|쿵쿵|악취|냄새|쓰레기|투기|하수구|오염|매연")),
+    ("Traffic", re.compile(r"불법\s*(주차|주정차|유턴)|꼬리물기|신호등|교통\s*정체|주차|과속|역주행")),
+    ("Safety", re.compile(r"가로등|보안등|감전|추락|붕괴|낙하|유리\s*조각|위험해|CCTV|범죄")),
+]
+HIGH_URGENCY_RULE = re.compile(r"싱크홀|붕괴|감전|화재|가스\s*누출|침수|사고|다쳤|다칠|부상|쓰러|어린이|아이들")
+LOW_URGENCY_RULE = re.compile(r"미관|보기\s*흉|건의|제안|문의")
+STATUS_RULE = re.compile(r"(처리|진행|접수)\s*(상황|현황|결과|됐|되었)|민원\s*번호")
+QUESTION_RULE = re.compile(r"어떻게\s*(하나요|해야)|알려\s*주세요|궁금")
+
+RULE_CONFIDENCE = 0.9
+# No urgency signal and no urgency model: "Medium" is a default, and only High would change the
+# plan (emergency team), so its confidence is P(LLM did not say High | no HIGH_URGENCY_RULE match).
+# 16/20 on the seeded complaints; `python -m agents.classifier evaluate` re-measures it.
+DEFAULT_URGENCY_CONFIDENCE = float(os.getenv("CLASSIFIER_DEFAULT_URGENCY_CONFIDENCE", "0.8"))
+INQUIRY_CONFIDENCE = 0.8
+MIN_SUPPORT = 5  # below this many training rows, the model's vote on a label is ignored
+
+
+def _features(text: str):
+    """Hashed character 2/3-grams + words, L2-normalized: {bucket: value}."""
+    text = re.sub(r"\s+", " ", (text or "").lower())
+    counts = {}
+    for word in re.findall(r"[가-힣a-z0-9]+", text):
+        grams = [f"w:{word}"]
+        padded = f"^{word}$"
+        for n in (2, 3):
+            grams.extend(f"{n}:{padded[i:i + n]}" for i in range(len(padded) - n + 1))
+        for gram in grams:
+            bucket = zlib.crc32(gram.encode("utf-8")) % HASH_DIM
+            counts[bucket] = counts.get(bucket, 0.0) + 1.0
+    norm = math.sqrt(sum(v * v for v in counts.values())) or 1.0
+    return {k: v / norm for k, v in counts.items()}
+
+
+def _softmax(scores):
+    top = max(scores)
+    exps = [math.exp(s - top) for s in scores]
+    total = sum(exps)
+    return [e / total for e in exps]
+
+
+class HashedLinearModel:
+    """Multinomial logistic regression over hashed features, trained with plain SGD."""
+
+    def __init__(self, labels, weights=None, bias=None, support=None):
+        self.labels = list(labels)
+        self.weights = weights or [dict() for _ in self.labels]  # sparse: bucket -> weight
+        self.bias = bias or [0.0] * len(self.labels)
+        self.support = support or {label: 0 for label in self.labels}  # training rows per label
+
+    def predict_proba(self, feats):
+        scores = [
+            self.bias[k] + sum(self.weights[k].get(i, 0.0) * v for i, v in feats.items())
+            for k in range(len(self.labels))
+        ]
+        return _softmax(scores)
+
+    def predict(self, feats):
+        probs = self.predict_proba(feats)
+        best = max(range(len(probs)), key=probs.__getitem__)
+        return self.labels[best], probs[best]
+
+    def fit(self, samples, epochs=30, lr=0.5, l2=1e-4, seed=42):
+        """samples: [(feats, label)]"""
+        rng = random.Random(seed)
+        data = [(f, self.labels.index(y)) for f, y in samples if y in self.labels]
+        for _, k in data:
+            self.support[self.labels[k]] += 1
+        for _ in range(epochs):
+            rng.shuffle(data)
+            for feats, target in data:
+                probs = self.predict_proba(feats)
+                for k, p in enumerate(probs):
+                    grad = p - (1.0 if k == target else 0.0)
+                    if abs(grad) < 1e-6:
+                        continue
+                    w = self.weights[k]
+                    for i, v in feats.items():
+                        w[i] = w.get(i, 0.0) * (1 - lr * l2) - lr * grad * v
+                    self.bias[k] -= lr * grad
+        return self
+
+    def to_dict(self):
+        return {
+            "labels": self.labels,
+            "support": self.support,
+            "bias": self.bias,
+            "weights": [{str(i): round(w, 5) for i, w in ws.items() if abs(w) > 1e-5} for ws in self.weights],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        weights = [{int(i): w for i, w in ws.items()} for ws in data["weights"]]
+        return cls(data["labels"], weights, data["bias"], data.get("support"))
+
+
+def urgency_label(score):
+    if score is None:
+        return None
+    if score >= 8:
+        return "High"
+    if score >= 5:
+        return "Medium"
+    return "Low"
+
+
+class LocalClassifier:
+    """
+    Cheap first stage: keyword/regex rules + hashed-feature linear model.
+    Produces PerceptionAgent/PlannerAgent-shaped output with a confidence score.
+    """
+
+    def __init__(self, model_path: Path = MODEL_PATH):
+        self.category_model = None
+        self.urgency_model = None
+        if Path(model_path).exists():
+            with open(model_path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.category_model = HashedLinearModel.from_dict(data["category"])
+            self.urgency_model = HashedLinearModel.from_dict(data["urgency"])
+            logger.info(f"Local classifier loaded ({data.get('trained_on', 0)} training rows)")
+
+    def _category(self, text, feats):
+        hits = [cat for cat, rule in CATEGORY_RULES if rule.search(text)]
+        rule_cat = hits[0] if len(hits) == 1 else None
+        rule_conf = RULE_CONFIDENCE if rule_cat else 0.0
+
+        if self.category_model is None:
+            return (rule_cat or "Other"), rule_conf
+        if rule_cat and self.category_model.support.get(rule_cat, 0) < MIN_SUPPORT:
+            # The model never learned this label, so its disagreement carries no signal
+            return rule_cat, rule_conf
+
+        model_cat, model_p = self.category_model.predict(feats)
+        if rule_cat is None:
+            # Ambiguous rules (several categories fired) cap the model's confidence
+            return model_cat, (model_p * 0.6 if hits else model_p)
+        if rule_cat == model_cat:
+            return rule_cat, 1 - (1 - rule_conf) * (1 - model_p)
+        return rule_cat, rule_conf * (1 - model_p)
+
+    def _urgency(self, text, feats):
+        if HIGH_URGENCY_RULE.search(text):
+            return "High", RULE_CONFIDENCE
+        if self.urgency_model is not None:
+            label, p = self.urgency_model.predict(feats)
+            if LOW_URGENCY_RULE.search(text) and label == "Low":
+                p = max(p, RULE_CONFIDENCE)
+            return label, p
+        if LOW_URGENCY_RULE.search(text):
+            return "Low", RULE_CONFIDENCE
+        return "Medium", DEFAULT_URGENCY_CONFIDENCE
+
+    def _intent(self, text):
+        if STATUS_RULE.search(text):
+            return "status_check"
+        if QUESTION_RULE.search(text) and not any(rule.search(text) for _, rule in CATEGORY_RULES):
+            return "general_inquiry"
+        return "report_complaint"
+
+    def perceive(self, text: str):
+        feats = _features(text)
+        intent = self._intent(text)
+        if intent == "report_complaint":
+            category, cat_conf = self._category(text, feats)
+            urgency, urg_conf = self._urgency(text, feats)
+        else:
+            conf = RULE_CONFIDENCE if intent == "status_check" else INQUIRY_CONFIDENCE
+            category, cat_conf, urgency, urg_conf = "Other", conf, "Low", conf
+        location = get_gazetteer().forward(text)
+        area = None
+        if location and location.get("district"):
+            area = " ".join(part for part in (location["district"], location.get("dong")) if part)
+        summary = re.split(r"(?<=[.!?。])\s|\n", (text or "").strip())[0][:100]
+        return {
+            "intent": intent,
+            "category": category,
+            "location": area,
+            "urgency": urgency,
+            "summary": summary,
+            "confidence": round(min(cat_conf, urg_conf), 4),
+            "source": "local",
+        }
+
+    @staticmethod
+    def plan(perception: dict):
+        urgency = perception.get("urgency", "Medium")
+        department = EMERGENCY_DEPARTMENT if urgency == "High" else DEPARTMENTS.get(perception.get("category"), DEPARTMENTS["Other"])
+        return {
+            "department": department,
+            "steps": ["Review Request", "Dispatch Field Inspection", "Resolve and Notify Citizen"],
+            "estimated_time": ESTIMATED_TIME.get(urgency, "Unknown"),
+            "source": "local",
+        }
+
+
+class CascadeStats:
+    def __init__(self):
+        self.local = 0
+        self.llm = 0
+
+    def record(self, source):
+        if source == "local":
+            self.local += 1
+        else:
+            self.llm += 1
+
+    def snapshot(self):
+        total = self.local + self.llm
+        return {
+            "local": self.local,
+            "llm": self.llm,
+            "llm_avoidance_rate": round(self.local / total, 4) if total else None,
+            "threshold": CONFIDENCE_THRESHOLD,
+        }
+
+
+# Singleton Instances
+local_classifier = None
+cascade_stats = CascadeStats()
+def get_local_classifier():
+    global local_classifier
+    if local_classifier is None:
+        local_classifier = LocalClassifier()
+    return local_classifier
+
+
+# --- Training / Evaluation ---
+
+def _labelled_rows(db):
+    from models import MockComplaint
+    rows = []
+    for c in db.query(MockComplaint.summary, MockComplaint.original_text, MockComplaint.category, MockComplaint.urgency_score):
+        category = CATEGORY_MAP.get(c.category)
+        urgency = urgency_label(c.urgency_score)
+        if category and urgency:
+            rows.append((f"{c.summary or ''} {c.original_text or ''}", category, urgency))
+    return rows
+
+
+def train(rows, model_path: Path = MODEL_PATH):
+    samples = [(_features(text), cat, urg) for text, cat, urg in rows]
+    category_model = HashedLinearModel(CATEGORIES).fit([(f, c) for f, c, _ in samples])
+    urgency_model = HashedLinearModel(URGENCIES).fit([(f, u) for f, _, u in samples])
+    with open(model_path, "w", encoding="utf-8") as f:
+        json.dump({"trained_on": len(rows), "category": category_model.to_dict(), "urgency": urgency_model.to_dict()}, f)
+    return model_path
+
+
+def evaluate(classifier, rows, threshold: float = CONFIDENCE_THRESHOLD):
+    """
+    Compare local predictions with the stored LLM labels.
+    avoidance_rate: share of rows the cascade would answer locally.
+    accepted_accuracy: agreement with the LLM on exactly those rows (what the cascade ships).
+    default_urgency_calibration: share of rows without a high-urgency rule match that the LLM
+    did not rate High (what DEFAULT_URGENCY_CONFIDENCE should be).
+    """
+    accepted = correct_accepted = correct_all = 0
+    no_signal = [urgency for text, _, urgency in rows if not HIGH_URGENCY_RULE.search(text)]
+    for text, category, urgency in rows:
+        pred = classifier.perceive(text)
+        hit = pred["category"] == category and pred["urgency"] == urgency
+        correct_all += hit
+        if pred["confidence"] >= threshold:
+            accepted += 1
+            correct_accepted += hit
+    n = len(rows)
+    return {
+        "held_out": n,
+        "threshold": threshold,
+        "llm_avoidance_rate": round(accepted / n, 4) if n else None,
+        "accepted_accuracy": round(correct_accepted / accepted, 4) if accepted else None,
+        "overall_accuracy": round(correct_all / n, 4) if n else None,
+        "default_urgency_calibration": round(sum(u != "High" for u in no_signal) / len(no_signal), 4) if no_signal else None,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Train/evaluate the local complaint classifier")
+    parser.add_argument("command", choices=["train", "evaluate"])
+    parser.add_argument("--holdout", type=float, default=0.2, help="fraction held out for evaluation")
+    parser.add_argument("--threshold", type=float, default=CONFIDENCE_THRESHOLD)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        rows = _labelled_rows(db)
+    finally:
+        db.close()
+
+    random.Random(0).shuffle(rows)
+    split = int(len(rows) * (1 - args.holdout))
+    if args.command == "train":
+        train(rows)
+        print(f"Trained on {len(rows)} rows -> {MODEL_PATH}")
+    else:
+        # Fit on the training split only, score the held-out split against the LLM labels
+        tmp_path = MODEL_PATH.with_suffix(".eval.json")
+        train(rows[:split], tmp_path)
+        print(json.dumps(evaluate(LocalClassifier(tmp_path), rows[split:], args.threshold), indent=2))
+        tmp_path.unlink()
@@ -0,0 +1,218 @@
+"""
+Append-only change log of mock_complaints, for incremental dashboard sync.
+
+Triggers write one complaint_changes row per insert, update and delete in the same
+transaction as the write itself, whichever code path (chat save, triage, scoring workers,
+scripts) makes it:
+
+    seq           monotonically increasing cursor (AUTOINCREMENT, never reused)
+    op            insert | update | delete   (truncated = compaction floor marker)
+    complaint_id
+    fields        updates: {field: previous value} of the fields that changed (long text
+                  fields map to null); deletes: the previous category/status/position;
+                  inserts: NULL
+
+Readers start with since=0 (always a reset: full data plus a cursor), then pass the last
+cursor they saw and get the complaints changed after it, plus a new cursor. Dashboard deltas carry the *current* state of those complaints, so
+applying a delta twice (or one that is newer than its cursor) is harmless.
+
+Compaction keeps the log bounded: entries for the same complaint are folded into its latest
+one (previous values merged), then the oldest entries beyond CHANGE_LOG_MAX_ROWS are dropped
+and a `truncated` marker records the floor. A cursor below the floor, above the head (the
+table was rebuilt) or with more than MAX_DELTA changes behind it gets `reset`: refetch in
+full.
+
+    python -m agents.complaint_changes compact [--max-rows 100000]
+    python -m agents.complaint_changes tail [--since 0]
+"""
+import os
+import json
+import time
+import logging
+import threading
+from collections import defaultdict
+
+from sqlalchemy import text
+
+from models import MockComplaint
+
+logger = logging.getLogger(__name__)
+
+CHANGE_LOG_MAX_ROWS = int(os.getenv("CHANGE_LOG_MAX_ROWS", "100000"))
+COMPACT_INTERVAL_SECONDS = float(os.getenv("CHANGE_LOG_COMPACT_INTERVAL", "600"))
+MAX_DELTA = 5000  # more changes than this behind a cursor: reset instead of a delta
+TRUNCATED = "truncated"
+
+_CLOCK = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+_UNTRACKED = {"id", "updated_at"}  # updated_at: legacy snapshot bookkeeping (models.py)
+_VALUELESS = {"summary", "original_text", "location"}  # flagged as changed, old value not kept
+_DELETE_FIELDS = ("category", "status", "district", "lat", "lng", "safety_risk_score")
+_TRIGGERS = ("complaint_changes_ai", "complaint_changes_au", "complaint_changes_ad")
+
+
+def _trigger_ddl():
+    tracked = [c.name for c in MockComplaint.__table__.columns if c.name not in _UNTRACKED]
+    changed = " OR ".join(f"old.{c} IS NOT new.{c}" for c in tracked)
+    previous = " UNION ALL ".join(
+        f"SELECT '{c}' AS k, {'NULL' if c in _VALUELESS else f'old.{c}'} AS v WHERE old.{c} IS NOT new.{c}"
+        for c in tracked
+    )
+    deleted = ", ".join(f"'{c}', old.{c}" for c in _DELETE_FIELDS)
+    insert = "INSERT INTO complaint_changes (op, complaint_id, fields, changed_at) VALUES"
+    return [
+        f"""CREATE TRIGGER complaint_changes_ai AFTER INSERT ON mock_complaints BEGIN
+            {insert} ('insert', new.id, NULL, {_CLOCK});
+        END""",
+        f"""CREATE TRIGGER complaint_changes_au AFTER UPDATE ON mock_complaints WHEN {changed} BEGIN
+            {insert} ('update', new.id, (SELECT json_group_object(k, v) FROM ({previous})), {_CLOCK});
+        END""",
+        f"""CREATE TRIGGER complaint_changes_ad AFTER DELETE ON mock_complaints BEGIN
+            {insert} ('delete', old.id, json_object({deleted}), {_CLOCK});
+        END""",
+    ]
+
+
+def ensure_change_log(bind):
+    """(Re)create the change-log triggers; the update trigger lists the columns, so it follows schema changes."""
+    with bind.begin() as conn:
+        for name in _TRIGGERS:
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        for statement in _trigger_ddl():
+            conn.execute(text(statement))
+
+
+# --- Reading ---
+
+def current_cursor(db) -> int:
+    return db.execute(text("SELECT COALESCE(MAX(seq), 0) FROM complaint_changes")).scalar()
+
+
+def changes_since(db, since: int):
+    """
+    {"cursor", "reset", "changed": [ids still present], "deleted": [ids], "previous": {id: {field: old value}}}
+    for everything logged after `since`. The cursor is read first, so state fetched afterwards
+    is at least as new as it.
+    """
+    maybe_compact(db.get_bind())
+    head = current_cursor(db)
+    floor = db.execute(text("SELECT MAX(seq) FROM complaint_changes WHERE op = :op"), {"op": TRUNCATED}).scalar()
+    result = {"cursor": head, "reset": False, "changed": [], "deleted": [], "previous": {}}
+    if since <= 0 or since > head or (floor is not None and since < floor):
+        result["reset"] = True
+        return result
+
+    rows = db.execute(text(
+        "SELECT seq, op, complaint_id, fields FROM complaint_changes WHERE seq > :since AND seq <= :head "
+        "AND op != :op ORDER BY seq LIMIT :limit"
+    ), {"since": since, "head": head, "op": TRUNCATED, "limit": MAX_DELTA + 1}).all()
+    if len(rows) > MAX_DELTA:
+        result["reset"] = True
+        return result
+
+    last_op = {}
+    previous = defaultdict(dict)
+    for seq, op, complaint_id, fields in rows:
+        last_op[complaint_id] = op
+        for field, value in (json.loads(fields) if fields else {}).items():
+            previous[complaint_id].setdefault(field, value)  # the value before `since` wins
+    result["changed"] = [cid for cid, op in last_op.items() if op != "delete"]
+    result["deleted"] = [cid for cid, op in last_op.items() if op == "delete"]
+    result["previous"] = dict(previous)
+    return result
+
+
+def fetch_changed(db, ids, columns):
+    """Current id + `columns` of the changed complaints (columns may be SQL expressions with AS)."""
+    rows = []
+    for i in range(0, len(ids), 500):
+        params = {f"i{j}": cid for j, cid in enumerate(ids[i:i + 500])}
+        placeholders = ", ".join(f":i{j}" for j in range(len(params)))
+        rows.extend(db.execute(text(
+            f"SELECT id, {', '.join(columns)} FROM mock_complaints WHERE id IN ({placeholders})"
+        ), params).mappings())
+    return rows
+
+
+# --- Compaction ---
+
+def compact_change_log(bind, max_rows: int = CHANGE_LOG_MAX_ROWS):
+    """Fold per-complaint entries into the latest one, then cap the log at max_rows. Returns counts."""
+    folded = truncated = 0
+    with bind.begin() as conn:
+        duplicated = [row[0] for row in conn.execute(text(
+            "SELECT complaint_id FROM complaint_changes WHERE op != :op GROUP BY complaint_id HAVING COUNT(*) > 1"
+        ), {"op": TRUNCATED})]
+        for i in range(0, len(duplicated), 500):
+            entries = defaultdict(list)
+            params = {f"c{j}": cid for j, cid in enumerate(duplicated[i:i + 500])}
+            placeholders = ", ".join(f":c{j}" for j in range(len(params)))
+            for seq, complaint_id, op, fields in conn.execute(text(
+                f"SELECT seq, complaint_id, op, fields FROM complaint_changes WHERE op != :op "
+                f"AND complaint_id IN ({placeholders}) ORDER BY seq"
+            ), {"op": TRUNCATED, **params}):
+                entries[complaint_id].append((seq, op, fields))
+            for complaint_id, items in entries.items():
+                merged = {}
+                for _, op, fields in items:
+                    for field, value in (json.loads(fields) if fields else {}).items():
+                        merged.setdefault(field, value)
+                latest_seq, latest_op, _ = items[-1]
+                conn.execute(text("UPDATE complaint_changes SET fields = :fields WHERE seq = :seq"),
+                             {"fields": json.dumps(merged, ensure_ascii=False) if merged else None, "seq": latest_seq})
+                stale = [seq for seq, _, _ in items[:-1]]
+                conn.execute(text(f"DELETE FROM complaint_changes WHERE seq IN ({', '.join(map(str, stale))})"))
+                folded += len(stale)
+
+        total = conn.execute(text("SELECT COUNT(*) FROM complaint_changes")).scalar()
+        if total > max_rows:
+            floor = conn.execute(text("SELECT seq FROM complaint_changes ORDER BY seq LIMIT 1 OFFSET :n"),
+                                 {"n": total - max_rows}).scalar()
+            truncated = conn.execute(text("DELETE FROM complaint_changes WHERE seq < :floor"), {"floor": floor}).rowcount
+            conn.execute(text("UPDATE complaint_changes SET op = :op, complaint_id = NULL, fields = NULL WHERE seq = :floor"),
+                         {"op": TRUNCATED, "floor": floor})
+    if folded or truncated:
+        logger.info(f"Change log compacted: {folded} entries folded, {truncated} truncated")
+    return {"folded": folded, "truncated": truncated}
+
+
+_compact_lock = threading.Lock()
+_last_compaction = 0.0
+def maybe_compact(bind):
+    """Compact when the log has outgrown CHANGE_LOG_MAX_ROWS, at most every COMPACT_INTERVAL_SECONDS."""
+    global _last_compaction
+    if time.monotonic() - _last_compaction < COMPACT_INTERVAL_SECONDS or not _compact_lock.acquire(blocking=False):
+        return
+    try:
+        _last_compaction = time.monotonic()
+        with bind.connect() as conn:
+            total = conn.execute(text("SELECT COUNT(*) FROM complaint_changes")).scalar()
+        if total > CHANGE_LOG_MAX_ROWS:
+            compact_change_log(bind)
+    except Exception as e:
+        logger.error(f"Change log compaction failed: {e}")
+    finally:
+        _compact_lock.release()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Complaint change log")
+    sub = parser.add_subparsers(dest="command", required=True)
+    compact = sub.add_parser("compact", help="fold and truncate the log")
+    compact.add_argument("--max-rows", type=int, default=CHANGE_LOG_MAX_ROWS)
+    tail = sub.add_parser("tail", help="print changes after a cursor")
+    tail.add_argument("--since", type=int, default=0)
+    args = parser.parse_args()
+
+    from database import SessionLocal, engine, migrate_schema
+    migrate_schema()
+
+    if args.command == "compact":
+        print(compact_change_log(engine, args.max_rows))
+    else:
+        db = SessionLocal()
+        try:
+            print(json.dumps(changes_since(db, args.since), ensure_ascii=False, indent=2, default=str))
+        finally:
+            db.close()
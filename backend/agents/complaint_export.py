@@ -0,0 +1,256 @@
+"""
+Constant-memory complaint export (CSV / Parquet).
+
+Rows are read with `yield_per` (server-side iteration, CHUNK_SIZE rows at a time) and each
+chunk is encoded and handed out before the next is fetched: one CSV block or one Parquet row
+group per chunk. Memory therefore depends on CHUNK_SIZE, not on the table size. With district
+shards the per-shard streams are merged in (created_at, id) order.
+
+Parquet needs the optional `pyarrow` package; CSV has no extra dependency.
+
+CLI (nightly jobs):
+    python -m agents.complaint_export exports/complaints.parquet --since 2026-01-01 --columns id,summary,district
+"""
+import io
+import csv
+import heapq
+import logging
+from datetime import datetime
+
+from sqlalchemy import select
+
+import sharding
+from models import MockComplaint
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 10_000
+FORMATS = {"csv": "text/csv; charset=utf-8", "parquet": "application/vnd.apache.parquet"}
+EXPORT_COLUMNS = {column.name: column for column in MockComplaint.__table__.columns}
+DEFAULT_COLUMNS = [
+    "id", "created_at", "status", "category", "district", "location", "lat", "lng", "summary", "original_text",
+    "urgency_score", "safety_risk_score", "inconvenience_score", "visual_impact_score", "sentiment_score",
+    "probability_of_escalation", "estimated_cost", "legal_risk", "department_in_charge", "resolved_at",
+]
+
+
+def parse_columns(columns):
+    """Comma-separated string or list -> validated column names (default: DEFAULT_COLUMNS)."""
+    if not columns:
+        return list(DEFAULT_COLUMNS)
+    names = [c.strip() for c in columns.split(",")] if isinstance(columns, str) else list(columns)
+    unknown = [c for c in names if c not in EXPORT_COLUMNS]
+    if unknown:
+        raise ValueError(f"unknown columns: {', '.join(unknown)} (available: {', '.join(EXPORT_COLUMNS)})")
+    return names
+
+
+def filter_complaints(query, category=None, district=None, status=None,
+                      date_from: datetime = None, date_to: datetime = None, min_risk: int = None):
+    """Apply the export/batch filters to a select() over MockComplaint."""
+    if category:
+        query = query.where(MockComplaint.category == category)
+    if district:
+        query = query.where(MockComplaint.district == district)
+    if status:
+        query = query.where(MockComplaint.status == status)
+    if date_from:
+        query = query.where(MockComplaint.created_at >= date_from)
+    if date_to:
+        query = query.where(MockComplaint.created_at < date_to)
+    if min_risk is not None:
+        query = query.where(MockComplaint.safety_risk_score >= min_risk)
+    return query
+
+
+def build_query(columns, sort_keys: bool = False, **filters):
+    selected = [EXPORT_COLUMNS[c] for c in columns]
+    if sort_keys:  # for merging per-shard streams
+        selected += [MockComplaint.created_at.label("_created_at"), MockComplaint.id.label("_id")]
+    query = filter_complaints(select(*selected), **filters)
+    # created_at is indexed, so this streams in index order instead of sorting the table
+    return query.order_by(MockComplaint.created_at, MockComplaint.id)
+
+
+def iter_chunks(db, query, chunk_size: int = CHUNK_SIZE):
+    """Lists of row tuples, at most `chunk_size` rows each."""
+    result = db.execute(query.execution_options(yield_per=chunk_size))
+    for partition in result.partitions():
+        yield [tuple(row) for row in partition]
+
+
+def _sort_key(row):
+    # (created_at, id) appended by build_query(..., sort_keys=True); NULL created_at first, as in SQLite
+    created_at, complaint_id = row[-2], row[-1]
+    return created_at is not None, created_at or datetime.min, complaint_id
+
+
+def iter_merged_chunks(sessions, query, chunk_size: int = CHUNK_SIZE):
+    """iter_chunks over several databases at once, merged in (created_at, id) order; sort keys dropped."""
+    per_source = max(100, chunk_size // max(1, len(sessions)))  # memory stays ~chunk_size rows in total
+    streams = [(row for chunk in iter_chunks(db, query, per_source) for row in chunk) for db in sessions]
+    chunk = []
+    for row in heapq.merge(*streams, key=_sort_key):
+        chunk.append(row[:-2])
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# --- Encoders: chunks of rows -> chunks of bytes ---
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    return value
+
+
+def encode_csv(columns, chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in chunks:
+        writer.writerows([_csv_value(v) for v in row] for row in rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands out whatever ParquetWriter has written so far."""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def take(self):
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def _arrow_schema(columns):
+    import pyarrow as pa
+    from sqlalchemy import DateTime, Float, Integer
+
+    fields = []
+    for name in columns:
+        col_type = EXPORT_COLUMNS[name].type
+        if isinstance(col_type, Integer):
+            arrow_type = pa.int64()
+        elif isinstance(col_type, Float):
+            arrow_type = pa.float64()
+        elif isinstance(col_type, DateTime):
+            arrow_type = pa.timestamp("us")
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(name, arrow_type))
+    return pa.schema(fields)
+
+
+def _arrow_value(value):
+    # the schema uses naive timestamps (created_at is stored as naive local time)
+    return value.replace(tzinfo=None) if isinstance(value, datetime) else value
+
+
+def encode_parquet(columns, chunks):
+    """One row group per chunk; bytes are yielded as soon as each row group is written."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+
+    schema = _arrow_schema(columns)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        for rows in chunks:
+            arrays = [
+                pa.array([_arrow_value(row[i]) for row in rows], type=field.type)
+                for i, field in enumerate(schema)
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            data = sink.take()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.take()  # footer
+
+
+def export_complaints(session_factory, fmt: str, columns, chunk_size: int = CHUNK_SIZE, **filters):
+    """
+    Generator of encoded bytes. Opens its own session so it can outlive the request handler
+    (FastAPI closes yield-dependencies before a StreamingResponse body is sent).
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"unsupported format: {fmt}")
+    if fmt == "parquet":
+        _arrow_schema([])  # fail before streaming starts when pyarrow is missing
+    query = build_query(columns, sort_keys=sharding.ENABLED, **filters)
+    encode = encode_csv if fmt == "csv" else encode_parquet
+
+    def generate():
+        db = session_factory()
+        try:
+            if not sharding.ENABLED:
+                yield from encode(columns, iter_chunks(db, query, chunk_size))
+                return
+            with sharding.complaint_sources(db) as sources:
+                yield from encode(columns, iter_merged_chunks([source for _, source in sources], query, chunk_size))
+        finally:
+            db.close()
+
+    return generate()
+
+
+if __name__ == "__main__":
+    import time
+    import argparse
+    from pathlib import Path
+
+    parser = argparse.ArgumentParser(description="Export complaints to CSV or Parquet")
+    parser.add_argument("output", type=Path, help="output file; format from the extension (.csv / .parquet)")
+    parser.add_argument("--columns", default=None, help="comma-separated column names")
+    parser.add_argument("--category")
+    parser.add_argument("--district")
+    parser.add_argument("--status")
+    parser.add_argument("--since", type=datetime.fromisoformat, default=None, help="created_at >= SINCE")
+    parser.add_argument("--until", type=datetime.fromisoformat, default=None, help="created_at < UNTIL")
+    parser.add_argument("--min-risk", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    from database import SessionLocal, migrate_schema
+    migrate_schema()
+
+    fmt = args.output.suffix.lstrip(".").lower()
+    stream = export_complaints(
+        SessionLocal, fmt, parse_columns(args.columns), args.chunk_size,
+        category=args.category, district=args.district, status=args.status,
+        date_from=args.since, date_to=args.until, min_risk=args.min_risk,
+    )
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    tmp = args.output.with_name(args.output.name + ".tmp")
+    start = time.perf_counter()
+    with open(tmp, "wb") as f:
+        for data in stream:
+            f.write(data)
+    tmp.replace(args.output)  # readers never see a half-written file
+    print(f"Wrote {args.output} ({args.output.stat().st_size:,} bytes) in {time.perf_counter() - start:.1f}s")
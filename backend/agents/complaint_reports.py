@@ -0,0 +1,176 @@
+"""
+AI complaint reports: a persistent cache plus batch generation.
+
+A report is cached in complaint_reports with a hash of the fields its prompt is built from,
+so it is reused until the complaint itself changes (e.g. re-scored by the scoring pipeline).
+
+Batch generation fetches the shortlist in one query (one per shard, merged), answers cached
+items immediately and writes the rest concurrently (bounded by a semaphore and by admission
+control's "report_batch" route at background priority, so interactive traffic goes first).
+Results are yielded as they complete; failures are reported inline and don't stop the batch.
+"""
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+
+import admission
+from models import MockComplaint, ComplaintReport
+from agents.complaint_export import filter_complaints
+from sharding import scatter_complaints
+
+logger = logging.getLogger(__name__)
+
+REPORT_FIELDS = ("summary", "original_text", "category", "location", "urgency_score", "safety_risk_score")
+MAX_BATCH = 200
+CONCURRENCY = int(os.getenv("REPORT_BATCH_CONCURRENCY", "4"))
+MAX_CONCURRENCY = 16
+
+
+def report_input(complaint) -> dict:
+    return {field: getattr(complaint, field) for field in REPORT_FIELDS}
+
+
+def input_hash(data: dict) -> str:
+    return hashlib.sha256(json.dumps(data, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+
+def cached_reports(db, hashes: dict) -> dict:
+    """{complaint_id: input_hash} -> {complaint_id: ComplaintReport} for reports that are still current."""
+    if not hashes:
+        return {}
+    rows = db.query(ComplaintReport).filter(ComplaintReport.complaint_id.in_(list(hashes))).all()
+    return {row.complaint_id: row for row in rows if row.input_hash == hashes[row.complaint_id]}
+
+
+def store_report(db, complaint_id: str, digest: str, model: str, report: str):
+    now = datetime.now()
+    stmt = insert(ComplaintReport).values(complaint_id=complaint_id, input_hash=digest, model=model, report=report, created_at=now)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[ComplaintReport.complaint_id],
+        set_={"input_hash": digest, "model": model, "report": report, "created_at": now},
+    ))
+    db.commit()
+
+
+def cached_report_for(db, complaint):
+    """The stored report of a complaint if it is still current, else None (no LLM call)."""
+    hit = cached_reports(db, {complaint.id: input_hash(report_input(complaint))}).get(complaint.id)
+    return hit.report if hit else None
+
+
+async def report_for(db, agent, complaint, refresh: bool = False):
+    """Cached-or-generated report for one complaint. Returns (report, cached); raises on LLM failure."""
+    data = report_input(complaint)
+    digest = input_hash(data)
+    if not refresh:
+        hit = cached_reports(db, {complaint.id: digest}).get(complaint.id)
+        if hit:  # also when another request generated it while this one waited for a slot
+            return hit.report, True
+    report, model = await agent.write_report(data)
+    store_report(db, complaint.id, digest, model, report)
+    return report, False
+
+
+def select_complaints(db, ids=None, limit: int = MAX_BATCH, **filters):
+    """
+    One query for the shortlist. Returns (complaints, missing_ids).
+    With ids the request order is kept; with filters the riskiest come first.
+    """
+    if ids:
+        ids = list(dict.fromkeys(ids))[:limit]
+        found = {c.id: c for part in scatter_complaints(
+            db, lambda cdb: list(cdb.execute(select(MockComplaint).where(MockComplaint.id.in_(ids))).scalars())
+        ) for c in part}
+        return [found[i] for i in ids if i in found], [i for i in ids if i not in found]
+    query = filter_complaints(select(MockComplaint), **filters).order_by(
+        MockComplaint.safety_risk_score.desc(), MockComplaint.urgency_score.desc(), MockComplaint.created_at.desc()
+    ).limit(limit)
+    parts = scatter_complaints(db, lambda cdb: list(cdb.execute(query).scalars()))
+    if len(parts) == 1:
+        return parts[0], []
+    # Top `limit` of each shard, merged in the same order (NULLs last, as in SQLite's DESC)
+    merged = sorted((c for part in parts for c in part), key=lambda c: tuple(
+        (value is not None, value) if value is not None else (False, 0)
+        for value in (c.safety_risk_score, c.urgency_score, c.created_at)
+    ), reverse=True)
+    return merged[:limit], []
+
+
+async def stream_batch_reports(session_factory, agent, ids=None, filters=None, limit: int = MAX_BATCH,
+                               concurrency: int = CONCURRENCY, refresh: bool = False):
+    """
+    Async generator of events:
+        {"type": "start", "total": n}
+        {"type": "item", "id", "status": ok|cached|error|not_found, "report" | "error", ...}  (completion order)
+        {"type": "summary", "total", "ok", "cached", "error", "not_found", "seconds"}
+    Opens its own session: it runs after the request handler has returned.
+    """
+    started = time.perf_counter()
+    limit = max(1, min(limit, MAX_BATCH))
+    concurrency = max(1, min(concurrency, MAX_CONCURRENCY))
+    counts = {"ok": 0, "cached": 0, "error": 0, "not_found": 0}
+    db = session_factory()
+    tasks = []
+    try:
+        complaints, missing = select_complaints(db, ids, limit, **(filters or {}))
+        yield {"type": "start", "total": len(complaints) + len(missing)}
+
+        for complaint_id in missing:
+            counts["not_found"] += 1
+            yield {"type": "item", "id": complaint_id, "status": "not_found"}
+
+        inputs = {c.id: report_input(c) for c in complaints}
+        hashes = {cid: input_hash(data) for cid, data in inputs.items()}
+        hits = {} if refresh else cached_reports(db, hashes)
+        for complaint_id, row in hits.items():
+            counts["cached"] += 1
+            yield {"type": "item", "id": complaint_id, "status": "cached", "report": row.report, "model": row.model}
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def generate(complaint_id):
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    async with admission.slot("report_batch", admission.BACKGROUND):
+                        report, model = await agent.write_report(inputs[complaint_id])
+                except admission.Overloaded as e:
+                    return {"type": "item", "id": complaint_id, "status": "error", "error": f"overloaded: {e.reason}", "retry_after": e.retry_after}
+                except Exception as e:
+                    logger.error(f"Batch report failed for {complaint_id}: {e}")
+                    return {"type": "item", "id": complaint_id, "status": "error", "error": str(e)}
+                try:
+                    store_report(db, complaint_id, hashes[complaint_id], model, report)
+                except Exception as e:  # the report is still good; it just won't be cached
+                    db.rollback()
+                    logger.error(f"Caching report for {complaint_id} failed: {e}")
+                return {"type": "item", "id": complaint_id, "status": "ok", "report": report, "model": model,
+                        "seconds": round(time.perf_counter() - start, 3)}
+
+        tasks = [asyncio.ensure_future(generate(cid)) for cid in inputs if cid not in hits]
+        for next_done in asyncio.as_completed(tasks):
+            event = await next_done
+            counts[event["status"]] += 1
+            yield event
+
+        yield {"type": "summary", "total": sum(counts.values()), **counts,
+               "seconds": round(time.perf_counter() - started, 3)}
+    finally:
+        for task in tasks:  # client disconnected mid-batch: stop spending tokens
+            task.cancel()
+        db.close()
+
+
+def encode_ndjson(event) -> str:
+    return json.dumps(event, ensure_ascii=False, default=str) + "\n"
+
+
+def encode_sse(event) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
@@ -0,0 +1,325 @@
+"""
+Full-text complaint search on SQLite FTS5.
+
+`complaints_fts` is an external-content FTS5 table over mock_complaints(summary,
+original_text, location) with the `trigram` tokenizer: Korean has no spaces between stems
+and particles (파손이/파손된), so substring matching on character trigrams works without a
+morphological analyzer. Triggers keep it in sync on INSERT/UPDATE/DELETE.
+
+Query terms of 3+ characters go through the index (MATCH, ranked by bm25). Trigrams cannot
+express 1-2 character terms (e.g. "소음"), so those become LIKE filters: cheap when combined
+with an indexed term, a scan when they are the whole query.
+
+The FTS rowid is mock_complaints' implicit rowid, which VACUUM may renumber; run
+`python -m agents.complaint_search --rebuild` after a VACUUM.
+"""
+import html
+import json
+import base64
+import logging
+from datetime import datetime
+
+from sqlalchemy import text
+
+import sharding
+from models import MockComplaint
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "complaints_fts"
+MIN_TRIGRAM_CHARS = 3
+# bm25 column weights: summary, original_text, location
+BM25_WEIGHTS = (3.0, 1.0, 2.0)
+SNIPPET_TOKENS = 40  # trigram tokens ~ characters
+# snippet()/highlight() wrap matches in private-use markers; the text is HTML-escaped first and
+# only then are the markers turned into <mark> tags, so stored text never reaches the page as markup
+MARK_OPEN, MARK_CLOSE = "\ue000", "\ue001"
+MAX_LIMIT = 100
+
+_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        summary, original_text, location,
+        content='mock_complaints', content_rowid='rowid', tokenize='trigram'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS mock_complaints_fts_insert AFTER INSERT ON mock_complaints BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, summary, original_text, location)
+        VALUES (new.rowid, new.summary, new.original_text, new.location);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS mock_complaints_fts_delete AFTER DELETE ON mock_complaints BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, summary, original_text, location)
+        VALUES ('delete', old.rowid, old.summary, old.original_text, old.location);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS mock_complaints_fts_update AFTER UPDATE OF summary, original_text, location ON mock_complaints BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, summary, original_text, location)
+        VALUES ('delete', old.rowid, old.summary, old.original_text, old.location);
+        INSERT INTO {FTS_TABLE}(rowid, summary, original_text, location)
+        VALUES (new.rowid, new.summary, new.original_text, new.location);
+    END""",
+]
+_TRIGGERS = ("mock_complaints_fts_insert", "mock_complaints_fts_delete", "mock_complaints_fts_update")
+
+
+def ensure_search_index(bind):
+    """
+    Create the FTS table and triggers if missing. Missing triggers mean the index may have
+    missed writes (first run, or mock_complaints was dropped and recreated by seed_data.py),
+    so the index is rebuilt from the content table in that case.
+    """
+    with bind.begin() as conn:
+        existing = {row[0] for row in conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'mock_complaints'"
+        ))}
+        for statement in _DDL:
+            conn.execute(text(statement))
+        if not set(_TRIGGERS) <= existing:
+            conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+            logger.info("Complaint search index rebuilt")
+
+
+def rebuild_search_index(bind):
+    with bind.begin() as conn:
+        conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+        conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"))
+
+
+def backfill_districts(db, batch_size: int = 5000):
+    """Fill MockComplaint.district from coordinates / address for rows saved before the column existed."""
+    from agents.gazetteer import get_gazetteer
+
+    gazetteer = get_gazetteer()
+    updated = 0
+    while True:
+        rows = db.query(MockComplaint.id, MockComplaint.lat, MockComplaint.lng, MockComplaint.location).filter(
+            MockComplaint.district.is_(None)
+        ).order_by(MockComplaint.id).limit(batch_size).all()
+        changes = []
+        for row in rows:
+            district = gazetteer.district_of(row.lat, row.lng)
+            if district is None and row.location:
+                hit = gazetteer.forward(row.location)
+                district = hit["district"] if hit else None
+            changes.append({"id": row.id, "district": district or ""})  # "" = looked up, unknown
+        if changes:
+            db.bulk_update_mappings(MockComplaint, changes)
+            db.commit()
+            updated += len(changes)
+        if len(rows) < batch_size:
+            return updated
+
+
+def ensure_districts(bind):
+    """Backfill districts at startup while rows without one remain (one indexed lookup otherwise)."""
+    from sqlalchemy.orm import Session
+
+    with Session(bind) as db:
+        if db.query(MockComplaint.id).filter(MockComplaint.district.is_(None)).first() is None:
+            return
+        logger.info(f"Backfilled districts of {backfill_districts(db)} complaints")
+
+
+# --- Query ---
+
+def _match_expression(terms):
+    """AND of quoted substrings; quoting keeps FTS5 operators/punctuation in user input literal."""
+    return " AND ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def _encode_cursor(score, rowid):
+    return base64.urlsafe_b64encode(json.dumps([score, rowid]).encode()).decode()
+
+
+def _decode_cursor(cursor):
+    try:
+        score, rowid = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return score, int(rowid)
+    except (ValueError, TypeError):
+        raise ValueError("invalid cursor")
+
+
+def _marked_html(value):
+    """HTML-escaped text with the match markers as <mark> tags."""
+    return html.escape(value or "").replace(MARK_OPEN, "<mark>").replace(MARK_CLOSE, "</mark>")
+
+
+def _like_snippet(value, term, width=SNIPPET_TOKENS * 2):
+    """Python snippet for LIKE-only matches (no FTS position data)."""
+    if not value:
+        return ""
+    i = value.find(term)
+    if i < 0:
+        return html.escape(value[:width]) + ("…" if len(value) > width else "")
+    start = max(0, i - width // 2)
+    end = min(len(value), i + len(term) + width // 2)
+    return ("…" if start else "") + _marked_html(
+        value[start:i] + MARK_OPEN + term + MARK_CLOSE + value[i + len(term):end]
+    ) + ("…" if end < len(value) else "")
+
+
+def search_complaints(db, q: str, category: str = None, district: str = None,
+                      date_from: datetime = None, date_to: datetime = None, min_risk: int = None,
+                      limit: int = 20, cursor: str = None):
+    """
+    Returns {"items": [...], "next_cursor": str | None}.
+    Ranked by bm25 (lower = better) with rowid as tie-breaker; LIKE-only queries come newest
+    first ("score" is then created_at). `cursor` is the opaque next_cursor of the previous page (keyset pagination).
+    With district shards every shard pages on its own and the best `limit` rows of all of
+    them make the page; the cursor then holds each shard's position.
+    """
+    terms = [t for t in (q or "").split() if t]
+    if not terms:
+        raise ValueError("empty query")
+    limit = max(1, min(limit, MAX_LIMIT))
+    filters = (category, district, date_from, date_to, min_risk)
+    if not sharding.ENABLED:
+        rows, more = _search_page(db, terms, filters, limit, _decode_cursor(cursor) if cursor else None)
+        next_cursor = _encode_cursor(rows[-1]["score"], rows[-1]["rid"]) if more else None
+        return {"items": [_item(row, terms) for row in rows], "next_cursor": next_cursor}
+
+    positions = _decode_shard_cursor(cursor) if cursor else {}
+    names = [name for name in sharding.get_shards().names if positions.get(name, ()) is not None]
+    parts = sharding.get_shards().scatter(
+        lambda name, shard_db: _search_page(shard_db, terms, filters, limit, positions.get(name)), names)
+    ranked = sorted(
+        ((row, name) for name, (rows, _) in parts.items() for row in rows),
+        key=lambda item: _rank_key(*item), reverse=not _ranked_by_bm25(terms),
+    )
+    page = ranked[:limit]
+    last = {name: row for row, name in page}
+    remaining = False
+    for name, (rows, more) in parts.items():
+        left = more or bool(rows) and rows[-1] is not last.get(name)
+        if not left:
+            positions[name] = None  # exhausted: skipped on later pages
+        elif name in last:
+            positions[name] = [last[name]["score"], last[name]["rid"]]
+        remaining = remaining or left
+    next_cursor = _encode_shard_cursor(positions) if remaining else None
+    return {"items": [_item(row, terms) for row, _ in page], "next_cursor": next_cursor}
+
+
+def _ranked_by_bm25(terms):
+    return any(len(t) >= MIN_TRIGRAM_CHARS for t in terms)
+
+
+def _rank_key(row, name):
+    """Page order across shards: (bm25 | created_at, shard, rowid); NULL created_at sorts last."""
+    score = row["score"]
+    return (score is not None, score if score is not None else 0, name, row["rid"])
+
+
+def _encode_shard_cursor(positions):
+    return base64.urlsafe_b64encode(json.dumps(positions, ensure_ascii=False).encode()).decode()
+
+
+def _decode_shard_cursor(cursor):
+    try:
+        positions = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return {name: None if pos is None else (pos[0], int(pos[1])) for name, pos in positions.items()}
+    except (ValueError, TypeError, AttributeError, IndexError):
+        raise ValueError("invalid cursor")
+
+
+def _search_page(db, terms, filters, limit, after=None):
+    """(rows, more): one page of raw rows after the (score, rowid) position `after`."""
+    category, district, date_from, date_to, min_risk = filters
+    long_terms = [t for t in terms if len(t) >= MIN_TRIGRAM_CHARS]
+    short_terms = [t for t in terms if len(t) < MIN_TRIGRAM_CHARS]
+
+    params = {"limit": limit + 1}
+    where = []
+    for i, term in enumerate(short_terms):
+        params[f"like{i}"] = f"%{term}%"
+        where.append(f"(m.summary LIKE :like{i} OR m.original_text LIKE :like{i} OR m.location LIKE :like{i})")
+    if category:
+        where.append("m.category = :category")
+        params["category"] = category
+    if district:
+        where.append("m.district = :district")
+        params["district"] = district
+    if date_from:
+        where.append("m.created_at >= :date_from")
+        params["date_from"] = date_from.isoformat(sep=" ")
+    if date_to:
+        where.append("m.created_at < :date_to")
+        params["date_to"] = date_to.isoformat(sep=" ")
+    if min_risk is not None:
+        where.append("m.safety_risk_score >= :min_risk")
+        params["min_risk"] = min_risk
+
+    columns = (
+        "m.rowid AS rid, m.id, m.summary, m.location, m.category, m.district, m.created_at, "
+        "m.urgency_score, m.safety_risk_score, m.status"
+    )
+    if after:
+        params["c_score"], params["c_rid"] = after
+    if long_terms:
+        params["match"] = _match_expression(long_terms)
+        params["mark_open"], params["mark_close"] = MARK_OPEN, MARK_CLOSE
+        weights = ", ".join(str(w) for w in BM25_WEIGHTS)
+        inner = (
+            f"SELECT {columns}, bm25({FTS_TABLE}, {weights}) AS score, "
+            f"snippet({FTS_TABLE}, 1, :mark_open, :mark_close, '…', {SNIPPET_TOKENS}) AS snippet, "
+            f"highlight({FTS_TABLE}, 0, :mark_open, :mark_close) AS summary_highlight "
+            f"FROM {FTS_TABLE} JOIN mock_complaints m ON m.rowid = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH :match" + "".join(f" AND {w}" for w in where)
+        )
+        sql = f"SELECT * FROM ({inner})"
+        if after:
+            sql += " WHERE score > :c_score OR (score = :c_score AND rid > :c_rid)"
+        sql += " ORDER BY score, rid LIMIT :limit"
+    else:
+        # LIKE-only: newest first, walking the created_at index so the scan stops after one page
+        if after:
+            where.append("(m.created_at < :c_score OR (m.created_at = :c_score AND m.rowid < :c_rid))")
+        sql = (
+            f"SELECT {columns}, m.created_at AS score, m.original_text AS snippet, NULL AS summary_highlight "
+            f"FROM mock_complaints m" + (" WHERE " + " AND ".join(where) if where else "")
+            + " ORDER BY m.created_at DESC, m.rowid DESC LIMIT :limit"
+        )
+
+    rows = db.execute(text(sql), params).mappings().all()
+    return rows[:limit], len(rows) > limit
+
+
+def _item(row, terms):
+    short_terms = [t for t in terms if len(t) < MIN_TRIGRAM_CHARS]
+    snippet = _marked_html(row["snippet"]) if _ranked_by_bm25(terms) else _like_snippet(row["snippet"], short_terms[0])
+    return {
+        "id": row["id"],
+        "summary": row["summary"],
+        "summary_highlight": _marked_html(row["summary_highlight"] or row["summary"]),
+        "snippet": snippet,
+        "location": row["location"],
+        "category": row["category"],
+        "district": row["district"] or None,
+        "created_at": row["created_at"],
+        "urgency_score": row["urgency_score"],
+        "safety_risk_score": row["safety_risk_score"],
+        "status": row["status"],
+        "score": row["score"],
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Complaint full-text search index")
+    parser.add_argument("query", nargs="*")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the FTS index (e.g. after VACUUM)")
+    parser.add_argument("--backfill-districts", action="store_true")
+    args = parser.parse_args()
+
+    from database import SessionLocal, engine, migrate_schema
+    migrate_schema()
+    if args.rebuild:
+        rebuild_search_index(engine)
+        print("Search index rebuilt")
+    db = SessionLocal()
+    try:
+        if args.backfill_districts:
+            print(f"Backfilled {backfill_districts(db)} districts")
+        if args.query:
+            for item in search_complaints(db, " ".join(args.query))["items"]:
+                print(f"{item['score']:8.3f}  {item['summary']}  |  {item['snippet']}")
+    finally:
+        db.close()
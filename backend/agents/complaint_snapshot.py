@@ -0,0 +1,286 @@
+"""
+Process-wide columnar snapshot of the hot MockComplaint fields.
+
+The read endpoints (map items, dashboard stats, high-risk list, region retrieval) used to
+hydrate every complaint as an ORM object, long text included, on every request. They now
+filter, count and bbox-select over NumPy columns and fetch text only for the rows they
+return.
+
+    rowid      int64     mock_complaints rowid (ascending; row position lookup by searchsorted)
+    ids        S36       complaint id (uuid)
+    lat, lng   float64   NaN = unplaced
+    urgency, safety  int8   -1 = NULL
+    created    int64     epoch seconds, 0 = NULL
+    category, district, status   int16 codes into per-column dictionaries
+
+76 bytes per row plus capacity slack; 1M rows load in ~7s and refresh incrementally in
+milliseconds (python -m benchmarks.snapshot).
+
+Refresh is incremental: new rows are those above the last seen rowid, changed rows are those
+with an `update` entry in the change log (agents/complaint_changes.py) past the last seq seen.
+SQLite serializes writers, so seq order is commit order: a write still uncommitted during one
+refresh gets a seq above that refresh's head and is picked up by the next. (A statement-time
+clock can't give that guarantee; it is why this doesn't use a timestamp watermark.) A shrinking
+table (seed_data.py rebuild, deletes) or a cursor below the log's compaction floor triggers a
+full reload.
+"""
+import os
+import time
+import logging
+import threading
+
+import numpy as np
+from sqlalchemy import text
+
+from agents.complaint_changes import TRUNCATED, current_cursor
+
+logger = logging.getLogger(__name__)
+
+REFRESH_SECONDS = float(os.getenv("SNAPSHOT_REFRESH_SECONDS", "1"))  # max staleness of reads
+FULL_CHECK_SECONDS = float(os.getenv("SNAPSHOT_FULL_CHECK_SECONDS", "60"))  # delete detection (COUNT(*))
+FETCH_BATCH = 50_000
+TEXT_BATCH = 10_000  # ids per IN (...) when fetching text columns
+UNSET = -1
+
+_COLUMNS = (
+    "rowid, id, lat, lng, COALESCE(urgency_score, -1), COALESCE(safety_risk_score, -1), "
+    "COALESCE(CAST(strftime('%s', created_at) AS INTEGER), 0), category, district, status"
+)
+
+
+def drop_legacy_trigger(bind):
+    """The updated_at trigger earlier versions refreshed by: an extra write per UPDATE, now unused."""
+    with bind.begin() as conn:
+        conn.execute(text("DROP TRIGGER IF EXISTS mock_complaints_touch"))
+
+
+class Dictionary:
+    """String <-> small int code; None is a value like any other."""
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def encode(self, values):
+        codes = self.codes
+        out = np.empty(len(values), dtype=np.int16)
+        for i, value in enumerate(values):
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(self.values)
+                self.values.append(value)
+            out[i] = code
+        return out
+
+    def code(self, value):
+        return self.codes.get(value, UNSET)
+
+
+class ComplaintSnapshot:
+    COLUMNS = {
+        "rowid": np.int64, "ids": "S36", "lat": np.float64, "lng": np.float64,
+        "urgency": np.int8, "safety": np.int8, "created": np.int64,
+        "category": np.int16, "district": np.int16, "status": np.int16,
+    }
+    DICTIONARY_COLUMNS = ("category", "district", "status")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.n = 0
+        self.cols = {name: np.empty(0, dtype=dtype) for name, dtype in self.COLUMNS.items()}
+        self.dicts = {name: Dictionary() for name in self.DICTIONARY_COLUMNS}
+        self.last_rowid = 0
+        self.last_seq = 0  # change-log head at the last refresh
+        self.refreshed_at = 0.0
+        self.full_checked_at = 0.0
+
+    # --- Loading ---
+
+    def _grow(self, needed):
+        capacity = len(self.cols["rowid"])
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, 1024)
+        for name, column in self.cols.items():
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self.n] = column[:self.n]
+            self.cols[name] = grown
+
+    def _encode(self, rows):
+        columns = list(zip(*rows))
+        return {
+            "rowid": np.array(columns[0], dtype=np.int64),
+            "ids": np.array([(v or "").encode("ascii", "replace") for v in columns[1]], dtype="S36"),
+            "lat": np.array(columns[2], dtype=np.float64),
+            "lng": np.array(columns[3], dtype=np.float64),
+            "urgency": np.array(columns[4], dtype=np.int8),
+            "safety": np.array(columns[5], dtype=np.int8),
+            "created": np.array(columns[6], dtype=np.int64),
+            **{name: self.dicts[name].encode(columns[7 + i]) for i, name in enumerate(self.DICTIONARY_COLUMNS)},
+        }
+
+    def _append(self, rows):
+        block = self._encode(rows)
+        count = len(rows)
+        self._grow(self.n + count)
+        for name, values in block.items():
+            self.cols[name][self.n:self.n + count] = values
+        self.last_rowid = int(block["rowid"][-1])
+        self.n += count  # publish after the data is in place
+
+    def _apply_updates(self, rows):
+        """Copy-on-write: a changed column is replaced, so views handed out earlier keep their arrays."""
+        block = self._encode(rows)
+        positions = np.searchsorted(self.cols["rowid"][:self.n], block["rowid"])
+        known = (positions < self.n) & (self.cols["rowid"][np.minimum(positions, max(self.n - 1, 0))] == block["rowid"])
+        targets = positions[known]
+        for name, values in block.items():
+            column, values = self.cols[name], values[known]
+            if np.array_equal(column[targets], values, equal_nan=column.dtype.kind == "f"):
+                continue
+            column = column.copy()
+            column[targets] = values
+            self.cols[name] = column
+        return int(known.sum())
+
+    def refresh(self, conn, force_full_check: bool = False):
+        """Fold new and changed rows in; returns (appended, updated)."""
+        with self._lock:
+            now = time.monotonic()
+            head = current_cursor(conn)
+            floor = conn.execute(text("SELECT MAX(seq) FROM complaint_changes WHERE op = :op"), {"op": TRUNCATED}).scalar()
+            max_rowid = conn.execute(text("SELECT COALESCE(MAX(rowid), 0) FROM mock_complaints")).scalar()
+            # head < last_seq: the change log was rebuilt; floor > last_seq: entries we needed were compacted away
+            shrunk = max_rowid < self.last_rowid or (self.n > 0 and (head < self.last_seq or (floor or 0) > self.last_seq))
+            if not shrunk and (force_full_check or now - self.full_checked_at > FULL_CHECK_SECONDS):
+                self.full_checked_at = now
+                shrunk = conn.execute(text("SELECT COUNT(*) FROM mock_complaints")).scalar() < self.n
+            if shrunk:
+                logger.info("Complaint snapshot: table shrank, was rebuilt or outran the change log, reloading")
+                self._reset()
+                self.full_checked_at = now
+
+            updated = 0
+            if self.n and head > self.last_seq:
+                ids = [row[0] for row in conn.execute(text(
+                    "SELECT DISTINCT complaint_id FROM complaint_changes WHERE seq > :last AND seq <= :head AND op = 'update'"
+                ), {"last": self.last_seq, "head": head})]
+                # rows above last_rowid may come back too; _apply_updates skips them and the append below loads them
+                changed = []
+                for i in range(0, len(ids), 500):
+                    params = {f"i{j}": cid for j, cid in enumerate(ids[i:i + 500])}
+                    placeholders = ", ".join(f":{name}" for name in params)
+                    changed += conn.execute(text(
+                        f"SELECT {_COLUMNS} FROM mock_complaints WHERE id IN ({placeholders}) ORDER BY rowid"
+                    ), params).fetchall()
+                if changed:
+                    updated = self._apply_updates(changed)
+
+            appended = 0
+            result = conn.execute(text(f"SELECT {_COLUMNS} FROM mock_complaints WHERE rowid > :last ORDER BY rowid"),
+                                  {"last": self.last_rowid})
+            while True:
+                rows = result.fetchmany(FETCH_BATCH)
+                if not rows:
+                    break
+                self._append(rows)
+                appended += len(rows)
+
+            self.last_seq = head
+            self.refreshed_at = now
+            return appended, updated
+
+    def ensure_fresh(self, bind, max_age: float = REFRESH_SECONDS):
+        if max_age > 0 and time.monotonic() - self.refreshed_at < max_age:
+            return self
+        with bind.connect() as conn:
+            self.refresh(conn)
+        return self
+
+    def view(self):
+        """Consistent read view; later appends, updates and reloads don't disturb it."""
+        with self._lock:
+            return SnapshotView(self.n, {name: column[:self.n] for name, column in self.cols.items()}, self.dicts)
+
+    def nbytes(self):
+        return sum(column[:self.n].nbytes for column in self.cols.values())
+
+
+class SnapshotView:
+    """Vectorized queries over a snapshot; positions are indexes into the columns."""
+
+    def __init__(self, n, cols, dicts):
+        self.n = n
+        self.cols = cols
+        self.dicts = dicts
+
+    def __len__(self):
+        return self.n
+
+    def select(self, bbox=None, category=None, district=None, status=None, min_risk=None,
+               since=None, until=None, placed_only=False):
+        """Positions matching all filters. bbox = (min_lat, min_lng, max_lat, max_lng); since/until epoch seconds."""
+        cols = self.cols
+        mask = np.ones(self.n, dtype=bool)
+        if bbox is not None:
+            min_lat, min_lng, max_lat, max_lng = bbox
+            mask &= (cols["lat"] >= min_lat) & (cols["lat"] <= max_lat) & (cols["lng"] >= min_lng) & (cols["lng"] <= max_lng)
+        elif placed_only:  # NaN/0 coordinates are not drawn on the map
+            mask &= (cols["lat"] != 0) & (cols["lng"] != 0) & ~np.isnan(cols["lat"]) & ~np.isnan(cols["lng"])
+        for name, value in (("category", category), ("district", district), ("status", status)):
+            if value is not None:
+                mask &= cols[name] == self.dicts[name].code(value)
+        if min_risk is not None:
+            mask &= cols["safety"] >= min_risk
+        if since is not None:
+            mask &= cols["created"] >= since
+        if until is not None:
+            mask &= cols["created"] < until
+        return np.flatnonzero(mask)
+
+    def counts(self, name, positions=None):
+        """{value: count} of a dictionary column (optionally over `positions` only)."""
+        codes = self.cols[name] if positions is None else self.cols[name][positions]
+        values = self.dicts[name].values
+        counts = np.bincount(codes, minlength=len(values))
+        return {values[code]: int(count) for code, count in enumerate(counts) if count}
+
+    def decode(self, name, positions):
+        values = self.dicts[name].values
+        return [values[code] for code in self.cols[name][positions]]
+
+    def ids(self, positions):
+        return [raw.decode("ascii") for raw in self.cols["ids"][positions]]
+
+
+def fetch_text(db, view, positions, columns=("summary", "original_text", "location")):
+    """
+    Row mappings (id + `columns`) for the complaints at `positions`, in position order,
+    looked up by rowid with plain Core SQL (no ORM objects). Rows deleted since the
+    last refresh are skipped.
+    """
+    rowids = view.cols["rowid"][positions].tolist()
+    select_list = ", ".join(("rowid AS _rowid", "id") + tuple(columns))
+    found = {}
+    for i in range(0, len(rowids), TEXT_BATCH):
+        chunk = ",".join(str(r) for r in rowids[i:i + TEXT_BATCH])  # ints from our own int64 column
+        for row in db.execute(text(f"SELECT {select_list} FROM mock_complaints WHERE rowid IN ({chunk})")).mappings():
+            found[row["_rowid"]] = row
+    return [found[r] for r in rowids if r in found]
+
+
+# One snapshot per database file (complaints.db, or each district shard - see sharding.py)
+complaint_snapshots = {}
+_snapshots_lock = threading.Lock()
+def get_complaint_snapshot(bind=None, max_age: float = REFRESH_SECONDS):
+    """A view of the database's snapshot, refreshed first if older than max_age seconds (0 = always)."""
+    if bind is None:
+        from database import engine as bind
+    with _snapshots_lock:
+        snapshot = complaint_snapshots.get(str(bind.url))
+        if snapshot is None:
+            snapshot = complaint_snapshots[str(bind.url)] = ComplaintSnapshot()
+    return snapshot.ensure_fresh(bind, max_age).view()
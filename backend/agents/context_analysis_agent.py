@@ -1,20 +1,32 @@
 import os
 import json
-from typing import TypedDict, List, Dict, Any
+import time
+import inspect
+import operator
+from typing import Annotated, TypedDict, List, Dict, Any
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, END
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from models import MockComplaint
+from agents.complaint_snapshot import get_complaint_snapshot
+from sharding import scatter_complaints
+from metrics import timed_node
+from agents.model_router import get_model_router
+from agents.llm_cassette import invoke_chat_model
+from tracing import span, set_llm_usage, traced_node, KIND_CLIENT
 
 # --- 1. Define State Schema (Context-to-Context Flow) ---
+# Everything here is plain data so it can be checkpointed; the DB session is passed per run in
+# config["configurable"]["db"] (see run_config in agents/region_jobs.py). Complaints are kept
+# as ids, not text: every checkpoint of every run would otherwise store the region's texts
 class AnalysisState(TypedDict):
     # Input
     region_polygon: List[List[float]] # [[lat, lng], ...]
-    db_session: Any # SQLAlchemy Session (passed in config or state)
     
     # Internal State
-    raw_complaints: List[Dict] # Extracted from DB
+    complaint_ids: List[str] # In the region; text is read again by id where a node needs it
     themes: Dict[str, List[str]] # { "Noise": ["Fireworks", "Busking"] }
     semantic_context: str # "High tourist activity area with conflicting residential needs..."
     
@@ -24,58 +36,63 @@ class AnalysisState(TypedDict):
     urgency_score: int # 0-100
     sentiment_breakdown: Dict[str, int] # e.g. {"Negative": 80, "Neutral": 20}
     action_items: List[str]
+    node_timings: Annotated[Dict[str, float], operator.or_] # node -> seconds of its latest attempt
 
 # --- 2. Define Nodes ---
 
-def retrieve_complaints(state: AnalysisState):
+def complaint_texts(db, ids, batch: int = 500):
+    """{"id", "summary", "text"} of the complaints, in `ids` order (primary-key lookups, per shard when sharded)."""
+    def fetch(cdb):
+        rows = []
+        for i in range(0, len(ids), batch):
+            rows.extend(cdb.execute(select(MockComplaint.id, MockComplaint.summary, MockComplaint.original_text)
+                                    .where(MockComplaint.id.in_(ids[i:i + batch]))).all())
+        return rows
+
+    found = {r.id: {"id": r.id, "summary": r.summary, "text": r.original_text} for part in scatter_complaints(db, fetch) for r in part}
+    return [found[i] for i in ids if i in found]
+
+def retrieve_complaints(state: AnalysisState, config: RunnableConfig):
     """
     Fetch complaints within the polygon. 
     (For MVP, we might just fetch all if polygon is complex, or simple bounds check)
     """
-    db = state['db_session']
-    # MVP: Fetch all for now, in production use spatial query
-    # In real implementation: filter by lat/lng vs polygon
-    complaints = db.query(MockComplaint).all()
+    db = config["configurable"]["db"]
     
     # Simple bounds filter (if polygon provided)
     poly = state.get('region_polygon')
-    filtered = []
     if poly and len(poly) > 2:
-        # Simple bounding box
+        # Simple bounding box over the columnar snapshot; text is fetched for the selected rows only
         lats = [p[0] for p in poly]
         lngs = [p[1] for p in poly]
-        min_lat, max_lat = min(lats), max(lats)
-        min_lng, max_lng = min(lngs), max(lngs)
-        
-        for c in complaints:
-            if min_lat <= c.lat <= max_lat and min_lng <= c.lng <= max_lng:
-                filtered.append({
-                    "id": c.id, 
-                    "summary": c.summary, 
-                    "text": c.original_text,
-                    "category": c.category,
-                    "location": c.location
-                })
+        box = (min(lats), min(lngs), max(lats), max(lngs))
+
+        def in_box(cdb):
+            snapshot = get_complaint_snapshot(cdb.get_bind())
+            return snapshot.ids(snapshot.select(bbox=box))
+
+        # With district shards only the shards overlapping the box are read (in parallel)
+        filtered = [cid for part in scatter_complaints(db, in_box, bbox=box) for cid in part]
     else:
         # If no polygon, return all (or empty?)
         # Let's return all for "Global Analysis" if empty
-        filtered = [{"id": c.id, "summary": c.summary, "text": c.original_text} for c in complaints]
+        parts = scatter_complaints(db, lambda cdb: cdb.execute(select(MockComplaint.id)).scalars().all())
+        filtered = [cid for part in parts for cid in part]
         
     print(f"DEBUG: Retrieved {len(filtered)} complaints.")
-    return {"raw_complaints": filtered}
+    return {"complaint_ids": filtered}
 
-def analyze_context(state: AnalysisState):
+def analyze_context(state: AnalysisState, config: RunnableConfig):
     """
     LLM Step: Analyze the 'Context' from raw texts.
     Identify recurring themes, hidden connections, and root causes.
     """
-    complaints = state['raw_complaints']
+    complaints = complaint_texts(config["configurable"]["db"], state['complaint_ids']) if state['complaint_ids'] else []
     if not complaints:
         return {"semantic_context": "No complaints found in this area.", "themes": {}}
 
     docs = "\n".join([f"- {c['summary']}: {c['text']}" for c in complaints])
     
-    llm = ChatOpenAI(model="gpt-4o", temperature=0)
     messages = [
         SystemMessage(content="""
         You are a smart City Urban Planner AI for Busan, Korea.
@@ -100,7 +117,13 @@ def analyze_context(state: AnalysisState):
         HumanMessage(content=f"Complaints:\n{docs}")
     ]
     
-    response = llm.invoke(messages)
+    router = get_model_router()
+    model = router.choose("context_analysis", messages)
+    start = time.perf_counter()
+    with span("openai.chat.completions", KIND_CLIENT, **{"llm.model": model, "llm.agent": "context_analysis"}) as llm_span:
+        response = invoke_chat_model(model, 0, messages)
+        set_llm_usage(llm_span, response.usage_metadata)
+    router.record("context_analysis", model, time.perf_counter() - start, response.usage_metadata)
     try:
         content = response.content.replace("```json", "").replace("```", "")
         data = json.loads(content)
@@ -125,7 +148,6 @@ def generate_report(state: AnalysisState):
     context = state['semantic_context']
     themes = state['themes']
     
-    llm = ChatOpenAI(model="gpt-4o", temperature=0.3)
     messages = [
         SystemMessage(content="""
         Generate a 'Context-Driven' Action Report in **Korean**.
@@ -142,7 +164,13 @@ def generate_report(state: AnalysisState):
         HumanMessage(content=f"Context: {context}\nThemes: {themes}")
     ]
     
-    response = llm.invoke(messages)
+    router = get_model_router()
+    model = router.choose("context_report", messages)
+    start = time.perf_counter()
+    with span("openai.chat.completions", KIND_CLIENT, **{"llm.model": model, "llm.agent": "context_report"}) as llm_span:
+        response = invoke_chat_model(model, 0.3, messages)
+        set_llm_usage(llm_span, response.usage_metadata)
+    router.record("context_report", model, time.perf_counter() - start, response.usage_metadata)
     return {
         "final_report": response.content,
         "chart_data": state.get("chart_data", {}),
@@ -150,14 +178,28 @@ def generate_report(state: AnalysisState):
         "sentiment_breakdown": state.get("sentiment_breakdown", {})
     }
 
+def recorded_timing(node: str, fn):
+    """Adds the node's duration to state["node_timings"], so it is checkpointed with the run."""
+    takes_config = "config" in inspect.signature(fn).parameters
+
+    # No functools.wraps: LangGraph must see this signature (with config), not fn's
+    def wrapper(state, config: RunnableConfig):
+        start = time.perf_counter()
+        update = fn(state, config) if takes_config else fn(state)
+        return {**update, "node_timings": {node: round(time.perf_counter() - start, 3)}}
+    wrapper.__name__ = fn.__name__
+    return wrapper
+
 # --- 3. Build Graph ---
 def create_graph():
+    from agents.analysis_checkpoints import get_checkpointer
+
     workflow = StateGraph(AnalysisState)
     
     # Add Nodes
-    workflow.add_node("retrieve", retrieve_complaints)
-    workflow.add_node("analyze", analyze_context)
-    workflow.add_node("report", generate_report)
+    # Each node is timed (metrics and state) and traced (span per node)
+    for name, fn in (("retrieve", retrieve_complaints), ("analyze", analyze_context), ("report", generate_report)):
+        workflow.add_node(name, timed_node("analysis", name, traced_node("analysis", name, recorded_timing(name, fn))))
     
     # Add Edges
     workflow.set_entry_point("retrieve")
@@ -165,7 +207,13 @@ def create_graph():
     workflow.add_edge("analyze", "report")
     workflow.add_edge("report", END)
     
-    return workflow.compile()
+    # Checkpoint after every node: a failed run resumes (or retries from a node) instead of restarting
+    return workflow.compile(checkpointer=get_checkpointer())
 
-# Singleton
-analysis_graph = create_graph()
+# Singleton (compiled on first use or during warm-up, not at import)
+analysis_graph = None
+def get_analysis_graph():
+    global analysis_graph
+    if analysis_graph is None:
+        analysis_graph = create_graph()
+    return analysis_graph
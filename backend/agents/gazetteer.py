@@ -0,0 +1,174 @@
+import os
+import re
+import json
+import logging
+from functools import lru_cache
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+GAZETTEER_PATH = Path(os.getenv("GAZETTEER_PATH", BASE_DIR / "data" / "busan_gazetteer.json"))
+
+# Grid cell size for the spatial index (~1km at Busan's latitude)
+CELL_DEG = 0.01
+
+_COORD_RE = re.compile(r"(3[45]\.\d+)\s*,\s*(12[89]\.\d+)")
+_NUMBER_RE = re.compile(r"\s*(?:(\d+)번길\s*)?(\d+)?")
+# City prefix, only as a whole word: "부산진구" starts with "부산" too
+_CITY_PREFIX_RE = re.compile(r"^(?:부산광역시|부산시|부산)(?=\s|$)")
+
+
+def _point_in_polygon(lat, lng, polygon):
+    """Ray casting on [[lat, lng], ...]."""
+    inside = False
+    n = len(polygon)
+    j = n - 1
+    for i in range(n):
+        lat_i, lng_i = polygon[i]
+        lat_j, lng_j = polygon[j]
+        if (lat_i > lat) != (lat_j > lat):
+            cross = lng_i + (lat - lat_i) * (lng_j - lng_i) / (lat_j - lat_i)
+            if lng < cross:
+                inside = not inside
+        j = i
+    return inside
+
+
+class Gazetteer:
+    """
+    Offline Busan 구/동 gazetteer.
+    - Reverse: (lat, lng) -> 구/동 via a uniform grid index + point-in-polygon.
+    - Forward: address string -> coordinates via road-address table, then 동, then 구 centroid.
+    """
+
+    def __init__(self, path: Path = GAZETTEER_PATH):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+
+        self.min_lat, self.min_lng, self.max_lat, self.max_lng = data["bbox"]
+        self.districts = {}  # 구 -> {"center": [lat, lng], "dongs": {동: center}}
+        self.dongs = []  # [(구, 동, polygon, bbox)] one entry per polygon part
+        for d in data["districts"]:
+            self.districts[d["name"]] = {
+                "center": d["center"],
+                "dongs": {dong["name"]: dong["center"] for dong in d["dongs"]},
+            }
+            for dong in d["dongs"]:
+                # A 동 may be a multi-polygon; each part is indexed separately
+                for polygon in dong["polygons"]:
+                    lats = [p[0] for p in polygon]
+                    lngs = [p[1] for p in polygon]
+                    self.dongs.append((d["name"], dong["name"], polygon, (min(lats), min(lngs), max(lats), max(lngs))))
+
+        # Road name -> [{"district", "center", "numbers"}], longest names first for matching
+        self.roads = {}
+        for road in data["roads"]:
+            self.roads.setdefault(road["name"], []).append(road)
+        self._road_names = sorted(self.roads, key=len, reverse=True)
+
+        # Dong names can repeat across 구 (e.g. 중동); keep every owner
+        self._dong_owners = {}
+        for gu, info in self.districts.items():
+            for dong in info["dongs"]:
+                self._dong_owners.setdefault(dong, []).append(gu)
+        self._dong_names = sorted(self._dong_owners, key=len, reverse=True)
+
+        # "서구" is a substring of "강서구": match longer names first
+        self._district_names = sorted(self.districts, key=len, reverse=True)
+
+        self._build_grid()
+        logger.info(f"Gazetteer loaded: {len(self.districts)} districts, {len(self.dongs)} dongs, {len(self.roads)} roads")
+
+    def _cell(self, lat, lng):
+        return int((lat - self.min_lat) / CELL_DEG), int((lng - self.min_lng) / CELL_DEG)
+
+    def _build_grid(self):
+        self.grid = {}
+        for idx, (_, _, _, (lat0, lng0, lat1, lng1)) in enumerate(self.dongs):
+            r0, c0 = self._cell(lat0, lng0)
+            r1, c1 = self._cell(lat1, lng1)
+            for r in range(r0, r1 + 1):
+                for c in range(c0, c1 + 1):
+                    self.grid.setdefault((r, c), []).append(idx)
+
+    # --- Reverse Geocoding ---
+    def reverse(self, lat, lng):
+        """Returns {"district", "dong"} or None outside Busan. Cached on ~1m rounded coordinates."""
+        if lat is None or lng is None:
+            return None
+        return self._reverse_cached(round(float(lat), 5), round(float(lng), 5))
+
+    @lru_cache(maxsize=8192)
+    def _reverse_cached(self, lat, lng):
+        if not (self.min_lat <= lat <= self.max_lat and self.min_lng <= lng <= self.max_lng):
+            return None
+        for idx in self.grid.get(self._cell(lat, lng), ()):
+            gu, dong, polygon, (lat0, lng0, lat1, lng1) = self.dongs[idx]
+            if lat0 <= lat <= lat1 and lng0 <= lng <= lng1 and _point_in_polygon(lat, lng, polygon):
+                return {"district": gu, "dong": dong}
+        return None
+
+    def district_of(self, lat, lng):
+        hit = self.reverse(lat, lng)
+        return hit["district"] if hit else None
+
+    # --- Forward Geocoding ---
+    @lru_cache(maxsize=4096)
+    def forward(self, address: str):
+        """
+        Returns {"lat", "lng", "district", "dong", "precision"} or None.
+        precision: "address" (road + building no.), "road", "dong", "district"
+        """
+        if not address:
+            return None
+        text = address.strip()
+
+        coords = _COORD_RE.search(text)
+        if coords:
+            lat, lng = float(coords.group(1)), float(coords.group(2))
+            hit = self.reverse(lat, lng) or {}
+            return {"lat": lat, "lng": lng, "district": hit.get("district"), "dong": hit.get("dong"), "precision": "coordinates"}
+
+        text = _CITY_PREFIX_RE.sub("", text).strip()
+
+        gu = next((name for name in self._district_names if name in text), None)
+
+        road_name = next((name for name in self._road_names if name in text), None)
+        if road_name:
+            candidates = self.roads[road_name]
+            road = next((r for r in candidates if r["district"] == gu), candidates[0])
+            rest = text[text.index(road_name) + len(road_name):]
+            m = _NUMBER_RE.match(rest)
+            side_street, number = (m.group(1), m.group(2)) if m else (None, None)
+            # "중앙대로692번길 30" is a side street; only exact main-road numbers are address-precise
+            if number and not side_street and number in road["numbers"]:
+                lat, lng = road["numbers"][number]
+                precision = "address"
+            else:
+                lat, lng = road["center"]
+                precision = "road"
+            hit = self.reverse(lat, lng) or {}
+            dong = hit.get("dong") if hit.get("district") == road["district"] else None
+            return {"lat": lat, "lng": lng, "district": road["district"], "dong": dong, "precision": precision}
+
+        dong = next((name for name in self._dong_names if name in text), None)
+        if dong:
+            owners = self._dong_owners[dong]
+            owner = gu if gu in owners else owners[0]
+            lat, lng = self.districts[owner]["dongs"][dong]
+            return {"lat": lat, "lng": lng, "district": owner, "dong": dong, "precision": "dong"}
+
+        if gu:
+            lat, lng = self.districts[gu]["center"]
+            return {"lat": lat, "lng": lng, "district": gu, "dong": None, "precision": "district"}
+        return None
+
+
+# Singleton Instance
+gazetteer = None
+def get_gazetteer():
+    global gazetteer
+    if gazetteer is None:
+        gazetteer = Gazetteer()
+    return gazetteer
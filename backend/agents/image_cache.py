@@ -0,0 +1,236 @@
+"""
+Perceptual-hash cache of complaint photo analyses.
+
+Citizens re-send the same photo: the same sinkhole from several people, or the same image
+again after an error. Each received photo is fingerprinted with a 64-bit dHash (grayscale
+9x8 thumbnail, one bit per horizontal gradient), which survives re-encoding, resizing and
+small crops. A photo within MAX_DISTANCE bits (Hamming) of a known one reuses its vision
+description and severity instead of another vision call, and complaints filed with it are
+linked to the first complaint that used the photo (MockComplaint.duplicate_of).
+
+Near-duplicate matching needs Pillow (the `images` extra: pip install -e ".[images]").
+Without it the fingerprint falls back to a SHA-256 prefix, so only byte-identical re-sends
+are recognised; check_dependencies() logs a warning about that at startup.
+
+Entries are persisted in image_fingerprints (complaints.db) and bounded by
+IMAGE_CACHE_MAX_ENTRIES with LRU eviction (last_used_at); lookups scan the in-memory copy,
+which takes well under a millisecond at the default size.
+"""
+import io
+import os
+import json
+import base64
+import hashlib
+import logging
+import importlib.util
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from sqlalchemy import delete, update
+
+import metrics
+from models import ImageFingerprint
+
+logger = logging.getLogger(__name__)
+
+MAX_ENTRIES = int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", "5000"))
+MAX_DISTANCE = int(os.getenv("IMAGE_CACHE_MAX_DISTANCE", "6"))  # of 64 bits
+DHASH, SHA256 = "dhash", "sha256"
+HAS_PILLOW = importlib.util.find_spec("PIL") is not None
+
+VISION_PROMPT = """
+이 사진은 부산광역시 민원 현장 사진이야. 사진에 보이는 문제만 객관적으로 평가해.
+JSON으로만 답해:
+{"description": "2~3문장 한국어 묘사 (대상, 크기, 위험 요소)", "severity": 1~10 정수 (시각적 심각도)}
+"""
+
+
+def check_dependencies():
+    """Warn (once, at startup) when photos can only be matched byte for byte."""
+    if not HAS_PILLOW:
+        logger.warning("Pillow is not installed: the photo cache only matches byte-identical re-sends "
+                       "(install the `images` extra for near-duplicate matching)")
+
+
+def decode_image(image_data: str):
+    """Raw bytes of a data URL / base64 image, or None (e.g. a plain http URL)."""
+    if not image_data:
+        return None
+    payload = image_data.split(",", 1)[1] if image_data.startswith("data:") else image_data
+    try:
+        return base64.b64decode(payload, validate=True)
+    except (ValueError, TypeError):
+        return None
+
+
+def fingerprint(raw: bytes):
+    """(kind, 64-bit int) of an image: dHash with Pillow, else a SHA-256 prefix (exact matches only)."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return SHA256, int.from_bytes(hashlib.sha256(raw).digest()[:8], "big")
+    try:
+        with Image.open(io.BytesIO(raw)) as image:
+            pixels = list(image.convert("L").resize((9, 8), Image.LANCZOS).getdata())
+    except Exception:  # not an image Pillow can read: still catch exact re-sends
+        return SHA256, int.from_bytes(hashlib.sha256(raw).digest()[:8], "big")
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return DHASH, value
+
+
+def parse_vision(content: str):
+    """{"description", "severity"} from the vision model's answer (JSON, possibly fenced)."""
+    try:
+        data = json.loads(content.replace("```json", "").replace("```", ""))
+        severity = data.get("severity")
+        return {"description": str(data.get("description") or "").strip(),
+                "severity": max(1, min(10, int(severity))) if severity is not None else None}
+    except (ValueError, TypeError, AttributeError):
+        return {"description": content.strip(), "severity": None}
+
+
+class ImageCache:
+    def __init__(self, session_factory=None, max_entries: int = MAX_ENTRIES, max_distance: int = MAX_DISTANCE):
+        if session_factory is None:
+            from database import SessionLocal
+            session_factory = SessionLocal
+        self.session_factory = session_factory
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.entries = None  # photo_id -> entry dict, least recently used first
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self.entries is not None:
+            return
+        db = self.session_factory()
+        try:
+            rows = db.query(ImageFingerprint).order_by(ImageFingerprint.last_used_at).all()
+            self.entries = OrderedDict(
+                (row.photo_id, {"photo_id": row.photo_id, "kind": row.kind, "value": int(row.photo_id, 16),
+                                "description": row.description, "severity": row.severity,
+                                "complaint_id": row.complaint_id})
+                for row in rows
+            )
+        finally:
+            db.close()
+
+    def lookup(self, kind: str, value: int):
+        """Nearest known photo within max_distance bits (exact only for SHA-256 fingerprints), or None."""
+        with self._lock:
+            self._load()
+            limit = self.max_distance if kind == DHASH else 0
+            best, best_distance = None, limit + 1
+            for entry in self.entries.values():
+                if entry["kind"] != kind:
+                    continue
+                distance = (entry["value"] ^ value).bit_count()
+                if distance < best_distance:
+                    best, best_distance = entry, distance
+                    if distance == 0:
+                        break
+            if best is not None:
+                self.entries.move_to_end(best["photo_id"])
+        metrics.image_cache_lookups.inc(1, "hit" if best else "miss")
+        if best is not None:
+            self._touch(best["photo_id"])
+        return dict(best, distance=best_distance) if best else None
+
+    def add(self, kind: str, value: int, description: str, severity):
+        photo_id = f"{value:016x}"
+        entry = {"photo_id": photo_id, "kind": kind, "value": value, "description": description,
+                 "severity": severity, "complaint_id": None}
+        db = self.session_factory()
+        try:
+            db.merge(ImageFingerprint(photo_id=photo_id, kind=kind, description=description, severity=severity,
+                                      hits=0, last_used_at=datetime.now()))
+            with self._lock:
+                self._load()
+                self.entries[photo_id] = entry
+                self.entries.move_to_end(photo_id)
+                evicted = []
+                while len(self.entries) > self.max_entries:
+                    evicted.append(self.entries.popitem(last=False)[0])
+            if evicted:
+                db.execute(delete(ImageFingerprint).where(ImageFingerprint.photo_id.in_(evicted)))
+            db.commit()
+        finally:
+            db.close()
+        return entry
+
+    def link(self, photo_id: str, complaint_id: str):
+        """
+        Record the complaint filed with a photo. Returns the earlier complaint it duplicates
+        (the first one filed with the photo), or None when this is the first.
+        """
+        with self._lock:
+            self._load()
+            entry = self.entries.get(photo_id)
+            if entry is None:  # evicted meanwhile
+                return None
+            earlier = entry["complaint_id"]
+            if earlier is None:
+                entry["complaint_id"] = complaint_id
+        if earlier is None:
+            db = self.session_factory()
+            try:
+                db.execute(update(ImageFingerprint).where(ImageFingerprint.photo_id == photo_id,
+                                                          ImageFingerprint.complaint_id.is_(None))
+                           .values(complaint_id=complaint_id))
+                db.commit()
+            finally:
+                db.close()
+        return earlier if earlier != complaint_id else None
+
+    def linked_complaint(self, photo_id: str):
+        with self._lock:
+            self._load()
+            entry = self.entries.get(photo_id)
+            return entry["complaint_id"] if entry else None
+
+    def _touch(self, photo_id):
+        db = self.session_factory()
+        try:
+            db.execute(update(ImageFingerprint).where(ImageFingerprint.photo_id == photo_id)
+                       .values(hits=ImageFingerprint.hits + 1, last_used_at=datetime.now()))
+            db.commit()
+        except Exception as e:  # LRU order is best effort
+            db.rollback()
+            logger.error(f"Image cache touch failed: {e}")
+        finally:
+            db.close()
+
+
+async def describe_photo(service, cache, image_data: str):
+    """
+    Vision description + severity of a complaint photo, from the cache when a near-identical
+    photo was seen before. Returns {"photo_id", "description", "severity", "cached", "complaint_id"}
+    or None when the photo can't be fingerprinted (then the caller sends it to the model as is).
+    The description is of the image alone, not the sender's text, so any sender can reuse it.
+    """
+    raw = decode_image(image_data)
+    if raw is None:
+        metrics.image_cache_lookups.inc(1, "unhashable")
+        return None
+    kind, value = fingerprint(raw)
+    hit = cache.lookup(kind, value)
+    if hit is not None:
+        return {"photo_id": hit["photo_id"], "description": hit["description"], "severity": hit["severity"],
+                "cached": True, "complaint_id": hit["complaint_id"]}
+    vision = parse_vision(await service.analyze_image(VISION_PROMPT, image_data))
+    entry = cache.add(kind, value, vision["description"], vision["severity"])
+    return {"photo_id": entry["photo_id"], "description": entry["description"], "severity": entry["severity"],
+            "cached": False, "complaint_id": None}
+
+
+# Singleton Instance
+image_cache = None
+def get_image_cache():
+    global image_cache
+    if image_cache is None:
+        image_cache = ImageCache()
+    return image_cache
@@ -20,7 +20,7 @@ class InsightAgent:
         ]
         
         try:
-            response_message = await self.service.get_chat_response(messages)
+            response_message = await self.service.get_chat_response(messages, agent="insight")
             return response_message.content
         except Exception as e:
             print(f"Insight Error: {e}")
@@ -0,0 +1,176 @@
+"""
+Record/replay cassettes for LLM traffic.
+
+Wraps the two ways the backend talks to OpenAI:
+  - OpenAIService.client (AsyncOpenAI chat.completions.create), used by the chat agent,
+    perception/planner/insight, complaint reports and vision;
+  - invoke_chat_model(), used by the LangGraph nodes instead of ChatOpenAI.invoke.
+
+Config:
+    LLM_CASSETTE_MODE     off (default) | record | replay
+    LLM_CASSETTE          cassette file (default ./llm_cassette.json)
+    LLM_CASSETTE_LATENCY  zero (default) | recorded - replay delay per call
+
+Requests are keyed by a hash of the normalized request: model, messages, tools and
+sampling options, with whitespace collapsed, UUIDs masked (complaint ids in tool
+results differ per run) and tool-call ids dropped. Identical requests recorded several
+times are replayed in recorded order. A replay miss raises CassetteMiss instead of
+falling through to the network, so a benchmark never silently measures OpenAI.
+"""
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+
+logger = logging.getLogger(__name__)
+
+MODE = os.getenv("LLM_CASSETTE_MODE", "off").lower()
+CASSETTE_PATH = Path(os.getenv("LLM_CASSETTE", "llm_cassette.json"))
+LATENCY = os.getenv("LLM_CASSETTE_LATENCY", "zero").lower()
+
+_UUID_RE = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}", re.I)
+_VOLATILE_KEYS = {"id", "tool_call_id"}
+# Request parameters that change the answer; anything else (timeouts, headers) is ignored
+_KEY_PARAMS = ("model", "messages", "tools", "tool_choice", "response_format", "temperature", "max_tokens")
+
+
+class CassetteMiss(KeyError):
+    pass
+
+
+def _normalize(value):
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in sorted(value.items()) if k not in _VOLATILE_KEYS and v is not None}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, str):
+        return " ".join(_UUID_RE.sub("<uuid>", value).split())
+    if hasattr(value, "model_dump"):  # OpenAI message objects appended to the history
+        return _normalize(value.model_dump(exclude_none=True))
+    return value
+
+
+def request_key(kind: str, params: dict) -> str:
+    payload = {"kind": kind, **{k: params[k] for k in _KEY_PARAMS if k in params}}
+    blob = json.dumps(_normalize(payload), ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:32]
+
+
+class Cassette:
+    """{"version": 1, "interactions": {key: [{"model", "latency", "response"}, ...]}}"""
+
+    def __init__(self, path: Path, mode: str, latency: str = "zero"):
+        self.path = Path(path)
+        self.mode = mode
+        self.latency = latency
+        self.interactions = {}
+        self._cursor = {}  # key -> next index to replay
+        self._lock = threading.Lock()  # LangGraph runs sync nodes in worker threads
+        self.hits = self.misses = self.recorded = 0
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                self.interactions = json.load(f).get("interactions", {})
+        elif mode == "replay":
+            raise FileNotFoundError(f"Cassette not found: {self.path}")
+
+    def play(self, key: str):
+        """(response dict, delay seconds) for the next recording of `key`."""
+        with self._lock:
+            entries = self.interactions.get(key)
+            if not entries:
+                self.misses += 1
+                raise CassetteMiss(f"No recorded LLM response for request {key} in {self.path}")
+            i = self._cursor.get(key, 0)
+            self._cursor[key] = i + 1
+            self.hits += 1
+            entry = entries[i % len(entries)]
+        return entry["response"], entry["latency"] if self.latency == "recorded" else 0.0
+
+    def record(self, key: str, model: str, response: dict, latency: float):
+        with self._lock:
+            self.interactions.setdefault(key, []).append({"model": model, "latency": round(latency, 4), "response": response})
+            self.recorded += 1
+            self._save()
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps({"version": 1, "interactions": self.interactions}, ensure_ascii=False, indent=1), encoding="utf-8")
+        tmp.replace(self.path)
+
+    def stats(self):
+        return {"mode": self.mode, "path": str(self.path), "keys": len(self.interactions),
+                "hits": self.hits, "misses": self.misses, "recorded": self.recorded}
+
+
+# --- OpenAI SDK (async) ---
+
+class _CassetteCompletions:
+    def __init__(self, cassette, completions):
+        self.cassette = cassette
+        self.completions = completions  # real client's chat.completions; None when replaying
+
+    async def create(self, **params):
+        from openai.types.chat import ChatCompletion
+
+        key = request_key("openai", params)
+        if self.cassette.mode == "replay":
+            response, delay = self.cassette.play(key)
+            if delay:
+                await asyncio.sleep(delay)
+            return ChatCompletion.model_validate(response)
+        start = time.perf_counter()
+        response = await self.completions.create(**params)
+        self.cassette.record(key, params.get("model"), response.model_dump(mode="json"), time.perf_counter() - start)
+        return response
+
+
+def wrap_async_client(cassette, client=None):
+    """Stand-in for AsyncOpenAI exposing chat.completions.create; `client` may be None in replay mode."""
+    completions = client.chat.completions if client is not None else None
+    return SimpleNamespace(chat=SimpleNamespace(completions=_CassetteCompletions(cassette, completions)))
+
+
+# --- LangChain (sync, LangGraph nodes) ---
+
+def invoke_chat_model(model: str, temperature: float, messages):
+    """ChatOpenAI(model, temperature).invoke(messages), through the cassette when one is active."""
+    cassette = get_cassette()
+    if cassette is None:
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(model=model, temperature=temperature).invoke(messages)
+
+    from langchain_core.messages import message_to_dict, messages_from_dict
+
+    params = {
+        "model": model,
+        "temperature": temperature,
+        "messages": [{"role": m.type, "content": m.content} for m in messages],
+    }
+    key = request_key("langchain", params)
+    if cassette.mode == "replay":
+        response, delay = cassette.play(key)
+        if delay:
+            time.sleep(delay)
+        return messages_from_dict([response])[0]
+    from langchain_openai import ChatOpenAI
+    start = time.perf_counter()
+    response = ChatOpenAI(model=model, temperature=temperature).invoke(messages)
+    cassette.record(key, model, message_to_dict(response), time.perf_counter() - start)
+    return response
+
+
+# Singleton Instance (None when LLM_CASSETTE_MODE=off)
+cassette = None
+def get_cassette():
+    global cassette
+    if cassette is None and MODE in ("record", "replay"):
+        cassette = Cassette(CASSETTE_PATH, MODE, LATENCY)
+        logger.warning(f"LLM cassette {MODE} mode: {CASSETTE_PATH} (latency: {LATENCY})")
+    return cassette
@@ -0,0 +1,343 @@
+import os
+import re
+import math
+import mmap
+import heapq
+import struct
+import bisect
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+MANUAL_DIR = Path(os.getenv("MANUAL_DIR", BASE_DIR / "data" / "manuals"))
+INDEX_PATH = Path(os.getenv("MANUAL_INDEX_PATH", BASE_DIR / "data" / "manual_index.bin"))
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# --- Index File Layout ---
+# header | doc_len[u32 * n_docs] | doc_off[u32 * (n_docs+1)] | doc_blob
+#        | term_off[u32 * (n_terms+1)] | term_blob | df[u32 * n_terms]
+#        | post_off[u32 * (n_terms+1)] | post_doc[u32 * n_postings] | post_tf[u32 * n_postings]
+# Terms are sorted by UTF-8 bytes so lookups are a binary search straight on the mmap.
+MAGIC = b"BM25IDX1"
+HEADER = struct.Struct("<8sIIIId")  # magic, n_docs, n_terms, n_postings, reserved, avgdl
+
+_WORD_RE = re.compile(r"[가-힣]+|[a-zA-Z]+|[0-9]+")
+
+
+def tokenize(text: str):
+    """
+    Korean runs -> character bigrams (단일 글자는 그대로), Latin/digit runs -> whole lowercase word.
+    Bigrams avoid a morphological analyzer while still matching inflected forms (파손이/파손된 -> 파손).
+    """
+    tokens = []
+    for word in _WORD_RE.findall(text or ""):
+        if "가" <= word[0] <= "힣":
+            if len(word) == 1:
+                tokens.append(word)
+            else:
+                tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word.lower())
+    return tokens
+
+
+def load_passages(manual_dir: Path = MANUAL_DIR):
+    """
+    Split markdown manuals into passages on '## ' section headers.
+    Returns [(title, text), ...]
+    """
+    passages = []
+    for path in sorted(Path(manual_dir).glob("*.md")):
+        doc_title = path.stem
+        section, lines = None, []
+
+        def flush():
+            body = " ".join(l.strip() for l in lines if l.strip())
+            if section and body:
+                passages.append((f"{doc_title} > {section}", body))
+
+        for line in path.read_text(encoding="utf-8").splitlines():
+            if line.startswith("# "):
+                doc_title = line[2:].strip()
+            elif line.startswith("## "):
+                flush()
+                section, lines = line[3:].strip(), []
+            else:
+                lines.append(line)
+        flush()
+    return passages
+
+
+def build_index(passages, index_path: Path = INDEX_PATH):
+    """
+    Build the inverted index and write it atomically (tmp file + os.replace),
+    so running workers never observe a half-written file.
+    """
+    postings = defaultdict(list)  # term -> [(doc_id, tf)]
+    doc_lens = []
+    for doc_id, (title, text) in enumerate(passages):
+        counts = Counter(tokenize(title) + tokenize(text))
+        doc_lens.append(sum(counts.values()))
+        for term, tf in counts.items():
+            postings[term].append((doc_id, tf))
+
+    n_docs = len(passages)
+    avgdl = (sum(doc_lens) / n_docs) if n_docs else 0.0
+    terms = sorted(postings, key=lambda t: t.encode("utf-8"))
+
+    doc_blob, doc_off = bytearray(), [0]
+    for title, text in passages:
+        doc_blob += f"{title}\x1f{text}".encode("utf-8")
+        doc_off.append(len(doc_blob))
+
+    term_blob, term_off = bytearray(), [0]
+    dfs, post_off, post_doc, post_tf = [], [0], [], []
+    for term in terms:
+        term_blob += term.encode("utf-8")
+        term_off.append(len(term_blob))
+        plist = postings[term]
+        dfs.append(len(plist))
+        post_doc.extend(d for d, _ in plist)
+        post_tf.extend(tf for _, tf in plist)
+        post_off.append(len(post_doc))
+
+    def u32(values):
+        return struct.pack(f"<{len(values)}I", *values)
+
+    def pad(buf):
+        # Keep every u32 array 4-byte aligned for memoryview.cast
+        return bytes(buf) + b"\0" * (-len(buf) % 4)
+
+    index_path = Path(index_path)
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = index_path.with_suffix(f".tmp{os.getpid()}")
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, n_docs, len(terms), len(post_doc), 0, avgdl))
+        f.write(u32(doc_lens))
+        f.write(u32(doc_off))
+        f.write(struct.pack("<I", len(doc_blob)) + pad(doc_blob))
+        f.write(u32(term_off))
+        f.write(struct.pack("<I", len(term_blob)) + pad(term_blob))
+        f.write(u32(dfs))
+        f.write(u32(post_off))
+        f.write(u32(post_doc))
+        f.write(u32(post_tf))
+    os.replace(tmp_path, index_path)
+    logger.info(f"Manual index built: {n_docs} passages, {len(terms)} terms -> {index_path}")
+    return index_path
+
+
+class _TermTable:
+    """Sequence view over the sorted term blob so `bisect` can search it in place."""
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]])
+
+
+class ManualIndexReader:
+    """Read-only, mmap-backed view over an index file."""
+
+    def __init__(self, index_path: Path):
+        self.path = Path(index_path)
+        self._file = open(self.path, "rb")
+        self.stat = os.fstat(self._file.fileno())
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mm)
+        # In-flight searches; a retired reader is closed when the last one releases it
+        self._refs = 0
+        self._retired = False
+        self._closed = False
+        self._refs_lock = threading.Lock()
+
+        magic, self.n_docs, self.n_terms, n_postings, _, self.avgdl = HEADER.unpack_from(view, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Not a manual index file: {self.path}")
+
+        pos = HEADER.size
+
+        def take_u32(count):
+            nonlocal pos
+            arr = view[pos:pos + 4 * count].cast("I")
+            pos += 4 * count
+            return arr
+
+        def take_blob():
+            nonlocal pos
+            (size,) = struct.unpack_from("<I", view, pos)
+            pos += 4
+            blob = view[pos:pos + size]
+            pos += size + (-size % 4)
+            return blob
+
+        self.doc_len = take_u32(self.n_docs)
+        self.doc_off = take_u32(self.n_docs + 1)
+        self.doc_blob = take_blob()
+        term_off = take_u32(self.n_terms + 1)
+        self.terms = _TermTable(term_off, take_blob())
+        self.df = take_u32(self.n_terms)
+        self.post_off = take_u32(self.n_terms + 1)
+        self.post_doc = take_u32(n_postings)
+        self.post_tf = take_u32(n_postings)
+
+    def term_id(self, term: str):
+        key = term.encode("utf-8")
+        i = bisect.bisect_left(self.terms, key)
+        if i < len(self.terms) and self.terms[i] == key:
+            return i
+        return None
+
+    def passage(self, doc_id: int):
+        raw = bytes(self.doc_blob[self.doc_off[doc_id]:self.doc_off[doc_id + 1]]).decode("utf-8")
+        title, _, text = raw.partition("\x1f")
+        return title, text
+
+    def search(self, query: str, top_k: int = 3):
+        if not self.n_docs:
+            return []
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            tid = self.term_id(term)
+            if tid is None:
+                continue
+            df = self.df[tid]
+            idf = math.log(1 + (self.n_docs - df + 0.5) / (df + 0.5))
+            for p in range(self.post_off[tid], self.post_off[tid + 1]):
+                doc = self.post_doc[p]
+                tf = self.post_tf[p]
+                norm = K1 * (1 - B + B * self.doc_len[doc] / self.avgdl)
+                scores[doc] += idf * tf * (K1 + 1) / (tf + norm)
+
+        best = heapq.nlargest(top_k, scores.items(), key=lambda kv: kv[1])
+        results = []
+        for doc, score in best:
+            title, text = self.passage(doc)
+            results.append({"title": title, "text": text, "score": round(score, 4)})
+        return results
+
+    def acquire(self):
+        """Pin the mapping for one search; False once the reader is closed."""
+        with self._refs_lock:
+            if self._closed:
+                return False
+            self._refs += 1
+            return True
+
+    def release(self):
+        with self._refs_lock:
+            self._refs -= 1
+            if not (self._retired and self._refs == 0):
+                return
+        self.close()
+
+    def retire(self):
+        """Close now if idle, otherwise when the last in-flight search releases it."""
+        with self._refs_lock:
+            self._retired = True
+            if self._refs:
+                return
+        self.close()
+
+    def close(self):
+        with self._refs_lock:
+            if self._closed:
+                return
+            self._closed = True
+        for name in ("doc_len", "doc_off", "doc_blob", "df", "post_off", "post_doc", "post_tf"):
+            getattr(self, name).release()
+        self.terms.offsets.release()
+        self.terms.blob.release()
+        try:
+            self._mm.close()
+        except BufferError:
+            # A concurrent search still holds a slice; let GC unmap it.
+            pass
+        self._file.close()
+
+
+class ManualSearchEngine:
+    """
+    Process-wide BM25 search over the admin manuals.
+    Hot reload: the index file is re-stat'ed at most every `check_interval` seconds and
+    re-mapped when it changes, so `python -m agents.manual_index` updates running workers.
+    Searches pin their reader, and the old mapping is closed once the last of them finishes.
+    """
+
+    def __init__(self, index_path: Path = INDEX_PATH, manual_dir: Path = MANUAL_DIR, check_interval: float = 2.0):
+        self.index_path = Path(index_path)
+        self.manual_dir = Path(manual_dir)
+        self.check_interval = check_interval
+        self._reader = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def _current_reader(self):
+        now = time.monotonic()
+        if self._reader is not None and now - self._last_check < self.check_interval:
+            return self._reader
+
+        with self._lock:
+            self._last_check = now
+            try:
+                st = os.stat(self.index_path)
+            except FileNotFoundError:
+                build_index(load_passages(self.manual_dir), self.index_path)
+                st = os.stat(self.index_path)
+
+            old = self._reader
+            if old is None or (st.st_mtime_ns, st.st_ino, st.st_size) != (old.stat.st_mtime_ns, old.stat.st_ino, old.stat.st_size):
+                self._reader = ManualIndexReader(self.index_path)
+                if old is not None:
+                    old.retire()  # unmapped once in-flight searches release it
+                    logger.info(f"Manual index reloaded ({self._reader.n_docs} passages)")
+            return self._reader
+
+    def reload(self):
+        self._last_check = 0.0
+        return self._current_reader()
+
+    def search(self, query: str, top_k: int = 3):
+        reader = self._current_reader()
+        while not reader.acquire():  # retired and closed by a reload in between: take the new one
+            reader = self._current_reader()
+        try:
+            return reader.search(query, top_k=top_k)
+        finally:
+            reader.release()
+
+
+# Singleton Instance
+manual_search_engine = None
+def get_manual_search_engine():
+    global manual_search_engine
+    if manual_search_engine is None:
+        manual_search_engine = ManualSearchEngine()
+    return manual_search_engine
+
+
+if __name__ == "__main__":
+    # Rebuild the index; running workers pick it up on their next stat check.
+    import sys
+    passages = load_passages(MANUAL_DIR)
+    build_index(passages, INDEX_PATH)
+    if len(sys.argv) > 1:
+        start = time.perf_counter()
+        hits = ManualIndexReader(INDEX_PATH).search(" ".join(sys.argv[1:]))
+        elapsed = (time.perf_counter() - start) * 1000
+        for hit in hits:
+            print(f"[{hit['score']}] {hit['title']}: {hit['text'][:80]}...")
+        print(f"Query took {elapsed:.2f} ms")
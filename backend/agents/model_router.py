@@ -0,0 +1,188 @@
+"""
+Per-call model routing (fast vs strong) with per-route latency/cost accounting.
+
+The policy lives in data/model_routing.json (MODEL_ROUTING_PATH):
+    tiers          tier name -> model id
+    default_tier   used when no rule matches
+    rules          first match wins; every given condition must hold:
+                   task, stage (str or list), has_image, min_prompt_tokens, max_prompt_tokens
+    pricing_usd_per_million_tokens   model -> {prompt, completion}, for cost accounting
+
+A task is the calling agent ("civil_complaint", "complaint_report", "context_analysis", ...).
+Stages are task-specific; the chat agent uses "turn" (a user turn while details are being collected),
+"save" (a turn taken once the conversation has what filing needs, so the call that
+may run save_complaint_to_db gets the strong tier) and
+"after_tool" (the reply written after tool results).
+
+Prompt size is estimated without a tokenizer: ~1.5 Hangul syllables or ~4 other
+characters per token, which is close enough to pick a tier.
+"""
+import os
+import json
+import logging
+import threading
+from collections import deque
+from pathlib import Path
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+ROUTING_PATH = Path(os.getenv("MODEL_ROUTING_PATH", BASE_DIR / "data" / "model_routing.json"))
+
+DEFAULT_POLICY = {
+    "tiers": {"fast": "gpt-4o-mini", "strong": "gpt-4o", "vision": "gpt-4o"},
+    "default_tier": "strong",
+    "rules": [],
+    "pricing_usd_per_million_tokens": {},
+}
+LATENCY_WINDOW = 500  # recent calls kept per route for p50/p95
+
+
+def _content(message):
+    # dict messages, OpenAI ChatCompletionMessage objects and LangChain messages
+    if isinstance(message, dict):
+        return message.get("content")
+    return getattr(message, "content", None)
+
+
+def _parts(messages):
+    for message in messages or ():
+        content = _content(message)
+        if isinstance(content, list):
+            yield from content
+        elif content:
+            yield {"type": "text", "text": content}
+
+
+def estimate_tokens(messages) -> int:
+    hangul = other = 0
+    for part in _parts(messages):
+        text = (part.get("text") or "") if isinstance(part, dict) else str(part)
+        h = sum(1 for ch in text if "가" <= ch <= "힣")
+        hangul += h
+        other += len(text) - h
+    return int(hangul / 1.5 + other / 4)
+
+
+def has_image(messages) -> bool:
+    return any(isinstance(part, dict) and part.get("type") == "image_url" for part in _parts(messages))
+
+
+def _matches(rule, task, stage, image, tokens):
+    if rule.get("task") not in (None, task):
+        return False
+    if "stage" in rule:
+        stages = rule["stage"] if isinstance(rule["stage"], list) else [rule["stage"]]
+        if stage not in stages:
+            return False
+    if "has_image" in rule and rule["has_image"] != image:
+        return False
+    if "min_prompt_tokens" in rule and tokens < rule["min_prompt_tokens"]:
+        return False
+    if "max_prompt_tokens" in rule and tokens > rule["max_prompt_tokens"]:
+        return False
+    return True
+
+
+class RouteStats:
+    __slots__ = ("calls", "errors", "prompt_tokens", "completion_tokens", "cost_usd", "latencies")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost_usd = 0.0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def summary(self):
+        ordered = sorted(self.latencies)
+
+        def pct(q):
+            return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3) if ordered else None
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cost_usd": round(self.cost_usd, 6),
+            "avg_cost_usd": round(self.cost_usd / self.calls, 6) if self.calls else None,
+            "p50_seconds": pct(0.5),
+            "p95_seconds": pct(0.95),
+        }
+
+
+class ModelRouter:
+    def __init__(self, path=ROUTING_PATH):
+        self.path = Path(path)
+        self.policy = dict(DEFAULT_POLICY)
+        self._stats = {}  # (task, stage, model) -> RouteStats
+        self._lock = threading.Lock()  # LangGraph runs sync nodes in worker threads
+        self.reload()
+
+    def reload(self):
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                self.policy = {**DEFAULT_POLICY, **json.load(f)}
+            self.policy["tiers"] = {**DEFAULT_POLICY["tiers"], **self.policy["tiers"]}
+        else:
+            logger.warning(f"Model routing policy not found at {self.path}; using defaults")
+
+    def model_for_tier(self, tier: str) -> str:
+        return self.policy["tiers"][tier]
+
+    def choose(self, task: str, messages=None, stage: str = None, image: bool = None) -> str:
+        """Model id for one call. `image` defaults to whether `messages` carry an image part."""
+        image = has_image(messages) if image is None else image
+        tokens = estimate_tokens(messages)
+        tier = self.policy["default_tier"]
+        for rule in self.policy["rules"]:
+            if _matches(rule, task, stage, image, tokens):
+                tier = rule["tier"]
+                break
+        metrics.llm_route_decisions.inc(1, task, stage or "", tier)
+        return self.model_for_tier(tier)
+
+    def cost(self, model: str, usage) -> float:
+        prices = self.policy["pricing_usd_per_million_tokens"].get(model)
+        if not prices:
+            return 0.0
+        prompt, completion = metrics.token_counts(usage)
+        return (prompt * prices.get("prompt", 0) + completion * prices.get("completion", 0)) / 1_000_000
+
+    def record(self, task: str, model: str, seconds: float, usage=None, error: bool = False, stage: str = None):
+        """Replaces metrics.record_llm_call for routed calls: latency + tokens + cost per (task, stage, model)."""
+        metrics.record_llm_call(task, model, seconds, usage, error=error)
+        prompt, completion = metrics.token_counts(usage)
+        cost = self.cost(model, usage)
+        if cost:
+            metrics.llm_cost.inc(cost, task, model)
+        with self._lock:
+            stats = self._stats.get((task, stage, model))
+            if stats is None:
+                stats = self._stats[(task, stage, model)] = RouteStats()
+            stats.calls += 1
+            stats.errors += bool(error)
+            stats.prompt_tokens += prompt
+            stats.completion_tokens += completion
+            stats.cost_usd += cost
+            stats.latencies.append(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            routes = [
+                {"task": task, "stage": stage, "model": model, **stats.summary()}
+                for (task, stage, model), stats in sorted(self._stats.items(), key=lambda kv: tuple(map(str, kv[0])))
+            ]
+        return {"tiers": self.policy["tiers"], "default_tier": self.policy["default_tier"], "routes": routes}
+
+
+# Singleton Instance
+model_router = None
+def get_model_router():
+    global model_router
+    if model_router is None:
+        model_router = ModelRouter()
+    return model_router
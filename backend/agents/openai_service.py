@@ -1,7 +1,10 @@
-from openai import AsyncOpenAI
 import os
 import json
+import time
 import logging
+from agents.model_router import get_model_router
+from agents.llm_cassette import get_cassette, wrap_async_client
+from tracing import span, set_llm_usage, KIND_CLIENT
 
 # Configure Logging
 logging.basicConfig(level=logging.INFO)
@@ -12,14 +15,28 @@ class OpenAIService:
         self.api_key = os.getenv("OPENAI_API_KEY")
         self.mock_mode = False
         
-        if not self.api_key:
+        self.router = get_model_router()  # model per call: data/model_routing.json
+        self.cassette = get_cassette()  # LLM_CASSETTE_MODE=record|replay
+        self._client = None
+        
+        if not self.api_key and not (self.cassette and self.cassette.mode == "replay"):
             logger.warning("OPENAI_API_KEY not found. Switching to MOCK MODE.")
             self.mock_mode = True
-        else:
-            self.client = AsyncOpenAI(api_key=self.api_key)
-            self.model = "gpt-4o"
 
-    async def get_chat_response(self, messages, tools=None, tool_choice=None, response_format=None):
+    @property
+    def client(self):
+        # Deferred: importing openai and building the HTTP client only happens on first real call
+        if self._client is None:
+            if self.cassette and self.cassette.mode == "replay":
+                self._client = wrap_async_client(self.cassette)
+            else:
+                from openai import AsyncOpenAI
+                self._client = AsyncOpenAI(api_key=self.api_key)
+                if self.cassette:
+                    self._client = wrap_async_client(self.cassette, self._client)
+        return self._client
+
+    async def get_chat_response(self, messages, tools=None, tool_choice=None, response_format=None, model=None, agent="default", stage=None):
         if self.mock_mode:
             logger.info("Mock Mode: Returning dummy response")
             # Return a Mock Object that mimics OpenAI response structure
@@ -55,9 +72,11 @@ class OpenAIService:
 
             return MockMessage()
 
+        model = model or self.router.choose(agent, messages, stage=stage)
+        start = time.perf_counter()
         try:
             params = {
-                "model": self.model,
+                "model": model,
                 "messages": messages,
                 "temperature": 0.7,
             }
@@ -69,34 +88,45 @@ class OpenAIService:
             if response_format:
                  params["response_format"] = response_format
             
-            response = await self.client.chat.completions.create(**params)
+            with span("openai.chat.completions", KIND_CLIENT, **{"llm.model": params["model"], "llm.agent": agent, "llm.messages": len(messages)}) as llm_span:
+                response = await self.client.chat.completions.create(**params)
+                set_llm_usage(llm_span, response.usage)
+            self.router.record(agent, model, time.perf_counter() - start, response.usage, stage=stage)
             return response.choices[0].message
         except Exception as e:
+            self.router.record(agent, model, time.perf_counter() - start, error=True, stage=stage)
             logger.error(f"Error calling OpenAI API: {e}")
             raise e
 
     async def analyze_image(self, text: str, image_url: str):
+        # gpt-4-vision-preview is retired; the policy's vision tier names a current multimodal model
+        model = self.router.choose("vision", image=True)
+        start = time.perf_counter()
         try:
-            response = await self.client.chat.completions.create(
-                model="gpt-4-vision-preview",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": text},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": image_url,
+            with span("openai.chat.completions", KIND_CLIENT, **{"llm.model": model, "llm.agent": "vision"}) as llm_span:
+                response = await self.client.chat.completions.create(
+                    model=model,
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": [
+                                {"type": "text", "text": text},
+                                {
+                                    "type": "image_url",
+                                    "image_url": {
+                                        "url": image_url,
+                                    },
                                 },
-                            },
-                        ],
-                    }
-                ],
-                max_tokens=300,
-            )
+                            ],
+                        }
+                    ],
+                    max_tokens=300,
+                )
+                set_llm_usage(llm_span, response.usage)
+            self.router.record("vision", model, time.perf_counter() - start, response.usage)
             return response.choices[0].message.content
         except Exception as e:
+            self.router.record("vision", model, time.perf_counter() - start, error=True)
             logger.error(f"Error analyzing image: {e}")
             raise e
 
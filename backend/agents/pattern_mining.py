@@ -0,0 +1,355 @@
+"""
+Complaint pattern mining for the dashboard "패턴" cards (ComplaintPattern).
+
+Two stages:
+1. fold_new_complaints(): incremental. Only MockComplaint rows past the stored rowid cursor
+   are read, bucketed into district x category x week x weekday x hour (local time) with
+   NumPy and added to the PatternCell count cube (one batched upsert). rowid is insertion
+   order whatever clock stamped created_at; VACUUM may renumber it, so run with --rebuild
+   after a VACUUM. With district shards each shard has its own cursor; `python -m sharding
+   rebalance` resets them, since moved rows get new rowids.
+2. mine_patterns(): reads the last WINDOW_WEEKS weeks of the cube (small: bounded by
+   districts x categories x 168 x weeks, not by history) and tests, all cells at once:
+   - time:    hour-of-day windows (2-4h, wrapping midnight) where a district's category is
+              over-represented compared with the rest of the city
+   - weekday: same for days of the week
+   - surge:   last 7 days vs the 7 before (conditional binomial test)
+   Significant findings are ranked by z-score and replace the ComplaintPattern rows.
+"""
+import os
+import html
+import logging
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import literal_column, or_
+from sqlalchemy.dialects.sqlite import insert
+
+import sharding
+from agents.gazetteer import get_gazetteer
+from models import AnalyticsCursor, ComplaintPattern, MockComplaint, PatternCell
+
+logger = logging.getLogger(__name__)
+
+CURSOR_NAME = "pattern_mining"
+WINDOW_WEEKS = int(os.getenv("PATTERN_WINDOW_WEEKS", "4"))
+TOP_N = int(os.getenv("PATTERN_TOP_N", "5"))
+MIN_COUNT = 5  # never report a pattern backed by fewer complaints
+# One-sided z thresholds. Concentration tests scan up to 72 windows per district/category,
+# so they use a much stricter cut-off (~p < 0.0002) than the single-comparison surge test (~p < 0.01).
+CONCENTRATION_Z = 3.5
+SURGE_Z = 2.33
+HOUR_WINDOWS = (2, 3, 4)
+PRIOR = 1.0  # Laplace smoothing for the rest-of-city baseline (uniform when it has no data)
+UNKNOWN_DISTRICT = "미상"
+WEEKDAY_NAMES = ["월요일", "화요일", "수요일", "목요일", "금요일", "토요일", "일요일"]
+
+
+def resolve_district(lat, lng, location):
+    gazetteer = get_gazetteer()
+    district = gazetteer.district_of(lat, lng)
+    if district is None and location:
+        hit = gazetteer.forward(location)
+        district = hit["district"] if hit else None
+    return district or UNKNOWN_DISTRICT
+
+
+def week_start(moment: datetime):
+    return (moment.date() - timedelta(days=moment.weekday())).isoformat()
+
+
+def _time_parts(created):
+    """Vectorized (week start, weekday, hour) in local time for a list of datetimes."""
+    # naive values are already local (models.MockComplaint.created_at); aware ones are converted
+    stamps = np.array([c.astimezone().replace(tzinfo=None) if c.tzinfo else c for c in created], dtype="datetime64[s]")
+    days = stamps.astype("datetime64[D]")
+    hours = ((stamps - days) // np.timedelta64(1, "h")).astype(np.int64)
+    weekdays = (days.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday; Monday = 0
+    weeks = (days - weekdays.astype("timedelta64[D]")).astype(str)
+    return weeks, weekdays, hours
+
+
+# --- Stage 1: incremental fold ---
+
+def fold_new_complaints(db, batch_size: int = 5000):
+    """
+    Add complaints inserted since the last run to the PatternCell cube. Returns rows folded.
+    With district shards each shard has its own rowid cursor ("pattern_mining:<shard>").
+    """
+    with sharding.complaint_sources(db) as sources:
+        names = [sharding.source_key(CURSOR_NAME, shard) for shard, _ in sources]
+        cursors = {c.name: c for c in db.query(AnalyticsCursor).filter(AnalyticsCursor.name.in_(names))}
+        if any(cursors.get(name) is None or cursors[name].last_seq is None for name in names):
+            # First run, a new shard layout, reset_cursors(), or a cube folded by the former
+            # (created_at, id) cursor: refold from scratch
+            db.query(PatternCell).delete()
+            _cursors(db).delete(synchronize_session=False)
+            cursors = {name: AnalyticsCursor(name=name, last_seq=0) for name in names}
+
+        folded = 0
+        totals = {}
+        for (_, source), name in zip(sources, names):
+            cursor = cursors[name]
+            count, last_rowid = _fold_source(source, cursor.last_seq, totals, batch_size)
+            if count:
+                cursor.last_seq = last_rowid
+            folded += count
+            db.merge(cursor)
+
+    if totals:
+        stmt = insert(PatternCell)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["district", "category", "week", "weekday", "hour"],
+            set_={"count": PatternCell.count + stmt.excluded.count},
+        )
+        db.execute(stmt, [
+            {"district": district, "category": category, "week": week, "weekday": weekday, "hour": hour, "count": count}
+            for (district, category, week, weekday, hour), count in totals.items()
+        ])
+    db.commit()  # cube and cursors move together, so a crash never double counts
+    return folded
+
+
+def _fold_source(source, after, totals, batch_size):
+    """Aggregate the rows of one database above rowid `after` into `totals`. Returns (rows, last rowid)."""
+    rowid = literal_column("mock_complaints.rowid")
+    rows = source.query(
+        rowid.label("rowid"), MockComplaint.category, MockComplaint.lat, MockComplaint.lng,
+        MockComplaint.location, MockComplaint.created_at,
+    ).filter(rowid > after, MockComplaint.created_at.isnot(None)).order_by(rowid).yield_per(batch_size)
+
+    folded = 0
+    chunk = []
+    last = None
+    for row in rows:
+        chunk.append(row)
+        last = row
+        if len(chunk) >= batch_size:
+            folded += _aggregate(chunk, totals)
+            chunk = []
+    folded += _aggregate(chunk, totals)
+    return folded, last.rowid if last is not None else after
+
+
+def _cursors(db):
+    return db.query(AnalyticsCursor).filter(or_(
+        AnalyticsCursor.name == CURSOR_NAME, AnalyticsCursor.name.startswith(f"{CURSOR_NAME}:")
+    ))
+
+
+def reset_cursors(db):
+    """Make the next fold rebuild the cube (after a VACUUM or a shard rebalance renumbered rowids)."""
+    _cursors(db).update({"last_seq": None}, synchronize_session=False)
+    db.commit()
+
+
+def _aggregate(rows, totals):
+    """Count rows per (district, category, week, weekday, hour) into `totals`."""
+    if not rows:
+        return 0
+    districts = [resolve_district(r.lat, r.lng, r.location) for r in rows]
+    categories = [r.category or "기타" for r in rows]
+    weeks, weekdays, hours = _time_parts([r.created_at for r in rows])
+
+    # Group-by via one flat integer key per row: (district, category, week) code x 168 + slot
+    group_keys = {}
+    group_codes = np.fromiter(
+        (group_keys.setdefault(key, len(group_keys)) for key in zip(districts, categories, weeks)),
+        dtype=np.int64, count=len(rows),
+    )
+    flat = group_codes * 168 + weekdays * 24 + hours
+    uniq, counts = np.unique(flat, return_counts=True)
+
+    groups = list(group_keys)
+    for key, count in zip(uniq.tolist(), counts.tolist()):
+        district, category, week = groups[key // 168]
+        slot = key % 168
+        cell = (district, category, week, slot // 24, slot % 24)
+        totals[cell] = totals.get(cell, 0) + count
+    return len(rows)
+
+
+# --- Stage 2: significance tests over the cube ---
+
+def _load_cube(db, weeks):
+    """counts[district, category, week, weekday, hour] for the given week starts."""
+    cells = db.query(
+        PatternCell.district, PatternCell.category, PatternCell.week,
+        PatternCell.weekday, PatternCell.hour, PatternCell.count,
+    ).filter(PatternCell.week.in_(weeks)).all()
+    districts = sorted({c.district for c in cells})
+    categories = sorted({c.category for c in cells})
+    cube = np.zeros((len(districts), len(categories), len(weeks), 7, 24), dtype=np.int64)
+    if cells:
+        d_index = {d: i for i, d in enumerate(districts)}
+        c_index = {c: i for i, c in enumerate(categories)}
+        w_index = {w: i for i, w in enumerate(weeks)}
+        idx = np.array([(d_index[c.district], c_index[c.category], w_index[c.week], c.weekday, c.hour) for c in cells]).T
+        np.add.at(cube, tuple(idx), [c.count for c in cells])
+    return cube, districts, categories
+
+
+def _concentration(counts, windows):
+    """
+    counts: [D, C, S] slot counts (S = 24 hours or 7 weekdays, circular).
+    For every circular window, a two-proportion z-test of the district's share of its category
+    in that window against the rest of the city's share (both samples carry noise, so the
+    baseline variance is included). Returns (z, k, n, width, start) per (d, c) for the best window.
+    """
+    D, C, S = counts.shape
+    n = counts.sum(-1)[..., None]  # [D, C, 1]
+    rest = counts.sum(0, keepdims=True) - counts  # leave-one-out baseline
+    m = rest.sum(-1)[..., None]
+
+    best = (np.full((D, C), -np.inf), np.zeros((D, C)), np.zeros((D, C), dtype=int), np.zeros((D, C), dtype=int))
+    for w in windows:
+        # Circular window sums via padded cumulative sums
+        def window_sum(a):
+            padded = np.concatenate([a, a[..., :w - 1]], axis=-1)
+            cs = np.concatenate([np.zeros(a.shape[:-1] + (1,)), np.cumsum(padded, axis=-1)], axis=-1)
+            return cs[..., w:w + S] - cs[..., :S]
+
+        k = window_sum(counts)
+        k_rest = window_sum(rest)
+        # Laplace-smoothed rest-of-city share: uniform when the rest of the city has no data
+        p_rest = (k_rest + PRIOR * w) / (m + PRIOR * S)
+        pooled = (k + p_rest * m) / (n + m)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z = (k / n - p_rest) / np.sqrt(pooled * (1 - pooled) * (1 / n + 1 / np.maximum(m, S)))
+        z = np.where((k >= MIN_COUNT) & (n > 0) & np.isfinite(z), z, -np.inf)
+
+        start = z.argmax(-1)
+        z_best = np.take_along_axis(z, start[..., None], -1)[..., 0]
+        k_best = np.take_along_axis(k, start[..., None], -1)[..., 0]
+        better = z_best > best[0]
+        best = (
+            np.where(better, z_best, best[0]),
+            np.where(better, k_best, best[1]),
+            np.where(better, w, best[2]),
+            np.where(better, start, best[3]),
+        )
+    return best[0], best[1], n[..., 0], best[2], best[3]
+
+
+def _hour_label(start, width):
+    end = (start + width) % 24
+    period = "야간" if start >= 20 or start < 4 else "주간" if 9 <= start < 18 else "출퇴근"
+    return f"{period} 시간대({start:02d}시-{end:02d}시)"
+
+
+def _weekday_label(start, width):
+    days = [WEEKDAY_NAMES[(start + i) % 7][0] for i in range(width)]
+    return f"{'·'.join(days)}요일"
+
+
+def find_patterns(cube, districts, categories, as_of_weekday: int = 6):
+    """
+    All significant findings as dicts (unranked). `cube` weeks are newest first and
+    `as_of_weekday` is the last day with data in the newest week.
+    """
+    findings = []
+    if cube.size == 0:
+        return findings
+    window = cube.sum(axis=2)  # [D, C, 7, 24] over all weeks in the window
+
+    for kind, counts, windows, label in (
+        ("time", window.sum(axis=2), HOUR_WINDOWS, _hour_label),
+        ("weekday", window.sum(axis=3), (1, 2), _weekday_label),
+    ):
+        z, k, n, width, start = _concentration(counts, windows)
+        for d, c in zip(*np.nonzero(z >= CONCENTRATION_Z)):
+            share = int(round(100 * k[d, c] / n[d, c]))
+            district, category = districts[d], categories[c]
+            safe_district, safe_category = html.escape(district), html.escape(category)
+            findings.append({
+                "kind": kind, "district": district, "category": category, "score": float(z[d, c]), "percentage": share,
+                "title": f"{district} {category} 민원 패턴",
+                "description": (
+                    f"{label(int(start[d, c]), int(width[d, c]))} "
+                    f"<span class=\"text-primary font-bold\">{safe_category}</span> 민원이 {safe_district} 전체의 {share}%를 차지합니다. "
+                    f"(최근 {cube.shape[2]}주 {int(n[d, c])}건 중 {int(k[d, c])}건)"
+                ),
+            })
+
+    # Week-over-week surge on trailing 7-day windows (the calendar week is usually partial).
+    # Conditional on the 14-day total, the last 7 days' count is Binomial(total, 0.5) under
+    # "no change"; normal approximation of that test.
+    if cube.shape[2] >= 3:
+        daily = cube.sum(axis=-1)[:, :, ::-1].reshape(cube.shape[0], cube.shape[1], -1)  # oldest day first
+        today = (cube.shape[2] - 1) * 7 + as_of_weekday
+        current = daily[..., today - 6:today + 1].sum(-1)
+        previous = daily[..., today - 13:today - 6].sum(-1)
+        total = current + previous
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z = np.where(total > 0, (current - previous) / np.sqrt(total), 0.0)
+        for d, c in zip(*np.nonzero((z >= SURGE_Z) & (current >= MIN_COUNT))):
+            growth = int(round(100 * (current[d, c] - previous[d, c]) / max(previous[d, c], 1)))
+            district, category = districts[d], categories[c]
+            safe_district, safe_category = html.escape(district), html.escape(category)
+            findings.append({
+                "kind": "surge", "district": district, "category": category, "score": float(z[d, c]), "percentage": growth,
+                "title": f"{district} {category} 민원 급증",
+                "description": (
+                    f"최근 7일 {safe_district} <span class=\"text-primary font-bold\">{safe_category}</span> 민원이 "
+                    f"{int(current[d, c])}건으로 직전 7일({int(previous[d, c])}건) 대비 {growth}% 증가했습니다. 현장 점검이 필요합니다."
+                ),
+            })
+    return findings
+
+
+def mine_patterns(db, as_of: datetime = None, window_weeks: int = WINDOW_WEEKS, top_n: int = TOP_N):
+    """
+    Fold new complaints, test the last `window_weeks` weeks ending at `as_of` (default now) and
+    replace the mined ComplaintPattern rows with the top `top_n` findings.
+    Hand-written cards are only dropped once mining has something to show instead.
+    """
+    folded = fold_new_complaints(db)
+    as_of = as_of or datetime.now()
+    anchor, anchor_weekday = datetime.fromisoformat(week_start(as_of)), as_of.weekday()
+    weeks = [(anchor - timedelta(weeks=i)).date().isoformat() for i in range(window_weeks)]  # newest first
+
+    cube, districts, categories = _load_cube(db, weeks)
+    findings = find_patterns(cube, districts, categories, anchor_weekday)
+    # Keep one card per district/category/kind, strongest evidence first
+    findings.sort(key=lambda f: f["score"], reverse=True)
+    ranked, seen = [], set()
+    for finding in findings:
+        key = (finding["kind"], finding["district"], finding["category"])
+        if key not in seen:
+            seen.add(key)
+            ranked.append(finding)
+    ranked = ranked[:top_n]
+
+    if ranked:
+        db.query(ComplaintPattern).delete()
+    else:
+        db.query(ComplaintPattern).filter(ComplaintPattern.kind.isnot(None)).delete()
+    now = datetime.now()
+    for rank, finding in enumerate(ranked, 1):
+        db.add(ComplaintPattern(rank=rank, updated_at=now, **finding))
+    db.commit()
+    logger.info(f"Pattern mining: folded {folded} complaints, {len(findings)} findings, kept {len(ranked)}")
+    return {"folded": folded, "weeks": weeks, "findings": len(findings), "patterns": ranked}
+
+
+if __name__ == "__main__":
+    import json
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Mine complaint patterns into ComplaintPattern")
+    parser.add_argument("--as-of", type=datetime.fromisoformat, default=None, help="anchor date (default: now)")
+    parser.add_argument("--weeks", type=int, default=WINDOW_WEEKS)
+    parser.add_argument("--top", type=int, default=TOP_N)
+    parser.add_argument("--rebuild", action="store_true", help="drop the count cube and refold all complaints")
+    args = parser.parse_args()
+
+    from database import SessionLocal, migrate_schema
+    migrate_schema()
+    db = SessionLocal()
+    try:
+        if args.rebuild:
+            reset_cursors(db)
+        result = mine_patterns(db, args.as_of, args.weeks, args.top)
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    finally:
+        db.close()
@@ -1,4 +1,5 @@
 from agents.openai_service import get_openai_service
+from agents.classifier import get_local_classifier, cascade_stats, CONFIDENCE_THRESHOLD
 import json
 
 class PerceptionAgent:
@@ -27,6 +28,14 @@ class PerceptionAgent:
         """
 
     async def process(self, user_input: str, image_url: str = None):
+        # Cascade: answer obvious text-only cases locally, call the LLM only when unsure
+        if not image_url:
+            local = get_local_classifier().perceive(user_input)
+            if local["confidence"] >= CONFIDENCE_THRESHOLD:
+                cascade_stats.record("local")
+                return local
+        cascade_stats.record("llm")
+
         messages = [
             {"role": "system", "content": self.system_prompt},
             {"role": "user", "content": user_input}
@@ -37,7 +46,7 @@ class PerceptionAgent:
         # Logic: If image_url is provided, Vision extraction would happen first.
         
         try:
-            response_message = await self.service.get_chat_response(messages)
+            response_message = await self.service.get_chat_response(messages, agent="perception")
             content = response_message.content
             # Clean possible markdown code blocks
             if "```json" in content:
@@ -1,4 +1,5 @@
 from agents.openai_service import get_openai_service
+from agents.classifier import LocalClassifier
 import json
 
 class PlannerAgent:
@@ -21,6 +22,10 @@ class PlannerAgent:
         """
 
     async def create_plan(self, perception_data: dict):
+        # Confident local perceptions get the rule-based plan (same rules as the prompt above)
+        if perception_data.get("source") == "local":
+            return LocalClassifier.plan(perception_data)
+
         user_content = json.dumps(perception_data, ensure_ascii=False)
         messages = [
             {"role": "system", "content": self.system_prompt},
@@ -28,7 +33,7 @@ class PlannerAgent:
         ]
         
         try:
-            response_message = await self.service.get_chat_response(messages)
+            response_message = await self.service.get_chat_response(messages, agent="planner")
             content = response_message.content
             if "```json" in content:
                 content = content.replace("```json", "").replace("```", "")
@@ -0,0 +1,356 @@
+"""
+Asynchronous region analysis jobs.
+
+The retrieve -> analyze -> report graph takes two gpt-4o calls, long enough for proxies to
+drop the connection and for a client retry to start the whole analysis again. Instead,
+POST /api/map/analyze-region/jobs answers at once with a job id, a bounded pool of worker
+tasks (REGION_JOB_WORKERS) runs the graph, and clients poll the job or subscribe to its
+events (SSE) for status and partial results as each node finishes:
+
+    {"type": "queued"}  {"type": "started"}
+    {"type": "node", "node": "retrieve" | "analyze" | "report", "partial": {...}}
+    {"type": "done", "result": {...}}  |  {"type": "failed", "error": "..."}
+
+- A submission identical to one still queued or running (same polygon, rounded to ~1m)
+  gets that job's id instead of a second run.
+- At most REGION_JOB_MAX_PENDING jobs wait; beyond that submit raises admission.Overloaded
+  (429 with Retry-After), like the synchronous route.
+- Finished jobs are kept for REGION_JOB_TTL seconds, then dropped (checked on access).
+
+POST /api/map/analyze-region/stream runs the same graph inside the request instead and
+streams the same node events, plus the report's tokens as the model writes them
+({"type": "token", "text": "..."}), over SSE.
+
+Every run is checkpointed under its run id (the job id for jobs; see
+agents/analysis_checkpoints.py), so a failed job can be retried from where it stopped, or
+from a given node, without re-running the nodes before it.
+
+Jobs live in this process's memory and run on its event loop: with several API workers,
+job polling has to be sticky to the worker that accepted it. Run checkpoints are in the
+database and can be resumed anywhere.
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import logging
+
+import admission
+
+logger = logging.getLogger(__name__)
+
+WORKERS = int(os.getenv("REGION_JOB_WORKERS", "2"))
+MAX_PENDING = int(os.getenv("REGION_JOB_MAX_PENDING", "32"))
+TTL_SECONDS = float(os.getenv("REGION_JOB_TTL", "3600"))
+MAX_ATTEMPTS = 3  # admission refusals are retried after Retry-After
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+def analysis_state(polygon):
+    """Initial state of the region analysis graph."""
+    return {
+        "region_polygon": polygon,
+        "complaint_ids": [],
+        "themes": {},
+        "semantic_context": "",
+        "final_report": "",
+        "action_items": [],
+        "node_timings": {},
+    }
+
+
+def run_config(run_id, db=None):
+    """Graph config of a run: its checkpoint thread plus the DB session (config, not state: sessions don't serialize)."""
+    return {"configurable": {"thread_id": run_id, "db": db}}
+
+
+async def resume_config(run_id, db, from_node=None):
+    """
+    Config that continues a run from its last checkpoint (the failed node runs again), or
+    with from_node, re-runs that node and everything after it from the checkpoint taken
+    just before it last ran. Raises ValueError when the run never reached from_node.
+    """
+    if from_node is None:
+        return run_config(run_id, db)
+    from agents.context_analysis_agent import get_analysis_graph
+
+    async for snapshot in get_analysis_graph().aget_state_history(run_config(run_id)):
+        if from_node in snapshot.next:  # newest first
+            return {"configurable": {**snapshot.config["configurable"], "db": db}}
+    raise ValueError(f"Run {run_id} has no checkpoint before node '{from_node}'")
+
+
+async def run_status(run_id):
+    """Checkpointed state of a run: next node(s), per-node timings, node errors, result when done. None if unknown."""
+    from agents.context_analysis_agent import get_analysis_graph
+
+    snapshot = await get_analysis_graph().aget_state(run_config(run_id))
+    if snapshot.created_at is None:
+        return None
+    values = snapshot.values
+    done = not snapshot.next
+    return {
+        "run_id": run_id,
+        "done": done,
+        "next": list(snapshot.next),
+        "node_timings": values.get("node_timings", {}),
+        "errors": [{"node": task.name, "error": str(task.error)} for task in snapshot.tasks if task.error],
+        "complaint_count": len(values.get("complaint_ids", [])),
+        "updated_at": snapshot.created_at,
+        "result": analysis_result(values) if done else None,
+    }
+
+
+def analysis_result(state):
+    """Response body of a finished analysis (the synchronous endpoint's fields plus the chart data)."""
+    return {
+        "report": state.get("final_report", "Analysis Failed"),
+        "context": state.get("semantic_context", ""),
+        "themes": state.get("themes", {}),
+        "chart_data": state.get("chart_data", {}),
+        "urgency_score": state.get("urgency_score"),
+        "sentiment_breakdown": state.get("sentiment_breakdown", {}),
+        "node_timings": state.get("node_timings", {}),
+    }
+
+
+def _partial(node, update):
+    """What a finished node contributes to the job's partial result (no raw complaint text)."""
+    if node == "retrieve":
+        return {"complaint_count": len(update.get("complaint_ids", []))}
+    if node == "analyze":
+        return {key: update[key] for key in ("semantic_context", "themes", "chart_data", "urgency_score", "sentiment_breakdown") if key in update}
+    if node == "report":
+        return {"report": update.get("final_report", "")}
+    return {}
+
+
+async def analysis_events(inputs, config, tokens: bool = False):
+    """
+    Run the graph, yielding {"type": "node", "node", "seconds", "partial"} as each node
+    finishes and, with tokens=True, {"type": "token", "text"} for each chunk of the report
+    as the model streams it. A report that arrived whole (cassette replay, a model that
+    doesn't stream) is sent as a single token event.
+    """
+    from agents.context_analysis_agent import get_analysis_graph
+
+    streamed = False
+    modes = ["updates", "messages"] if tokens else ["updates"]
+    async for mode, chunk in get_analysis_graph().astream(inputs, config, stream_mode=modes):
+        if mode == "messages":
+            message, meta = chunk
+            if meta.get("langgraph_node") == "report" and message.content:
+                streamed = True
+                yield {"type": "token", "text": message.content}
+            continue
+        for node, output in chunk.items():
+            output = output or {}
+            if tokens and node == "report" and not streamed and output.get("final_report"):
+                yield {"type": "token", "text": output["final_report"]}
+            yield {"type": "node", "node": node, "seconds": output.get("node_timings", {}).get(node), "partial": _partial(node, output)}
+
+
+def polygon_key(polygon) -> str:
+    rounded = [[round(lat, 5), round(lng, 5)] for lat, lng in polygon]
+    return hashlib.sha1(json.dumps(rounded).encode("utf-8")).hexdigest()
+
+
+class RegionJob:
+    def __init__(self, key, polygon):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.polygon = polygon
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.nodes = []  # [{"node", "seconds"}] in completion order
+        self.partial = {}
+        self.result = None
+        self.error = None
+        self.resume = False  # continue from the run's checkpoints instead of starting over
+        self.from_node = None
+        self.events = []
+        self._changed = asyncio.Event()
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+    def publish(self, event):
+        self.events.append(event)
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "nodes": self.nodes,
+            "partial": self.partial,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class RegionJobs:
+    """Job table plus worker pool; lives on the event loop thread (no locking needed)."""
+
+    def __init__(self, session_factory=None, workers: int = WORKERS, max_pending: int = MAX_PENDING, ttl: float = TTL_SECONDS):
+        if session_factory is None:
+            from database import SessionLocal
+            session_factory = SessionLocal
+        self.session_factory = session_factory
+        self.workers = workers
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.jobs = {}  # job id -> RegionJob
+        self.in_flight = {}  # polygon key -> queued/running RegionJob
+        self._queue = None
+        self._tasks = []
+
+    # --- Lifecycle (app lifespan) ---
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for job in list(self.in_flight.values()):
+            self._finish(job, FAILED, error="server shutting down")
+
+    # --- Public API ---
+    def submit(self, polygon):
+        """Returns (job, deduplicated)."""
+        self._expire()
+        key = polygon_key(polygon)
+        job = self.in_flight.get(key)
+        if job is not None:
+            return job, True
+        pending = sum(1 for job in self.in_flight.values() if job.status == QUEUED)
+        if pending >= self.max_pending:
+            raise admission.Overloaded(429, "job_queue_full", self._retry_after(), "analyze_region_jobs")
+        job = RegionJob(key, polygon)
+        self.jobs[job.id] = job
+        self.in_flight[key] = job
+        job.publish({"type": "queued", "job_id": job.id})
+        self._queue.put_nowait(job)
+        return job, False
+
+    def retry(self, job, from_node=None):
+        """Re-queue a finished job: resumes its run from the last checkpoint, or from `from_node`."""
+        if not job.finished:
+            return False
+        if job.key in self.in_flight:  # an identical job started meanwhile
+            return False
+        job.status, job.result, job.error, job.finished_at = QUEUED, None, None, None
+        job.resume, job.from_node = True, from_node
+        self.in_flight[job.key] = job
+        job.publish({"type": "queued", "job_id": job.id, "from_node": from_node})
+        self._queue.put_nowait(job)
+        return True
+
+    def get(self, job_id):
+        self._expire()
+        return self.jobs.get(job_id)
+
+    async def follow(self, job, after: int = 0):
+        """Events of a job from index `after`, waiting for new ones until it finishes."""
+        i = after
+        while True:
+            changed = job._changed
+            while i < len(job.events):
+                yield job.events[i]
+                i += 1
+            if job.finished:
+                return
+            await changed.wait()
+
+    def status(self):
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        for job in self.jobs.values():
+            counts[job.status] += 1
+        return {"workers": self.workers, "max_pending": self.max_pending, "ttl_seconds": self.ttl, "jobs": counts}
+
+    # --- Internal ---
+    def _retry_after(self):
+        durations = [job.finished_at - job.started_at for job in self.jobs.values() if job.status == DONE]
+        per_job = sum(durations) / len(durations) if durations else 30.0
+        return max(1, int(per_job * self.max_pending / max(self.workers, 1)))
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        expired = [job_id for job_id, job in self.jobs.items() if job.finished and job.finished_at < cutoff]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    def _finish(self, job, status, result=None, error=None):
+        job.status, job.result, job.error = status, result, error
+        job.finished_at = time.time()
+        if self.in_flight.get(job.key) is job:
+            del self.in_flight[job.key]
+        job.publish({"type": status, "result": result} if status == DONE else {"type": status, "error": error})
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                self._finish(job, FAILED, error="cancelled")
+                raise
+            except Exception as e:
+                logger.error(f"Region analysis job {job.id} failed: {e}")
+                self._finish(job, FAILED, error=str(e))
+
+    async def _run(self, job):
+        from agents.context_analysis_agent import get_analysis_graph
+
+        job.status, job.started_at = RUNNING, time.time()
+        job.publish({"type": "started"})
+        db = self.session_factory()  # the submitting request has long returned
+        try:
+            if job.resume:
+                inputs, config = None, await resume_config(job.id, db, job.from_node)
+            else:
+                inputs, config = analysis_state(job.polygon), run_config(job.id, db)  # the job id is the run id
+            for attempt in range(1, MAX_ATTEMPTS + 1):
+                try:
+                    async with admission.slot("analyze_region", admission.INTERACTIVE):
+                        async for event in analysis_events(inputs, config):
+                            job.nodes.append({"node": event["node"], "seconds": event["seconds"]})
+                            job.partial.update(event["partial"])
+                            job.publish({"type": "node", "node": event["node"], "partial": event["partial"]})
+                    break
+                except admission.Overloaded as e:
+                    if attempt == MAX_ATTEMPTS:
+                        raise
+                    await asyncio.sleep(e.retry_after)
+                    # Nodes that finished before the refusal are checkpointed: continue after them.
+                    # A refusal at admission ran nothing, so there is no checkpoint to resume from
+                    if (await get_analysis_graph().aget_state(run_config(job.id))).created_at is not None:
+                        inputs, config = None, run_config(job.id, db)
+                    elif not job.resume:
+                        inputs, config = analysis_state(job.polygon), run_config(job.id, db)
+        finally:
+            db.close()
+        state = await get_analysis_graph().aget_state(run_config(job.id))
+        self._finish(job, DONE, result=analysis_result(state.values))
+
+
+# Singleton Instance (started/stopped by the app lifespan)
+region_jobs = None
+def get_region_jobs():
+    global region_jobs
+    if region_jobs is None:
+        region_jobs = RegionJobs()
+    return region_jobs
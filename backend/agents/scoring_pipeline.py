@@ -0,0 +1,332 @@
+import os
+import json
+import uuid
+import time
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, select
+
+import sharding
+from agents.openai_service import get_openai_service
+from database import SessionLocal
+from models import MockComplaint, ScoringJob
+
+logger = logging.getLogger(__name__)
+
+# Bump PROMPT_VERSION whenever the scoring prompt/schema changes: rows with an older
+# version are picked up again by enqueue_stale(), everything else is skipped.
+PROMPT_VERSION = "v1"
+SCORING_MODEL = os.getenv("SCORING_MODEL", "gpt-4o")
+MODEL_VERSION = f"{SCORING_MODEL}:{PROMPT_VERSION}"
+
+BATCH_SIZE = int(os.getenv("SCORING_BATCH_SIZE", "8"))  # complaints per LLM request
+WORKERS = int(os.getenv("SCORING_WORKERS", "4"))
+REQUESTS_PER_MINUTE = int(os.getenv("SCORING_RPM", "60"))
+MAX_ATTEMPTS = 3  # tries per enqueue round before a job rests as failed
+MAX_TOTAL_ATTEMPTS = int(os.getenv("SCORING_MAX_TOTAL_ATTEMPTS", "9"))  # enqueue_stale retries failed jobs below this
+LEASE_SECONDS = 300
+RECOVER_INTERVAL_SECONDS = 60  # how often the worker loop reclaims expired leases
+RATE_LIMIT_BACKOFF_SECONDS = 10
+
+SCORE_FIELDS = [
+    "urgency_score", "safety_risk_score", "inconvenience_score",
+    "visual_impact_score", "sentiment_score", "probability_of_escalation",
+]
+
+SYSTEM_PROMPT = """
+너는 부산광역시 민원 평가 AI야. 여러 건의 민원을 받아 각 민원의 지표를 독립적으로 평가해.
+- urgency_score, safety_risk_score, inconvenience_score, visual_impact_score, sentiment_score: 1~10 정수
+- probability_of_escalation: 방치 시 문제 확산 확률 (0~100 정수)
+- estimated_cost: Low / Medium / High, legal_risk: Low / High
+- department_in_charge: 담당 부서 (예: "수영구 환경위생과")
+입력 민원의 id를 그대로 돌려주고, 모든 민원에 대해 정확히 하나의 결과를 출력해.
+"""
+
+# Structured output: the API guarantees this shape, so parsing never needs markdown cleanup.
+RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "complaint_scores",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "results": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "id": {"type": "string"},
+                            **{field: {"type": "integer"} for field in SCORE_FIELDS},
+                            "estimated_cost": {"type": "string", "enum": ["Low", "Medium", "High"]},
+                            "legal_risk": {"type": "string", "enum": ["Low", "High"]},
+                            "required_personnel": {"type": "string"},
+                            "department_in_charge": {"type": "string"},
+                        },
+                        "required": ["id", *SCORE_FIELDS, "estimated_cost", "legal_risk", "required_personnel", "department_in_charge"],
+                        "additionalProperties": False,
+                    },
+                }
+            },
+            "required": ["results"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+class RateLimiter:
+    """Token bucket shared by all workers (requests per minute)."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = max(1, per_minute)
+        self.tokens = float(self.capacity)
+        self.rate = self.capacity / 60.0
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+# --- Queue Operations ---
+
+def enqueue_stale(db, model_version: str = MODEL_VERSION, limit: int = None):
+    """
+    Enqueue complaints never scored by `model_version` (incremental: already-scored rows are skipped).
+    Complaints with a pending, running or done job are left alone; a failed job goes back to
+    'pending' while it has fewer than MAX_TOTAL_ATTEMPTS attempts. Returns the number of jobs queued.
+    """
+    queued = select(ScoringJob.complaint_id).where(
+        ScoringJob.model_version == model_version,
+        or_(ScoringJob.status.in_(("pending", "running", "done")), ScoringJob.attempts >= MAX_TOTAL_ATTEMPTS),
+    )
+    stale = or_(MockComplaint.scoring_model_version.is_(None), MockComplaint.scoring_model_version != model_version)
+    ids = []
+    with sharding.complaint_sources(db) as sources:
+        for _, source in sources:
+            if source is db:
+                query = db.query(MockComplaint.id).filter(stale, MockComplaint.id.notin_(queued))
+                ids += [row.id for row in (query.limit(limit - len(ids)) if limit else query)]
+            else:
+                # Shard: the job table lives in complaints.db, so drop already queued ids per chunk
+                candidates = [row.id for row in source.query(MockComplaint.id).filter(stale)]
+                for i in range(0, len(candidates), 500):
+                    chunk = candidates[i:i + 500]
+                    known = set(db.scalars(queued.where(ScoringJob.complaint_id.in_(chunk))))
+                    ids += [c_id for c_id in chunk if c_id not in known]
+            if limit and len(ids) >= limit:
+                ids = ids[:limit]
+                break
+
+    retried = set()
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        failed_jobs = ScoringJob.model_version == model_version, ScoringJob.complaint_id.in_(chunk), ScoringJob.status == "failed"
+        retried.update(db.scalars(select(ScoringJob.complaint_id).where(*failed_jobs)))
+        db.query(ScoringJob).filter(*failed_jobs).update({"status": "pending", "worker_id": None, "lease_until": None},
+                                                    synchronize_session=False)
+    db.add_all(ScoringJob(complaint_id=c_id, model_version=model_version, status="pending", attempts=0)
+               for c_id in ids if c_id not in retried)
+    db.commit()
+    return len(ids)
+
+
+def recover_expired(db):
+    """Crash recovery: jobs left 'running' by a dead worker go back to 'pending' once their lease expires."""
+    count = db.query(ScoringJob).filter(
+        ScoringJob.status == "running", ScoringJob.lease_until < datetime.now()
+    ).update({"status": "pending", "worker_id": None, "lease_until": None}, synchronize_session=False)
+    db.commit()
+    return count
+
+
+def claim_batch(db, worker_id: str, size: int = BATCH_SIZE):
+    """Atomically lease up to `size` pending jobs (single UPDATE, safe across processes)."""
+    pending = select(ScoringJob.id).where(ScoringJob.status == "pending").order_by(ScoringJob.id).limit(size)
+    db.query(ScoringJob).filter(ScoringJob.id.in_(pending)).update(
+        {
+            "status": "running",
+            "worker_id": worker_id,
+            "lease_until": datetime.now() + timedelta(seconds=LEASE_SECONDS),
+            "attempts": ScoringJob.attempts + 1,
+        },
+        synchronize_session=False,
+    )
+    db.commit()
+    return db.query(ScoringJob).filter(ScoringJob.worker_id == worker_id, ScoringJob.status == "running").all()
+
+
+def queue_status(db):
+    rows = db.query(ScoringJob.status, ScoringJob.model_version).all()
+    counts = {}
+    for status, version in rows:
+        counts.setdefault(version, {}).setdefault(status, 0)
+        counts[version][status] += 1
+    return counts
+
+
+# --- Scoring ---
+
+def _build_prompt(complaints):
+    items = [
+        {
+            "id": c.id,
+            "category": c.category,
+            "location": c.location,
+            "summary": c.summary,
+            "original_text": c.original_text,
+        }
+        for c in complaints
+    ]
+    return json.dumps(items, ensure_ascii=False)
+
+
+def _clamp(value, low, high):
+    return max(low, min(high, int(value)))
+
+
+def apply_scores(complaint, scores, model_version):
+    for field in SCORE_FIELDS:
+        if field == "probability_of_escalation":
+            setattr(complaint, field, _clamp(scores[field], 0, 100))
+        else:
+            setattr(complaint, field, _clamp(scores[field], 1, 10))
+    complaint.estimated_cost = scores["estimated_cost"]
+    complaint.legal_risk = scores["legal_risk"]
+    complaint.required_personnel = scores["required_personnel"]
+    complaint.department_in_charge = scores["department_in_charge"]
+    complaint.scoring_model_version = model_version
+    complaint.scored_at = datetime.now()
+
+
+async def score_batch(service, complaints):
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": _build_prompt(complaints)},
+    ]
+    response = await service.get_chat_response(messages, response_format=RESPONSE_FORMAT, model=SCORING_MODEL, agent="scoring")
+    data = json.loads(response.content)
+    return {item["id"]: item for item in data.get("results", [])}
+
+
+class ScoringWorkerPool:
+    def __init__(self, workers: int = WORKERS, batch_size: int = BATCH_SIZE, requests_per_minute: int = REQUESTS_PER_MINUTE):
+        self.service = get_openai_service()
+        self.workers = workers
+        self.batch_size = batch_size
+        self.limiter = RateLimiter(requests_per_minute)
+        self.scored = 0
+        self.failed = 0
+        self.recovered_at = None
+
+    def _recover(self, db):
+        """Reclaim expired leases (crashed workers, other processes) every RECOVER_INTERVAL_SECONDS."""
+        now = time.monotonic()
+        if self.recovered_at is not None and now - self.recovered_at < RECOVER_INTERVAL_SECONDS:
+            return
+        self.recovered_at = now
+        recovered = recover_expired(db)
+        if recovered:
+            logger.info(f"Recovered {recovered} expired scoring jobs")
+
+    async def _worker(self, index: int):
+        worker_id = f"{os.getpid()}-{index}-{uuid.uuid4().hex[:8]}"
+        while True:
+            db = SessionLocal()
+            try:
+                self._recover(db)
+                jobs = claim_batch(db, worker_id, self.batch_size)
+                if not jobs:
+                    return
+                # Complaints are read and scored where they live (complaints.db, or their district shard)
+                with sharding.complaints_by_source(db, [j.complaint_id for j in jobs]) as groups:
+                    by_id = {}
+                    for source, ids in groups:
+                        by_id.update((c.id, c) for c in source.query(MockComplaint).filter(MockComplaint.id.in_(ids)))
+                    await self._score(worker_id, jobs, by_id)
+                    for source, _ in groups:
+                        if source is not db:
+                            source.commit()  # shard scores first: a crash before the job commit only re-scores
+                db.commit()  # scores (single file) and job state land in the same transaction
+            finally:
+                db.close()
+
+    async def _score(self, worker_id, jobs, by_id):
+        await self.limiter.acquire()
+        try:
+            results = await score_batch(self.service, list(by_id.values()))
+            error = None
+        except Exception as e:
+            logger.error(f"Scoring batch failed ({worker_id}): {e}")
+            results, error = {}, str(e)
+            if getattr(e, "status_code", None) == 429:
+                # Upstream rate limit: back off before this worker claims again
+                await asyncio.sleep(RATE_LIMIT_BACKOFF_SECONDS * jobs[0].attempts)
+
+        for job in jobs:
+            complaint = by_id.get(job.complaint_id)
+            scores = results.get(job.complaint_id)
+            if complaint is None:
+                job.status, job.error = "failed", "complaint deleted"
+            elif scores:
+                apply_scores(complaint, scores, job.model_version)
+                job.status, job.error = "done", None
+                self.scored += 1
+            else:
+                # Retry later (whole-batch error or item missing from the response); every
+                # MAX_ATTEMPTS tries it rests as failed until enqueue_stale gives it another round
+                job.error = error or "missing from model response"
+                if job.attempts % MAX_ATTEMPTS == 0 or job.attempts >= MAX_TOTAL_ATTEMPTS:
+                    job.status = "failed"
+                    self.failed += 1
+                else:
+                    job.status = "pending"
+            job.worker_id, job.lease_until = None, None
+
+    async def run(self):
+        await asyncio.gather(*(self._worker(i) for i in range(self.workers)))
+        return {"scored": self.scored, "failed": self.failed}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Batch re-score stored complaints")
+    parser.add_argument("--enqueue", action="store_true", help="queue complaints not yet scored by the current model version")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--rpm", type=int, default=REQUESTS_PER_MINUTE)
+    parser.add_argument("--status", action="store_true")
+    args = parser.parse_args()
+
+    from pathlib import Path
+    from dotenv import load_dotenv
+    from database import migrate_schema
+    load_dotenv(dotenv_path=Path(__file__).resolve().parent.parent.parent / ".env")
+    migrate_schema()
+
+    db = SessionLocal()
+    try:
+        if args.enqueue:
+            print(f"Queued {enqueue_stale(db)} complaints for {MODEL_VERSION}")
+        if args.status:
+            print(json.dumps(queue_status(db), ensure_ascii=False, indent=2))
+    finally:
+        db.close()
+
+    if not args.status:
+        if get_openai_service().mock_mode:
+            raise SystemExit("OPENAI_API_KEY is not set; refusing to score in mock mode.")
+        pool = ScoringWorkerPool(args.workers, args.batch_size, args.rpm)
+        print(asyncio.run(pool.run()))
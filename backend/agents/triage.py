@@ -0,0 +1,413 @@
+"""
+Per-department triage queues: "what should 도로관리과 handle next?"
+
+Each department_in_charge has an indexed binary heap (heap + position map), so insert,
+priority update, removal and claim are O(log n) and peeking the top k is O(k log k).
+
+Composite priority (higher = sooner):
+    priority(t) = W_URGENCY * urgency + W_SAFETY * safety_risk + W_ESCALATION * escalation%
+                + W_DUPLICATES * log2(1 + duplicates) + AGE_PER_HOUR * age_hours(t)
+Aging is linear, so priority(t) = static_key + AGE_PER_HOUR * t: every item ages at the same
+rate and heap order never goes stale. Only the static key is stored.
+
+Duplicates are other open complaints of the same category within the same ~200m cell; a new
+report raises the priority of every report in its group.
+
+The database stays the source of truth: claims are a conditional UPDATE (safe across worker
+processes) and queues resync from the DB every RESYNC_SECONDS to pick up rows written by
+other processes (batch scoring, other workers). With district shards (sharding.py) the queues
+load from every shard and claims update the shard holding the complaint.
+"""
+import os
+import math
+import heapq
+import logging
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import func
+
+from models import MockComplaint
+from sharding import complaint_session, scatter_complaints
+
+logger = logging.getLogger(__name__)
+
+STATUS_OPEN = "접수완료"
+STATUS_IN_PROGRESS = "처리중"
+STATUS_RESOLVED = "처리완료"
+UNASSIGNED = "미배정"
+
+W_URGENCY = 3.0
+W_SAFETY = 4.0
+W_ESCALATION = 0.2  # per % -> up to 20 points
+W_DUPLICATES = 5.0
+AGE_PER_HOUR = 0.25  # 6 points per day waiting
+DUPLICATE_CELL_DEG = 0.002  # ~200m
+RESYNC_SECONDS = float(os.getenv("TRIAGE_RESYNC_SECONDS", "300"))
+
+_EPOCH = datetime(2020, 1, 1)
+
+
+def _hours(moment: datetime):
+    return ((moment or datetime.now()).replace(tzinfo=None) - _EPOCH).total_seconds() / 3600
+
+
+def static_priority(urgency, safety, escalation, duplicates, created_at):
+    """Time-independent part of the priority; add AGE_PER_HOUR * now_hours for the live value."""
+    return (
+        W_URGENCY * (urgency or 0)
+        + W_SAFETY * (safety or 0)
+        + W_ESCALATION * (escalation or 0)
+        + W_DUPLICATES * math.log2(1 + duplicates)
+        - AGE_PER_HOUR * _hours(created_at)
+    )
+
+
+class IndexedHeap:
+    """Max-heap of item ids keyed by priority, with a position map for O(log n) update/remove."""
+
+    def __init__(self):
+        self._heap = []  # [(priority, item_id)]
+        self._pos = {}  # item_id -> index in _heap
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __contains__(self, item_id):
+        return item_id in self._pos
+
+    def _higher(self, a, b):
+        # Higher priority first; ties go to the smaller id for a stable order
+        return a[0] > b[0] or (a[0] == b[0] and a[1] < b[1])
+
+    def _swap(self, i, j):
+        heap = self._heap
+        heap[i], heap[j] = heap[j], heap[i]
+        self._pos[heap[i][1]] = i
+        self._pos[heap[j][1]] = j
+
+    def _sift_up(self, i):
+        while i > 0:
+            parent = (i - 1) // 2
+            if not self._higher(self._heap[i], self._heap[parent]):
+                break
+            self._swap(i, parent)
+            i = parent
+
+    def _sift_down(self, i):
+        n = len(self._heap)
+        while True:
+            best = i
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < n and self._higher(self._heap[child], self._heap[best]):
+                    best = child
+            if best == i:
+                return
+            self._swap(i, best)
+            i = best
+
+    @classmethod
+    def build(cls, entries):
+        """Heapify [(priority, item_id)] in O(n) (bulk load)."""
+        heap = cls()
+        heap._heap = list(entries)
+        heap._pos = {item_id: i for i, (_, item_id) in enumerate(heap._heap)}
+        for i in reversed(range(len(heap._heap) // 2)):
+            heap._sift_down(i)
+        return heap
+
+    def push(self, item_id, priority):
+        """Insert or update."""
+        i = self._pos.get(item_id)
+        if i is not None:
+            old = self._heap[i][0]
+            self._heap[i] = (priority, item_id)
+            self._sift_up(i) if priority > old else self._sift_down(i)
+            return
+        self._heap.append((priority, item_id))
+        self._pos[item_id] = len(self._heap) - 1
+        self._sift_up(len(self._heap) - 1)
+
+    def remove(self, item_id):
+        i = self._pos.pop(item_id, None)
+        if i is None:
+            return False
+        last = self._heap.pop()
+        if i < len(self._heap):
+            self._heap[i] = last
+            self._pos[last[1]] = i
+            self._sift_up(i)
+            self._sift_down(self._pos[last[1]])
+        return True
+
+    def priority(self, item_id):
+        i = self._pos.get(item_id)
+        return self._heap[i][0] if i is not None else None
+
+    def top(self, k: int):
+        """[(priority, item_id)] of the k highest without modifying the heap (O(k log k))."""
+        if not self._heap or k <= 0:
+            return []
+        result = []
+        frontier = [(-self._heap[0][0], self._heap[0][1], 0)]
+        while frontier and len(result) < k:
+            neg, item_id, i = heapq.heappop(frontier)
+            result.append((-neg, item_id))
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(self._heap):
+                    priority, child_id = self._heap[child]
+                    heapq.heappush(frontier, (-priority, child_id, child))
+        return result
+
+
+class TriageQueues:
+    def __init__(self, session_factory=None):
+        if session_factory is None:
+            from database import SessionLocal
+            session_factory = SessionLocal
+        self.session_factory = session_factory
+        self.queues = {}  # department -> IndexedHeap
+        self.items = {}  # complaint_id -> item dict
+        self.groups = {}  # (category, cell) -> set of complaint ids
+        self._lock = threading.RLock()
+        self._synced_at = None
+        self._resyncing = False
+
+    # --- Loading ---
+    def _ensure_synced(self):
+        if self._synced_at is None:
+            self.resync()
+        elif time.monotonic() - self._synced_at > RESYNC_SECONDS and not self._resyncing:
+            # Stale: keep serving the current queues and rebuild in the background
+            self._resyncing = True
+            threading.Thread(target=self.resync, daemon=True).start()
+
+    def resync(self):
+        """Rebuild every queue from the open complaints in the DB (heapify, O(n))."""
+        try:
+            self._load()
+        finally:
+            self._resyncing = False
+
+    @staticmethod
+    def _open_rows(db):
+        return db.query(
+            MockComplaint.id, MockComplaint.summary, MockComplaint.location, MockComplaint.category,
+            MockComplaint.lat, MockComplaint.lng, MockComplaint.department_in_charge,
+            MockComplaint.urgency_score, MockComplaint.safety_risk_score,
+            MockComplaint.probability_of_escalation, MockComplaint.created_at,
+        ).filter(MockComplaint.status == STATUS_OPEN).all()
+
+    def _load(self):
+        db = self.session_factory()
+        try:
+            rows = [row for part in scatter_complaints(db, self._open_rows) for row in part]
+        finally:
+            db.close()
+
+        items, groups = {}, {}
+        for row in rows:
+            item = self._item(row)
+            items[item["id"]] = item
+            if item["group"]:
+                groups.setdefault(item["group"], set()).add(item["id"])
+        entries = {}
+        for c_id, item in items.items():
+            duplicates = len(groups[item["group"]]) - 1 if item["group"] else 0
+            key = static_priority(
+                item["urgency_score"], item["safety_risk_score"], item["probability_of_escalation"],
+                duplicates, item["created_at"],
+            )
+            entries.setdefault(item["department"], []).append((key, c_id))
+
+        with self._lock:
+            self.items, self.groups = items, groups
+            self.queues = {dept: IndexedHeap.build(pairs) for dept, pairs in entries.items()}
+            self._synced_at = time.monotonic()
+        logger.info(f"Triage queues synced: {len(rows)} open complaints in {len(self.queues)} departments")
+
+    @staticmethod
+    def _item(row):
+        group = None
+        if row.lat is not None and row.lng is not None:
+            group = (row.category, math.floor(row.lat / DUPLICATE_CELL_DEG), math.floor(row.lng / DUPLICATE_CELL_DEG))
+        return {
+            "id": row.id,
+            "summary": row.summary,
+            "location": row.location,
+            "category": row.category,
+            "department": row.department_in_charge or UNASSIGNED,
+            "urgency_score": row.urgency_score,
+            "safety_risk_score": row.safety_risk_score,
+            "probability_of_escalation": row.probability_of_escalation,
+            "created_at": row.created_at,
+            "group": group,
+        }
+
+    # --- Internal (lock held) ---
+    def _duplicates(self, item):
+        return len(self.groups.get(item["group"], ())) - 1 if item["group"] else 0
+
+    def _reprioritize(self, c_id):
+        item = self.items[c_id]
+        key = static_priority(
+            item["urgency_score"], item["safety_risk_score"], item["probability_of_escalation"],
+            self._duplicates(item), item["created_at"],
+        )
+        self.queues.setdefault(item["department"], IndexedHeap()).push(c_id, key)
+
+    def _add(self, item):
+        self._discard(item["id"])
+        self.items[item["id"]] = item
+        if not item["group"]:
+            self._reprioritize(item["id"])
+            return
+        members = self.groups.setdefault(item["group"], set())
+        members.add(item["id"])
+        for c_id in members:
+            self._reprioritize(c_id)
+
+    def _discard(self, c_id):
+        item = self.items.pop(c_id, None)
+        if item is None:
+            return None
+        queue = self.queues.get(item["department"])
+        if queue is not None:
+            queue.remove(c_id)
+            if not queue:
+                del self.queues[item["department"]]
+        if item["group"]:
+            members = self.groups.get(item["group"])
+            members.discard(c_id)
+            if members:
+                for other in members:
+                    self._reprioritize(other)
+            else:
+                del self.groups[item["group"]]
+        return item
+
+    def _view(self, c_id, key, now_hours):
+        item = self.items[c_id]
+        return {
+            "id": c_id,
+            "summary": item["summary"],
+            "location": item["location"],
+            "category": item["category"],
+            "department": item["department"],
+            "priority": round(key + AGE_PER_HOUR * now_hours, 2),
+            "urgency_score": item["urgency_score"],
+            "safety_risk_score": item["safety_risk_score"],
+            "probability_of_escalation": item["probability_of_escalation"],
+            "duplicates": self._duplicates(item),
+            "created_at": item["created_at"].isoformat() if item["created_at"] else None,
+        }
+
+    # --- Public API ---
+    def upsert(self, complaint):
+        """Add/refresh a complaint (any object with MockComplaint attributes); closed ones are dropped."""
+        with self._lock:
+            if self._synced_at is None:
+                return  # first read will load it from the DB
+            if complaint.status != STATUS_OPEN:
+                self._discard(complaint.id)
+            else:
+                self._add(self._item(complaint))
+
+    def departments(self):
+        self._ensure_synced()
+        with self._lock:
+            return {dept: len(queue) for dept, queue in sorted(self.queues.items())}
+
+    def peek(self, department: str, k: int = 5):
+        self._ensure_synced()
+        now_hours = _hours(datetime.now())
+        with self._lock:
+            queue = self.queues.get(department)
+            if queue is None:
+                return []
+            return [self._view(c_id, key, now_hours) for key, c_id in queue.top(k)]
+
+    def claim(self, db, department: str, assignee: str, complaint_id: str = None):
+        """
+        Move the top open complaint (or `complaint_id`) of a department to 처리중.
+        The DB update is conditional on the row still being open, so two workers never claim
+        the same complaint; stale heap entries are dropped and the next one is tried. If the
+        update itself fails, the complaint goes back in its queue and the error propagates.
+        """
+        self._ensure_synced()
+        now_hours = _hours(datetime.now())
+        while True:
+            with self._lock:
+                queue = self.queues.get(department)
+                if complaint_id is not None:
+                    if complaint_id not in self.items or self.items[complaint_id]["department"] != department:
+                        return None
+                    c_id = complaint_id
+                elif queue:
+                    c_id = queue.top(1)[0][1]
+                else:
+                    return None
+                view = self._view(c_id, self.queues[department].priority(c_id), now_hours)
+                item = self._discard(c_id)  # taken out first, so other claimers here move on to the next
+
+            try:
+                with complaint_session(db, c_id) as cdb:
+                    claimed = cdb.query(MockComplaint).filter(
+                        MockComplaint.id == c_id, MockComplaint.status == STATUS_OPEN
+                    ).update({"status": STATUS_IN_PROGRESS, "claimed_by": assignee, "claimed_at": datetime.now()}, synchronize_session=False)
+                    cdb.commit()
+            except Exception:
+                with self._lock:
+                    if c_id not in self.items:  # unless a resync or upsert brought it back meanwhile
+                        self._add(item)
+                raise
+            if claimed:
+                with self._lock:
+                    self._discard(c_id)  # a resync that read the row before the commit reloaded it
+                view["status"] = STATUS_IN_PROGRESS
+                view["claimed_by"] = assignee
+                return view
+            if complaint_id is not None:
+                return None
+
+    def release(self, db, complaint_id: str):
+        """Put a claimed complaint back in its queue."""
+        with complaint_session(db, complaint_id) as cdb:
+            complaint = cdb.get(MockComplaint, complaint_id)
+            if complaint is None or complaint.status != STATUS_IN_PROGRESS:
+                return None
+            complaint.status, complaint.claimed_by, complaint.claimed_at = STATUS_OPEN, None, None
+            cdb.commit()
+            cdb.refresh(complaint)  # load it before a shard session closes
+        self.upsert(complaint)
+        return complaint
+
+    def resolve(self, db, complaint_id: str):
+        with complaint_session(db, complaint_id) as cdb:
+            complaint = cdb.get(MockComplaint, complaint_id)
+            if complaint is None:
+                return None
+            if complaint.status != STATUS_RESOLVED:
+                complaint.status = STATUS_RESOLVED
+                complaint.resolved_at = datetime.now()
+                cdb.commit()
+                cdb.refresh(complaint)
+        self.upsert(complaint)
+        return complaint
+
+
+def resolved_today(db):
+    midnight = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    return db.query(func.count(MockComplaint.id)).filter(
+        MockComplaint.status == STATUS_RESOLVED, MockComplaint.resolved_at >= midnight
+    ).scalar()
+
+
+# Singleton Instance
+triage_queues = None
+def get_triage_queues():
+    global triage_queues
+    if triage_queues is None:
+        triage_queues = TriageQueues()
+    return triage_queues
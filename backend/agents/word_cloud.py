@@ -0,0 +1,451 @@
+"""
+Data-driven map word cloud (WordCloudItem).
+
+Complaints are bucketed into a CELL_DEG grid. Keywords come from summary + original_text:
+eojeol (space-separated words) with particles/endings stripped, plus adjacent-word bigrams
+("도로 파손"), minus stop words and place names. Each cell is treated as one document:
+
+    weight(term, cell) = df(term, cell) * log((1 + N_cells) / (1 + cells_with_term)) [* BIGRAM_BOOST]
+
+so a term many complaints in one area mention, but few other areas do, wins that cell.
+
+Maintenance is incremental and follows the complaint change log (agents/complaint_changes.py):
+refresh_word_cloud() takes the complaints inserted, updated or deleted since its cursor,
+takes each one's previous contribution (WordCloudDoc) back out of WordCloudCell/WordCloudTerm
+and adds its current one, recomputes the top terms of the touched cells and then re-maps
+weights to size/class_name over the (small) WordCloudItem table. The cursor is advanced
+with a compare-and-set before anything is counted, so concurrent refreshes never fold the
+same changes twice; a cursor the log has been truncated past triggers a full rebuild. With
+district shards each shard's change log has its own cursor ("word_cloud:<shard>") and the
+counts stay in complaints.db.
+
+It runs off the request path: WordCloudWorker refreshes every WORDCLOUD_REFRESH_SECONDS in
+the API process (started by the app lifespan), and the CLI below does the same on demand.
+"""
+import os
+import re
+import json
+import math
+import asyncio
+import logging
+from datetime import datetime
+
+from sqlalchemy import func, or_, text, update
+from sqlalchemy.dialects.sqlite import insert
+
+from agents.gazetteer import get_gazetteer
+from agents.complaint_changes import TRUNCATED, current_cursor
+import sharding
+from models import AnalyticsCursor, MockComplaint, WordCloudCell, WordCloudDoc, WordCloudItem, WordCloudTerm
+
+logger = logging.getLogger(__name__)
+
+CURSOR_NAME = "word_cloud"
+CELL_DEG = float(os.getenv("WORDCLOUD_CELL_DEG", "0.02"))  # ~2km at Busan's latitude
+REFRESH_SECONDS = float(os.getenv("WORDCLOUD_REFRESH_SECONDS", "15"))
+# Complaint fields the word cloud depends on; other updates (status, scores) don't touch it
+_INPUT_FIELDS = {"summary", "original_text", "lat", "lng"}
+TERMS_PER_CELL = 2
+MIN_DF = 2  # a term must come from at least two complaints in the cell
+BIGRAM_BOOST = 1.5  # phrases read better on the map than their single words
+# Terms of one cell are fanned out around the centroid so they don't overlap
+OFFSETS = [(0.0, 0.0), (-0.004, 0.005), (0.004, -0.005), (0.004, 0.005)]
+
+# Weight share of the strongest item -> (rem size range applied by sqrt scale, class tier)
+MIN_REM, MAX_REM = 1.4, 3.5
+CLASS_TIERS = [
+    (0.75, "text-primary font-black opacity-95"),
+    (0.5, "text-slate-700 dark:text-slate-200 font-extrabold opacity-80"),
+    (0.3, "text-slate-600 dark:text-slate-300 font-bold opacity-80"),
+    (0.0, "text-slate-500 dark:text-slate-400 font-semibold opacity-70"),
+]
+
+_WORD_RE = re.compile(r"[가-힣]+")
+
+# Longest first; single-character particles only strip when two or more characters remain
+_PARTICLES = sorted([
+    "에서는", "에서도", "으로는", "에게서", "까지", "부터", "에서", "으로", "에게", "한테", "처럼", "보다",
+    "이나", "이랑", "마다", "밖에", "조차", "만큼", "들이", "들은", "들을", "들도", "들",
+    "은", "는", "이", "가", "을", "를", "에", "의", "도", "로", "와", "과", "만", "랑",
+], key=len, reverse=True)
+# Predicates: "<noun>하다" forms keep the noun stem (심각합니다 -> 심각), other endings are dropped
+_HADA_ENDINGS = sorted([
+    "합니다", "했습니다", "해주세요", "해요", "하고", "해서", "하는", "했는데", "하여", "하게", "한", "하다",
+    "됩니다", "되었습니다", "되어", "돼서", "되고", "되는", "된", "됨",
+], key=len, reverse=True)
+_PREDICATE_ENDINGS = (
+    "습니다", "습니까", "니다", "어요", "아요", "네요", "세요", "예요", "에요", "고요", "는데", "인데", "지만", "면서",
+    "려고", "려면", "으면", "어서", "아서", "어도", "아도", "어야", "아야", "지고", "더니", "다가", "도록", "거나",
+    "는지", "잖아", "이라", "겠다", "았다", "었다", "였다", "이다",
+)
+
+STOP_WORDS = {
+    "너무", "정말", "진짜", "매우", "많이", "계속", "항상", "자꾸", "아주", "조금", "빨리", "빠른", "제발",
+    "부탁", "조치", "처리", "민원", "신고", "접수", "확인", "내용", "없음", "문제", "상황", "관련", "해당",
+    "부산", "부산시", "부산광역시", "근처", "주변", "일대", "앞", "뒤", "옆", "쪽", "곳",
+    "이런", "저런", "그런", "이거", "그거", "저희", "우리", "제가", "저는", "때문", "그리고", "하지만", "그래서",
+    "지금", "오늘", "어제", "요즘", "최근", "매일", "사람", "사람들", "정도", "경우", "생각", "마음",
+    "있는", "없는", "같은", "있어", "없어", "있고", "없고", "많은", "다른", "모든", "하나", "여기", "거기",
+    "수가", "수도", "것이", "것도", "거의", "다시", "이제", "아직", "그냥", "혹시", "특히", "바로", "전혀",
+    "대한", "위해", "통해", "인해", "하게", "좋은",
+    # Landmarks that are not 구/동 names in the gazetteer but only say where the word already sits
+    "광안리", "해운대", "서면", "남포", "센텀", "기장", "송정", "다대포",
+}
+
+
+def _place_names():
+    gazetteer = get_gazetteer()
+    names = set(gazetteer.districts)
+    for info in gazetteer.districts.values():
+        names.update(info["dongs"])
+    return names
+
+
+_places = None
+
+
+def normalize_word(word: str):
+    """Strip particles / 하다-endings; None for predicates, stop words and single characters."""
+    if word.endswith(_PREDICATE_ENDINGS):
+        return None
+    for ending in _HADA_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= 2:
+            word = word[:-len(ending)]
+            break
+    else:
+        for particle in _PARTICLES:
+            if word.endswith(particle) and len(word) - len(particle) >= 2:
+                word = word[:-len(particle)]
+                break
+    if len(word) < 2 or word in STOP_WORDS:
+        return None
+    return word
+
+
+def extract_terms(text: str):
+    """Distinct unigram and adjacent-bigram terms of a complaint."""
+    global _places
+    if _places is None:
+        _places = _place_names()
+    words = [normalize_word(w) for w in _WORD_RE.findall(text or "")]
+    words = [w if w and w not in _places else None for w in words]
+    terms = {w for w in words if w}
+    terms.update(f"{a} {b}" for a, b in zip(words, words[1:]) if a and b and a != b)
+    return terms
+
+
+def cell_of(lat, lng):
+    return f"{math.floor(lat / CELL_DEG)}:{math.floor(lng / CELL_DEG)}"
+
+
+# --- Incremental Fold ---
+
+def _contribution(row):
+    """(cell, lat, lng, terms) a complaint adds to the counts, or None when it has no position."""
+    if row is None or row.lat is None or row.lng is None:
+        return None
+    terms = sorted(extract_terms(f"{row.summary or ''} {row.original_text or ''}"))
+    return cell_of(row.lat, row.lng), row.lat, row.lng, terms
+
+
+def _apply(db, cells, term_df):
+    """Add the (possibly negative) per-cell deltas; drop cells and terms that reach zero."""
+    cells = {c: d for c, d in cells.items() if any(d)}
+    term_df = {k: df for k, df in term_df.items() if df}
+    if cells:
+        stmt = insert(WordCloudCell)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["cell"],
+            set_={
+                "docs": WordCloudCell.docs + stmt.excluded.docs,
+                "lat_sum": WordCloudCell.lat_sum + stmt.excluded.lat_sum,
+                "lng_sum": WordCloudCell.lng_sum + stmt.excluded.lng_sum,
+            },
+        ), [{"cell": c, "docs": d, "lat_sum": la, "lng_sum": ln} for c, (d, la, ln) in cells.items()])
+        db.query(WordCloudCell).filter(WordCloudCell.cell.in_(list(cells)), WordCloudCell.docs <= 0).delete(synchronize_session=False)
+    if term_df:
+        stmt = insert(WordCloudTerm)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["cell", "term"],
+            set_={"df": WordCloudTerm.df + stmt.excluded.df},
+        ), [{"cell": c, "term": t, "df": df} for (c, t), df in term_df.items()])
+        touched = list({c for c, _ in term_df})
+        db.query(WordCloudTerm).filter(WordCloudTerm.cell.in_(touched), WordCloudTerm.df <= 0).delete(synchronize_session=False)
+
+
+def _fold(db, source, complaint_ids, docs):
+    """Replace the stored contribution of each complaint (read from `source`) with its current one. Returns touched cells."""
+    cells = {}  # cell -> [docs, lat_sum, lng_sum] delta
+    term_df = {}  # (cell, term) -> df delta
+
+    def count(cell, lat, lng, terms, sign):
+        stats = cells.setdefault(cell, [0, 0.0, 0.0])
+        stats[0] += sign
+        stats[1] += sign * lat
+        stats[2] += sign * lng
+        for term in terms:
+            term_df[(cell, term)] = term_df.get((cell, term), 0) + sign
+
+    rows = {row.id: row for row in source.query(
+        MockComplaint.id, MockComplaint.summary, MockComplaint.original_text, MockComplaint.lat, MockComplaint.lng,
+    ).filter(MockComplaint.id.in_(complaint_ids))}
+    for complaint_id in complaint_ids:
+        old = docs.get(complaint_id)
+        if complaint_id not in rows and old is not None and source is not db and sharding.get_shards().locate(complaint_id):
+            continue  # moved to another shard by a rebalance: that shard's log folds it
+        new = _contribution(rows.get(complaint_id))
+        if old is not None and new == (old.cell, old.lat, old.lng, old.terms):
+            continue
+        if old is not None:
+            count(old.cell, old.lat, old.lng, old.terms, -1)
+            db.delete(old)
+        if new is not None:
+            cell, lat, lng, terms = new
+            count(cell, lat, lng, terms, 1)
+            db.add(WordCloudDoc(complaint_id=complaint_id, cell=cell, lat=lat, lng=lng, terms=terms))
+    _apply(db, cells, term_df)
+    db.flush()
+    return set(cells)
+
+
+def _changed_ids(db, source, since, head):
+    """Complaints whose word cloud contribution may have changed in (since, head] of `source`'s log."""
+    relevant, other = set(), set()
+    for complaint_id, op, fields in source.execute(text(
+        "SELECT complaint_id, op, fields FROM complaint_changes WHERE seq > :since AND seq <= :head AND op != :op"
+    ), {"since": since, "head": head, "op": TRUNCATED}):
+        if op != "update" or _INPUT_FIELDS & set(json.loads(fields) if fields else ()):
+            relevant.add(complaint_id)
+        else:
+            other.add(complaint_id)
+    # A status/score update of a complaint never folded (its insert compacted into the update) still counts
+    other -= relevant
+    for chunk in _chunks(sorted(other), 500):
+        known = {doc for (doc,) in db.query(WordCloudDoc.complaint_id).filter(WordCloudDoc.complaint_id.in_(chunk))}
+        relevant.update(cid for cid in chunk if cid not in known)
+    return sorted(relevant)
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _claim(db, name, cursor, head):
+    """Compare-and-set cursor `name` to `head`. Taking the write lock first, so no other refresh interleaves."""
+    if cursor is None:
+        db.add(AnalyticsCursor(name=name, last_seq=head))
+        db.flush()
+        return True
+    return db.execute(update(AnalyticsCursor).where(
+        AnalyticsCursor.name == name, AnalyticsCursor.last_seq.is_(None) if cursor.last_seq is None
+        else AnalyticsCursor.last_seq == cursor.last_seq,
+    ).values(last_seq=head)).rowcount == 1
+
+
+def fold_changes(db, source=None, name=CURSOR_NAME, batch_size: int = 2000):
+    """
+    Fold complaints of `source` (default: db) changed since cursor `name` into the cell/term
+    counts. Returns the touched cells, or None when the counts have to be rebuilt (first run,
+    log truncated past the cursor).
+    """
+    source = db if source is None else source
+    cursor = db.get(AnalyticsCursor, name)
+    if cursor is None or cursor.last_seq is None:
+        return None
+    head = current_cursor(source)
+    floor = source.execute(text("SELECT MAX(seq) FROM complaint_changes WHERE op = :op"), {"op": TRUNCATED}).scalar()
+    if cursor.last_seq > head or (floor is not None and cursor.last_seq < floor):
+        return None
+    if cursor.last_seq == head:
+        return set()
+    since = cursor.last_seq
+    if not _claim(db, name, cursor, head):
+        db.rollback()  # another refresh folded these changes
+        return set()
+    touched = set()
+    for chunk in _chunks(_changed_ids(db, source, since, head), batch_size):
+        docs = {doc.complaint_id: doc for doc in db.query(WordCloudDoc).filter(WordCloudDoc.complaint_id.in_(chunk))}
+        touched |= _fold(db, source, chunk, docs)
+    return touched
+
+
+def fold_all(db, sources=None, batch_size: int = 2000):
+    """
+    Drop all counts and fold every complaint of `sources` ([(shard name, session)], default
+    db itself). Returns the cells that exist afterwards.
+    """
+    sources = [(None, db)] if sources is None else sources
+    for shard, source in sources:
+        name = sharding.source_key(CURSOR_NAME, shard)
+        if not _claim(db, name, db.get(AnalyticsCursor, name), current_cursor(source)):
+            db.rollback()
+            return set()
+    previous = {cell for (cell,) in db.query(WordCloudCell.cell)}
+    db.query(WordCloudDoc).delete()
+    db.query(WordCloudTerm).delete()
+    db.query(WordCloudCell).delete()
+    touched = set()
+    for _, source in sources:
+        ids = [cid for (cid,) in source.query(MockComplaint.id).order_by(MockComplaint.id)]
+        for chunk in _chunks(ids, batch_size):
+            touched |= _fold(db, source, chunk, {})
+    return touched | previous
+
+
+# --- Item Generation ---
+
+def _top_terms(db, cell, n_cells):
+    candidates = db.query(WordCloudTerm.term, WordCloudTerm.df).filter(
+        WordCloudTerm.cell == cell, WordCloudTerm.df >= MIN_DF
+    ).all()
+    if not candidates:
+        return []
+    spread = dict(db.query(WordCloudTerm.term, func.count(WordCloudTerm.id)).filter(
+        WordCloudTerm.term.in_([t for t, _ in candidates])
+    ).group_by(WordCloudTerm.term).all())
+
+    scored = []
+    for term, df in candidates:
+        weight = df * math.log((1 + n_cells) / (1 + spread.get(term, 0)))
+        if " " in term:
+            weight *= BIGRAM_BOOST
+        if weight > 0:
+            scored.append((weight, term))
+    scored.sort(reverse=True)
+
+    # Skip terms overlapping an already chosen one ("도로" once "도로 파손" is in)
+    chosen = []
+    for weight, term in scored:
+        parts = set(term.split())
+        if any(parts & set(other.split()) for _, other in chosen):
+            continue
+        chosen.append((weight, term))
+        if len(chosen) == TERMS_PER_CELL:
+            break
+    return chosen
+
+
+def style_for(share: float):
+    """Map a weight relative to the strongest item (0-1] to (size, class_name)."""
+    size = MIN_REM + (MAX_REM - MIN_REM) * math.sqrt(max(share, 0.0))
+    class_name = next(name for bound, name in CLASS_TIERS if share >= bound)
+    return f"{size:.1f}rem", class_name
+
+
+def refresh_word_cloud(db, cells=None):
+    """
+    Fold changed complaints and rebuild the items of touched cells (plus `cells` if given).
+    Commits; returns the number of cells rebuilt.
+    """
+    with sharding.complaint_sources(db) as sources:
+        touched = set()
+        for shard, source in sources:
+            folded = fold_changes(db, source, sharding.source_key(CURSOR_NAME, shard))
+            if folded is None:  # any source needing a rebuild rebuilds the shared counts
+                db.rollback()
+                touched = fold_all(db, sources)
+                break
+            touched |= folded
+    if cells is not None:
+        touched |= set(cells)
+    if not touched:
+        db.commit()
+        return 0
+
+    n_cells = db.query(func.count(WordCloudCell.cell)).scalar()
+    now = datetime.now()
+    for cell in touched:
+        stats = db.get(WordCloudCell, cell)
+        db.query(WordCloudItem).filter(WordCloudItem.cell == cell).delete()
+        if stats is None or not stats.docs:
+            continue
+        lat, lng = stats.lat_sum / stats.docs, stats.lng_sum / stats.docs
+        for (weight, term), (d_lat, d_lng) in zip(_top_terms(db, cell, n_cells), OFFSETS):
+            db.add(WordCloudItem(text=term, lat=lat + d_lat, lng=lng + d_lng, cell=cell, weight=weight, updated_at=now, style={}))
+    db.flush()
+
+    # Sizes are relative to the strongest word on the map, so re-map every generated item
+    items = db.query(WordCloudItem).filter(WordCloudItem.cell.isnot(None)).all()
+    if items:
+        top = max(item.weight for item in items)
+        for item in items:
+            item.size, item.class_name = style_for(item.weight / top)
+        # Generated words replace the hand-written ones from init_db.py
+        db.query(WordCloudItem).filter(WordCloudItem.cell.is_(None)).delete()
+    db.commit()
+    return len(touched)
+
+
+def rebuild_word_cloud(db):
+    """Drop all counts and refold every complaint (after changing CELL_DEG or the stop words)."""
+    db.query(WordCloudItem).filter(WordCloudItem.cell.isnot(None)).delete()
+    db.query(AnalyticsCursor).filter(or_(
+        AnalyticsCursor.name == CURSOR_NAME, AnalyticsCursor.name.startswith(f"{CURSOR_NAME}:")
+    )).update({"last_seq": None}, synchronize_session=False)
+    db.commit()
+    return refresh_word_cloud(db)
+
+
+class WordCloudWorker:
+    """Periodic refresh on the app's event loop; the fold itself runs in a thread."""
+
+    def __init__(self, session_factory=None, interval: float = REFRESH_SECONDS):
+        if session_factory is None:
+            from database import SessionLocal
+            session_factory = SessionLocal
+        self.session_factory = session_factory
+        self.interval = interval
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def refresh_once(self):
+        db = self.session_factory()
+        try:
+            return refresh_word_cloud(db)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Word cloud refresh failed: {e}")
+        finally:
+            db.close()
+
+    async def _loop(self):
+        while True:
+            await asyncio.to_thread(self.refresh_once)
+            await asyncio.sleep(self.interval)
+
+
+# Singleton Instance (started/stopped by the app lifespan)
+word_cloud_worker = None
+def get_word_cloud_worker():
+    global word_cloud_worker
+    if word_cloud_worker is None:
+        word_cloud_worker = WordCloudWorker()
+    return word_cloud_worker
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Update the map word cloud from complaint text")
+    parser.add_argument("--rebuild", action="store_true", help="recount all complaints from scratch")
+    args = parser.parse_args()
+
+    from database import SessionLocal, migrate_schema
+    migrate_schema()
+    db = SessionLocal()
+    try:
+        rebuilt = rebuild_word_cloud(db) if args.rebuild else refresh_word_cloud(db)
+        print(f"Rebuilt {rebuilt} cells")
+        for item in db.query(WordCloudItem).order_by(WordCloudItem.weight.desc()).limit(20):
+            print(f"  {item.weight or 0:7.2f}  {item.size:>6}  {item.text}")
+    finally:
+        db.close()
@@ -0,0 +1,192 @@
+"""
+In-process overhead of the LLM-backed endpoints, with OpenAI replayed from a cassette.
+
+    python -m benchmarks.agent_overhead --record            # once, against the live API (needs OPENAI_API_KEY)
+    python -m benchmarks.agent_overhead --record --synthetic  # scripted replies, no API key
+    python -m benchmarks.agent_overhead [--runs 5] [--latency zero|recorded] [--baseline path.json] [--threshold 0.3]
+
+Plays a scripted complaint conversation through /api/chat (small talk, details, save) and
+one /api/map/analyze-region call. With --latency zero (default) every LLM call returns
+instantly, so the timings are prompt building, history handling, tool dispatch, LangGraph
+orchestration and DB work only; --latency recorded adds the recorded OpenAI time back for
+an end-to-end figure.
+
+Runs inside a temp directory holding a copy of complaints.db. The region polygon avoids
+the district the conversation files its complaint in, so repeated runs send identical
+analysis prompts and keep hitting the cassette.
+
+The committed cassette (cassettes/agent_overhead.json) is --synthetic: every request is real
+(prompts, tools, routing), the replies are scripted (the complaint is filed on the last turn)
+and their recorded latency is ~0. It is what --latency zero needs; re-record against the
+live API for a --latency recorded figure. Re-record whenever a prompt, tool schema or the
+routing policy changes: replay misses fail the run.
+"""
+import os
+import sys
+import time
+import uuid
+import shutil
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+from types import SimpleNamespace
+
+from benchmarks.common import report
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_CASSETTE = Path(__file__).resolve().parent / "cassettes" / "agent_overhead.json"
+
+CHAT_SCRIPT = [
+    "안녕하세요",
+    "해운대구 우동 해운대역 1번 출구 앞 보도블럭이 깨져서 걸려 넘어질 뻔했어요",
+    "폭이 30cm 정도 들떠 있고 어르신들이 많이 다니는 길이에요. 밤에는 잘 안 보여요",
+    "네, 그대로 접수해 주세요",
+]
+# 수영구 광안리 일대 (the conversation files its complaint in 해운대구)
+REGION_POLYGON = [[35.145, 129.105], [35.145, 129.125], [35.165, 129.125], [35.165, 129.105]]
+
+
+# --- Scripted LLM (--synthetic) ---
+
+SAVE_ARGUMENTS = {
+    "summary": "해운대역 1번 출구 앞 보도블럭 파손", "original_text": CHAT_SCRIPT[1], "location": "부산 해운대구 우동 해운대역 1번 출구",
+    "category": "도로", "urgency_score": 7, "safety_risk_score": 8, "inconvenience_score": 6, "visual_impact_score": 4,
+    "sentiment_score": 5, "estimated_cost": "Low", "required_personnel": "보수 인력 2명", "legal_risk": "Low",
+    "probability_of_escalation": 40, "department_in_charge": "해운대구 건설과",
+}
+CONTEXT_REPLY = {
+    "semantic_narrative": "광안리 일대에 소음과 쓰레기 민원이 반복되고 있습니다.",
+    "themes": {"야간 소음": ["폭죽", "버스킹"], "해변 쓰레기": ["투기", "악취"]},
+    "urgency_score": 60, "sentiment_stats": {"Negative": 70, "Neutral": 25, "Positive": 5},
+}
+
+
+def _scripted_reply(messages, tools):
+    """(text, tool call or None): file the complaint when the user confirms, answer briefly otherwise."""
+    last = messages[-1]
+    role = last.get("role") if isinstance(last, dict) else getattr(last, "role", None)
+    content = last.get("content") if isinstance(last, dict) else getattr(last, "content", None)
+    if role == "tool":
+        return "민원이 상세하게 접수되었습니다.", None
+    if tools and isinstance(content, str) and "접수해" in content:
+        return None, ("save_complaint_to_db", SAVE_ARGUMENTS)
+    return "말씀해 주셔서 감사합니다. 조금 더 자세히 알려주시겠어요?", None
+
+
+class ScriptedAsyncOpenAI:
+    """Stands in for openai.AsyncOpenAI while recording with --synthetic."""
+
+    def __init__(self, **kwargs):
+        self.chat = SimpleNamespace(completions=self)
+
+    async def create(self, **params):
+        import json
+        from openai.types.chat import ChatCompletion
+        from agents.model_router import estimate_tokens
+
+        text, call = _scripted_reply(params["messages"], params.get("tools"))
+        message = {"role": "assistant", "content": text}
+        if call:
+            name, arguments = call
+            message["tool_calls"] = [{"id": "call_synthetic", "type": "function",
+                                      "function": {"name": name, "arguments": json.dumps(arguments, ensure_ascii=False)}}]
+        prompt_tokens, completion_tokens = estimate_tokens(params["messages"]), estimate_tokens([message])
+        return ChatCompletion.model_validate({
+            "id": "chatcmpl-synthetic", "object": "chat.completion", "created": 0, "model": params["model"],
+            "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if call else "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        })
+
+
+class ScriptedChatOpenAI:
+    """Stands in for langchain_openai.ChatOpenAI (LangGraph region analysis) with --synthetic."""
+
+    def __init__(self, model, temperature=None, **kwargs):
+        self.model = model
+
+    def invoke(self, messages):
+        import json
+        from langchain_core.messages import AIMessage
+
+        wants_json = "JSON" in messages[0].content
+        content = json.dumps(CONTEXT_REPLY, ensure_ascii=False) if wants_json else "## 🌍 현황 분석\n광안리 일대 민원이 늘고 있습니다."
+        return AIMessage(content=content, usage_metadata={"input_tokens": 0, "output_tokens": 0, "total_tokens": 0})
+
+
+def run_scenario(client):
+    session_id = f"bench-{uuid.uuid4()}"
+    turns = []
+    for message in CHAT_SCRIPT:
+        start = time.perf_counter()
+        resp = client.post("/api/chat", json={"message": message, "session_id": session_id})
+        turns.append(time.perf_counter() - start)
+        resp.raise_for_status()
+    start = time.perf_counter()
+    client.post("/api/map/analyze-region", json={"polygon": REGION_POLYGON}).raise_for_status()
+    return turns, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark agent overhead with replayed LLM traffic")
+    parser.add_argument("--record", action="store_true", help="record the cassette against the live OpenAI API")
+    parser.add_argument("--synthetic", action="store_true", help="with --record: script the replies instead of calling OpenAI")
+    parser.add_argument("--cassette", type=Path, default=DEFAULT_CASSETTE)
+    parser.add_argument("--latency", choices=("zero", "recorded"), default="zero")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--baseline", type=Path, default=None)
+    parser.add_argument("--threshold", type=float, default=0.3, help="allowed slowdown vs baseline (0.3 = 30%%)")
+    args = parser.parse_args()
+
+    if args.synthetic and not args.record:
+        sys.exit("--synthetic only applies to --record")
+    if args.synthetic:
+        import openai
+        import langchain_openai
+        openai.AsyncOpenAI, langchain_openai.ChatOpenAI = ScriptedAsyncOpenAI, ScriptedChatOpenAI
+        os.environ["OPENAI_API_KEY"] = "synthetic"  # never leaves the process: the client is scripted
+    elif args.record and not os.getenv("OPENAI_API_KEY"):
+        sys.exit("--record needs OPENAI_API_KEY")
+    if not args.record and not args.cassette.exists():
+        sys.exit(f"No cassette at {args.cassette}; run with --record first")
+
+    # Read at import time by agents.llm_cassette
+    os.environ["LLM_CASSETTE_MODE"] = "record" if args.record else "replay"
+    os.environ["LLM_CASSETTE"] = str(args.cassette.resolve())
+    os.environ["LLM_CASSETTE_LATENCY"] = args.latency
+    os.environ.setdefault("TRACE_SAMPLE_RATE", "0")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = BACKEND_DIR / "complaints.db"
+        if db.exists():
+            shutil.copy(db, Path(tmp) / "complaints.db")
+        os.chdir(tmp)  # relative SQLite path, error.log and traces stay out of the tree
+        sys.path.insert(0, str(BACKEND_DIR))
+
+        from fastapi.testclient import TestClient
+        import main as app_module
+        from agents.llm_cassette import get_cassette
+
+        with TestClient(app_module.app) as client:
+            if args.record:
+                run_scenario(client)
+                print(f"Recorded {get_cassette().stats()}")
+                return
+            run_scenario(client)  # warm-up: lazy imports, graph compile, first queries
+            turns, regions = [], []
+            for _ in range(args.runs):
+                run_turns, region = run_scenario(client)
+                turns.append(run_turns)
+                regions.append(region)
+        print(f"Cassette: {get_cassette().stats()}")
+
+    name = "agent_overhead" if args.latency == "zero" else "agent_overhead_recorded_latency"
+    results = {f"chat_turn{i + 1}_seconds": statistics.median(run[i] for run in turns) for i in range(len(CHAT_SCRIPT))}
+    results["chat_conversation_seconds"] = statistics.median(sum(run) for run in turns)
+    results["analyze_region_seconds"] = statistics.median(regions)
+    report(name, results, args.baseline, args.threshold)
+
+
+if __name__ == "__main__":
+    main()
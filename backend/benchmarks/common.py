@@ -0,0 +1,85 @@
+"""
+Shared helpers for the benchmark scripts: timing, saving comparable results and
+checking them against a baseline: benchmarks/baselines/<name>.json by default, which CI
+writes by running the same script on the PR's base revision (.github/workflows/backend-benchmarks.yml).
+
+Result files are JSON: {"benchmark", "timestamp", "python", "platform", "results": {metric: value}}.
+Every metric is "lower is better" (seconds or bytes).
+"""
+import sys
+import json
+import time
+import platform
+import statistics
+from datetime import datetime
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+RESULTS_DIR = BENCH_DIR / "results"
+BASELINE_DIR = BENCH_DIR / "baselines"
+
+
+def measure(fn, repeat: int = 5, warmup: int = 1):
+    """Median wall time of fn() in seconds."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def save_results(name: str, results: dict, path: Path = None):
+    payload = {
+        "benchmark": name,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    path = Path(path) if path else RESULTS_DIR / f"{name}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    return path
+
+
+def load_results(path: Path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["results"]
+
+
+def compare(results: dict, baseline: dict, threshold: float):
+    """
+    Returns a list of (metric, baseline, current, ratio) for metrics that got slower than
+    baseline * (1 + threshold). Metrics missing from either side are ignored.
+    """
+    regressions = []
+    for metric, base in baseline.items():
+        current = results.get(metric)
+        if current is None or not base:
+            continue
+        ratio = current / base
+        if ratio > 1 + threshold:
+            regressions.append((metric, base, current, ratio))
+    return regressions
+
+
+def report(name: str, results: dict, baseline_path: Path = None, threshold: float = 0.2):
+    """Print results, compare to the baseline if there is one, exit 1 on regression."""
+    print(f"== {name} ==")
+    for metric, value in results.items():
+        print(f"  {metric:<40} {value:.6f}")
+    print(f"Saved to {save_results(name, results)}")
+
+    baseline_path = Path(baseline_path) if baseline_path else BASELINE_DIR / f"{name}.json"
+    if not baseline_path.exists():
+        print(f"No baseline at {baseline_path}; skipping regression check")
+        return
+    regressions = compare(results, load_results(baseline_path), threshold)
+    for metric, base, current, ratio in regressions:
+        print(f"REGRESSION {metric}: {base:.6f} -> {current:.6f} ({ratio:.2f}x, allowed {1 + threshold:.2f}x)")
+    if regressions:
+        sys.exit(1)
+    print(f"No regressions beyond {threshold:.0%} against {baseline_path}")
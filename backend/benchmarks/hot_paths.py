@@ -0,0 +1,140 @@
+"""
+Micro-benchmarks of the per-request Python hot paths at 1k / 100k / 1M complaints.
+
+    python -m benchmarks.hot_paths [--sizes 1000,100000,1000000] [--repeat 5] [--baseline path.json] [--threshold 0.3]
+
+Builds one synthetic complaints.db in a temp directory and grows it through the sizes; at
+each size it times, in-process and without HTTP:
+
+  - map_markers      marker formatting of /api/map/items (snapshot select + _map_marker loop)
+  - stats            /api/stats (category counting over the snapshot, resolved today)
+  - retrieve_bbox    the bbox filter of the region analysis `retrieve` node (~0.5% of rows)
+  - analyze_prompt   text lookup, prompt assembly and routing of the `analyze` node over
+                     those complaints, with the LLM call answered instantly
+  - save_complaint   CivilComplaintAgent.save_complaint_to_db: insert, FTS and change-log
+                     triggers, triage upsert (the word cloud folds it later, off the request)
+
+plus CivilComplaintAgent.chat history handling (message building, routing, history update)
+at 10 / 100 / 1000 history messages with the LLM answered instantly, which does not depend
+on the table size and is timed once. Every metric is the median of --repeat runs.
+"""
+import os
+import io
+import json
+import asyncio
+import argparse
+import tempfile
+from contextlib import redirect_stdout
+from pathlib import Path
+from types import SimpleNamespace
+
+from benchmarks.common import report
+from benchmarks.search import timed
+from benchmarks.snapshot import REGION_BBOX, synthetic_rows
+
+DEFAULT_SIZES = "1000,100000,1000000"
+HISTORY_LENGTHS = (10, 100, 1000)
+REGION_POLYGON = [[REGION_BBOX[0], REGION_BBOX[1]], [REGION_BBOX[0], REGION_BBOX[3]],
+                  [REGION_BBOX[2], REGION_BBOX[3]], [REGION_BBOX[2], REGION_BBOX[1]]]
+SAVE_ARGS = {
+    "summary": "광안리 해변 보도블럭 파손", "original_text": "광안리 해변 산책로 보도블럭이 깨져서 걸려 넘어질 뻔했습니다.",
+    "location": "부산 수영구 광안동", "category": "도로", "urgency_score": 6, "safety_risk_score": 7,
+}
+ANALYSIS_ANSWER = json.dumps({
+    "semantic_narrative": "벤치마크 응답", "themes": {"보행 안전": ["보도블럭 파손"]},
+    "urgency_score": 60, "sentiment_stats": {"Negative": 70, "Neutral": 20, "Positive": 10},
+}, ensure_ascii=False)
+
+
+def instant_llm(*args, **kwargs):
+    return SimpleNamespace(content=ANALYSIS_ANSWER, usage_metadata=None)
+
+
+async def instant_chat(*args, **kwargs):
+    return SimpleNamespace(content="네, 말씀해 주세요.", tool_calls=None)
+
+
+def synthetic_history(n):
+    return [
+        {"role": "user", "content": f"{i}번째 문의입니다. 해운대구 보도블럭이 파손되었어요."} if i % 2 == 0
+        else {"role": "assistant", "content": "위치와 파손 정도를 조금 더 알려주시겠어요?"}
+        for i in range(n)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks of backend hot paths")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated complaint counts, ascending")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", type=Path, default=None)
+    parser.add_argument("--threshold", type=float, default=0.3)
+    args = parser.parse_args()
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+
+    os.environ.setdefault("TRACE_SAMPLE_RATE", "0")
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # database.py uses ./complaints.db
+        from sqlalchemy import text
+        from database import SessionLocal, engine, migrate_schema
+        migrate_schema()
+        import main as app_module
+        from agents import context_analysis_agent
+        from agents.region_jobs import run_config
+        from agents.civil_complaint import CivilComplaintAgent
+        context_analysis_agent.invoke_chat_model = instant_llm
+        agent = CivilComplaintAgent()
+        agent.service.get_chat_response = instant_chat
+
+        insert = text(
+            "INSERT INTO mock_complaints (id, summary, original_text, location, district, category, lat, lng, "
+            "urgency_score, safety_risk_score, status, created_at) VALUES (:id, :summary, :original_text, :location, "
+            ":district, :category, :lat, :lng, :urgency, :safety, :status, :created_at)"
+        )
+        loop = asyncio.new_event_loop()
+        results = {}
+        db = SessionLocal()
+
+        for length in HISTORY_LENGTHS:
+            history = synthetic_history(length)
+            results[f"chat_history_{length}_seconds"] = timed(
+                lambda: loop.run_until_complete(agent.chat("보도블럭 위치는 해운대역 1번 출구예요", history=list(history), db=db)),
+                args.repeat)
+
+        rows = 0
+        for size in sizes:
+            with engine.begin() as conn:  # grow the table to `size` (saves below add a few rows too)
+                batch = []
+                for row in synthetic_rows(size - rows, rows):
+                    batch.append(row)
+                    if len(batch) == 10_000:
+                        conn.execute(insert, batch)
+                        batch = []
+                if batch:
+                    conn.execute(insert, batch)
+            rows = size
+            app_module._complaint_markers(db, None, None, 0)  # fold the new rows into the snapshot
+
+            state = {"region_polygon": REGION_POLYGON}
+            config = run_config(None, db)
+            with redirect_stdout(io.StringIO()):  # the retrieve node prints its count
+                complaints = context_analysis_agent.retrieve_complaints(state, config)["complaint_ids"]
+                timings = {
+                    "map_markers": lambda: app_module._complaint_markers(db, None, None, app_module.REFRESH_SECONDS),
+                    "stats": lambda: loop.run_until_complete(app_module.get_stats(since=None, db=db)),
+                    "retrieve_bbox": lambda: context_analysis_agent.retrieve_complaints(state, config),
+                    "analyze_prompt": lambda: context_analysis_agent.analyze_context({"complaint_ids": complaints}, config),
+                    "save_complaint": lambda: agent.save_complaint_to_db(dict(SAVE_ARGS), db=db),
+                }
+                for name, fn in timings.items():
+                    results[f"{name}_{size}_seconds"] = timed(fn, args.repeat)
+            print(f"{size:,} complaints: {len(complaints):,} in the region")
+
+        db.close()
+        loop.close()
+        engine.dispose()
+
+    report("hot_paths", results, args.baseline, args.threshold)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Complaint full-text search at scale (default 1M rows).
+
+    python -m benchmarks.search [--rows 1000000] [--baseline path.json] [--threshold 0.3]
+
+Builds a synthetic complaints.db in a temp directory (FTS kept in sync by the triggers,
+so insert throughput includes index maintenance), then times /api/complaints/search
+queries against a plain LIKE scan.
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from benchmarks.common import report
+
+DISTRICTS = ["해운대구", "수영구", "부산진구", "중구", "동래구", "남구", "사하구", "금정구"]
+CATEGORIES = ["도로", "환경", "소음", "안전", "교통", "시설"]
+SUBJECTS = ["보도블럭", "가로등", "불법주차", "쓰레기", "공사장", "하수구", "신호등", "싱크홀", "현수막", "방치차량", "악취", "포트홀"]
+PROBLEMS = ["파손되어", "고장나서", "방치되어", "넘쳐서", "무너져서", "심하게 훼손되어", "계속 반복되어"]
+EFFECTS = ["통행이 불편합니다", "사고 위험이 큽니다", "아이들이 위험합니다", "악취가 심합니다", "잠을 잘 수가 없습니다", "차량 흐름이 막힙니다"]
+RARE_TERM, RARE_EVERY = "맨홀뚜껑", 10_000  # selective query: 0.01% of rows
+PLACES = ["역 앞", "시장 입구", "초등학교 근처", "해변가", "아파트 단지 옆", "교차로", "공원 산책로", "버스정류장"]
+
+
+def synthetic_rows(n, seed=42):
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    for i in range(n):
+        district = rng.choice(DISTRICTS)
+        subject = rng.choice(SUBJECTS)
+        place = rng.choice(PLACES)
+        text = f"{place}에 {subject}이(가) {rng.choice(PROBLEMS)} {rng.choice(EFFECTS)}. {rng.choice(SUBJECTS)} 문제도 {rng.choice(PROBLEMS)} 조치 부탁드립니다."
+        if i % RARE_EVERY == 0:
+            text += f" {RARE_TERM}도 확인해 주세요."
+        yield (
+            f"bench-{i:08d}", f"{district} {place} {subject} 민원", text, f"부산 {district} {place}",
+            district, rng.choice(CATEGORIES), rng.randint(1, 10), rng.randint(1, 10), "접수완료",
+            (start + timedelta(minutes=i * 0.5)).isoformat(sep=" "),
+        )
+
+
+def timed(fn, repeat):
+    fn()  # warm page cache
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark complaint full-text search")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", type=Path, default=None)
+    parser.add_argument("--threshold", type=float, default=0.3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # database.py uses ./complaints.db
+        from sqlalchemy import text
+        from database import SessionLocal, engine, migrate_schema
+        from agents.complaint_search import search_complaints
+        migrate_schema()
+
+        insert = text(
+            "INSERT INTO mock_complaints (id, summary, original_text, location, district, category, urgency_score, "
+            "safety_risk_score, status, created_at) VALUES (:id, :summary, :original_text, :location, :district, "
+            ":category, :urgency, :safety, :status, :created_at)"
+        )
+        keys = ["id", "summary", "original_text", "location", "district", "category", "urgency", "safety", "status", "created_at"]
+        t = time.perf_counter()
+        batch = []
+        with engine.begin() as conn:
+            for row in synthetic_rows(args.rows):
+                batch.append(dict(zip(keys, row)))
+                if len(batch) == 10_000:
+                    conn.execute(insert, batch)
+                    batch = []
+            if batch:
+                conn.execute(insert, batch)
+        insert_seconds = time.perf_counter() - t
+        db_bytes = os.path.getsize(Path(tmp) / "complaints.db")
+
+        db = SessionLocal()
+        first = search_complaints(db, "싱크홀", limit=20)
+        queries = {
+            "fts_single_term": lambda: search_complaints(db, "싱크홀", limit=20),
+            "fts_two_terms": lambda: search_complaints(db, "싱크홀 아이들이", limit=20),
+            "fts_filtered": lambda: search_complaints(
+                db, "가로등", district="수영구", min_risk=8, date_from=datetime(2025, 3, 1), date_to=datetime(2025, 6, 1), limit=20),
+            "fts_next_page": lambda: search_complaints(db, "싱크홀", limit=20, cursor=first["next_cursor"]),
+            "fts_mixed_short_term": lambda: search_complaints(db, "싱크홀 도로", limit=20),
+            "like_only_short_term": lambda: search_complaints(db, "악취", limit=20),
+            "fts_rare_term": lambda: search_complaints(db, RARE_TERM, limit=20),
+            # What search would cost without the index: LIKE has to read every row for a selective term
+            "like_scan_rare_term": lambda: db.execute(text(
+                f"SELECT id FROM mock_complaints WHERE original_text LIKE '%{RARE_TERM}%' ORDER BY created_at DESC LIMIT 20"
+            )).all(),
+        }
+        results = {f"{name}_seconds": timed(fn, args.repeat) for name, fn in queries.items()}
+        db.close()
+        engine.dispose()
+
+    results = {
+        f"insert_{args.rows}_rows_seconds": insert_seconds,
+        "db_bytes": float(db_bytes),
+        **results,
+    }
+    report(f"search_{args.rows}", results, args.baseline, args.threshold)
+
+
+if __name__ == "__main__":
+    main()
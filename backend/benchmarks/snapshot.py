@@ -0,0 +1,138 @@
+"""
+Columnar complaint snapshot at scale (default 1M rows).
+
+    python -m benchmarks.snapshot [--rows 1000000] [--baseline path.json] [--threshold 0.3]
+
+Builds a synthetic complaints.db in a temp directory, then reports the snapshot's full load
+time, memory per row and incremental refresh cost, and times the read endpoints it backs
+(map items, dashboard stats, high-risk list, region retrieval) next to the ORM-hydrating
+queries they replaced.
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from benchmarks.common import report
+from benchmarks.search import CATEGORIES, DISTRICTS, timed
+
+# 부산 시내 대략적 범위
+LAT_RANGE, LNG_RANGE = (35.05, 35.30), (128.90, 129.25)
+REGION_BBOX = (35.145, 129.105, 35.165, 129.125)  # 광안리 일대, ~0.5% of rows
+
+
+def synthetic_rows(n, start_index=0, seed=7):
+    rng = random.Random(seed + start_index)
+    start = datetime(2025, 1, 1)
+    for i in range(start_index, start_index + n):
+        district = rng.choice(DISTRICTS)
+        placed = rng.random() > 0.02
+        yield {
+            "id": f"bench-{i:08d}", "summary": f"{district} 민원 {i}", "original_text": f"{district} 생활 불편 민원입니다. " * 4,
+            "location": f"부산 {district}", "district": district, "category": rng.choice(CATEGORIES),
+            "lat": rng.uniform(*LAT_RANGE) if placed else None, "lng": rng.uniform(*LNG_RANGE) if placed else None,
+            "urgency": rng.randint(1, 10), "safety": rng.randint(1, 10), "status": "접수완료",
+            "created_at": (start + timedelta(minutes=i * 0.5)).isoformat(sep=" "),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the columnar complaint snapshot")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", type=Path, default=None)
+    parser.add_argument("--threshold", type=float, default=0.3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # database.py uses ./complaints.db
+        from sqlalchemy import text
+        import models
+        from database import SessionLocal, engine, migrate_schema
+        from agents.complaint_snapshot import ComplaintSnapshot, fetch_text
+        migrate_schema()
+
+        insert = text(
+            "INSERT INTO mock_complaints (id, summary, original_text, location, district, category, lat, lng, "
+            "urgency_score, safety_risk_score, status, created_at) VALUES (:id, :summary, :original_text, :location, "
+            ":district, :category, :lat, :lng, :urgency, :safety, :status, :created_at)"
+        )
+
+        def insert_rows(n, start_index):
+            with engine.begin() as conn:
+                batch = []
+                for row in synthetic_rows(n, start_index):
+                    batch.append(row)
+                    if len(batch) == 10_000:
+                        conn.execute(insert, batch)
+                        batch = []
+                if batch:
+                    conn.execute(insert, batch)
+
+        insert_rows(args.rows, 0)
+
+        snapshot = ComplaintSnapshot()
+        t = time.perf_counter()
+        with engine.connect() as conn:
+            snapshot.refresh(conn)
+        load_seconds = time.perf_counter() - t
+        bytes_per_row = snapshot.nbytes() / max(snapshot.n, 1)
+
+        # Incremental refresh: 1k new rows + 1k re-scored rows
+        insert_rows(1000, args.rows)
+        with engine.begin() as conn:
+            conn.execute(text("UPDATE mock_complaints SET safety_risk_score = 10 WHERE rowid % :step = 0"),
+                         {"step": max(args.rows // 1000, 1)})
+        t = time.perf_counter()
+        with engine.connect() as conn:
+            appended, updated = snapshot.refresh(conn)
+        refresh_seconds = time.perf_counter() - t
+        with engine.connect() as conn:
+            t = time.perf_counter()
+            snapshot.refresh(conn)
+            idle_refresh_seconds = time.perf_counter() - t
+        print(f"Snapshot: {snapshot.n:,} rows, {bytes_per_row:.1f} bytes/row; refresh folded in {appended} new, {updated} updated")
+
+        db = SessionLocal()
+        view = snapshot.view()
+
+        def map_items():
+            positions = view.select(placed_only=True)
+            return list(zip(view.ids(positions), view.decode("category", positions),
+                            view.cols["lat"][positions].tolist(), view.cols["lng"][positions].tolist()))
+
+        queries = {
+            "map_items": map_items,
+            "stats": lambda: view.counts("category"),
+            "high_risk": lambda: fetch_text(db, view, view.select(min_risk=8), ("summary", "location", "substr(original_text, 1, 50) AS d")),
+            "region_bbox": lambda: fetch_text(db, view, view.select(bbox=REGION_BBOX), ("summary", "original_text", "location", "category")),
+        }
+        results = {f"snapshot_{name}_seconds": timed(fn, args.repeat) for name, fn in queries.items()}
+
+        # What the endpoints did before: hydrate every complaint as an ORM object
+        orm_queries = {
+            "stats": lambda: db.query(models.MockComplaint).all(),
+            "region_bbox": lambda: [c for c in db.query(models.MockComplaint).all()
+                                    if c.lat is not None and REGION_BBOX[0] <= c.lat <= REGION_BBOX[2]
+                                    and REGION_BBOX[1] <= c.lng <= REGION_BBOX[3]],
+        }
+        for name, fn in orm_queries.items():
+            results[f"orm_{name}_seconds"] = timed(lambda: (fn(), db.expunge_all()), 1)
+        db.close()
+        engine.dispose()
+
+    results = {
+        "snapshot_load_seconds": load_seconds,
+        "snapshot_bytes_per_row": bytes_per_row,
+        "snapshot_refresh_1k_new_1k_updated_seconds": refresh_seconds,
+        "snapshot_refresh_idle_seconds": idle_refresh_seconds,
+        **results,
+    }
+    report(f"snapshot_{args.rows}", results, args.baseline, args.threshold)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Cold-start benchmark: `import main` in a fresh interpreter, and process launch to the first
+HTTP response from uvicorn.
+
+    python -m benchmarks.startup [--runs 5] [--baseline path.json] [--threshold 0.3]
+
+Runs inside a temp directory holding a copy of complaints.db, so the relative SQLite path and
+trace/log files never touch the working tree.
+"""
+import os
+import sys
+import time
+import shutil
+import socket
+import argparse
+import statistics
+import subprocess
+import tempfile
+import urllib.request
+from pathlib import Path
+
+from benchmarks.common import report
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+
+
+def _env():
+    env = dict(os.environ)
+    env["PYTHONPATH"] = str(BACKEND_DIR) + os.pathsep + env.get("PYTHONPATH", "")
+    env.setdefault("STARTUP_WARMUP", "0")
+    return env
+
+
+def import_time(workdir: Path):
+    out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=workdir, env=_env(),
+                         capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_to_first_response(workdir: Path, path: str = "/", timeout: float = 60.0):
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}{path}"
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with {proc.returncode}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as resp:
+                    resp.read()
+                return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError(f"No response from {url} within {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure backend cold start")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--baseline", type=Path, default=None)
+    parser.add_argument("--threshold", type=float, default=0.3, help="allowed slowdown vs baseline (0.3 = 30%%)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        db = BACKEND_DIR / "complaints.db"
+        if db.exists():
+            shutil.copy(db, workdir / "complaints.db")
+
+        import_time(workdir)  # warm the OS file cache / .pyc files
+        imports = [import_time(workdir) for _ in range(args.runs)]
+        first_response = [time_to_first_response(workdir) for _ in range(args.runs)]
+
+    report("startup", {
+        "import_main_seconds": statistics.median(imports),
+        "time_to_first_response_seconds": statistics.median(first_response),
+    }, args.baseline, args.threshold)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -18,3 +18,46 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def migrate_schema(bind=engine):
+    """
+    create_all() never alters existing tables, so add any model columns and indexes missing
+    from an older complaints.db (additive, nullable columns only).
+    """
+    import models  # registers the tables on Base.metadata when called before any model import
+    Base.metadata.create_all(bind=bind)
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    col_type = column.type.compile(dialect=bind.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {col_type}'))
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+
+    # Full-text index + sync triggers on mock_complaints (raw SQL, not part of the metadata)
+    from agents.complaint_search import ensure_search_index
+    ensure_search_index(bind)
+
+    # District of rows saved before the column existed: the search/export/batch filters use it
+    from agents.complaint_search import ensure_districts
+    ensure_districts(bind)
+
+    # created_at stamped by SQLite's CURRENT_TIMESTAMP (UTC, whole seconds) before the model set
+    # local time itself: convert those rows once so hour-of-day analytics use one clock
+    with bind.begin() as conn:
+        conn.execute(text(
+            "UPDATE mock_complaints SET created_at = strftime('%Y-%m-%d %H:%M:%S', created_at, 'localtime') || '.000000' "
+            "WHERE length(created_at) = 19"
+        ))
+
+    # The columnar snapshot refreshes from the change log now; its old updated_at trigger goes
+    from agents.complaint_snapshot import drop_legacy_trigger
+    drop_legacy_trigger(bind)
+
+    # Change-log triggers for `since=` cursors on the dashboard endpoints
+    from agents.complaint_changes import ensure_change_log
+    ensure_change_log(bind)
@@ -1,8 +1,8 @@
-from database import engine, SessionLocal, Base
+from database import engine, SessionLocal, Base, migrate_schema
 from models import WordCloudItem, ComplaintPattern, HighRiskComplaint, InsightData, DashboardStat
 
 def init_db():
-    Base.metadata.create_all(bind=engine)
+    migrate_schema(engine)
     db = SessionLocal()
 
     # Clear existing data (optional for dev)
@@ -1,23 +1,43 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Header, Request
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List, Optional, Dict
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from datetime import datetime
 import os
 import uuid
+import asyncio
+import logging
 from pathlib import Path
 from dotenv import load_dotenv
 
-from agents.civil_complaint import CivilComplaintAgent
-from agents.insight import InsightAgent
-from agents.context_analysis_agent import analysis_graph
-from agents.openai_service import get_openai_service
+# Heavy agent modules (openai, langgraph, langchain_openai) are imported lazily in the
+# get_*() accessors below, so pods that only serve dashboard reads never load them.
+from agents.classifier import cascade_stats
+from agents.triage import get_triage_queues, resolved_today
+from agents.complaint_search import search_complaints
+from agents.complaint_export import FORMATS as EXPORT_FORMATS, export_complaints, parse_columns
+from agents.complaint_reports import MAX_BATCH, CONCURRENCY as REPORT_CONCURRENCY, cached_report_for, encode_ndjson, encode_sse, report_for, stream_batch_reports
+from agents.region_jobs import analysis_events, analysis_result, analysis_state, get_region_jobs, resume_config, run_config, run_status
+from agents.complaint_snapshot import REFRESH_SECONDS, fetch_text, get_complaint_snapshot
+from agents.complaint_changes import changes_since
+from agents.word_cloud import get_word_cloud_worker
+from agents.image_cache import check_dependencies as check_image_dependencies
+from agents.scoring_pipeline import enqueue_stale, queue_status, MODEL_VERSION as SCORING_MODEL_VERSION
 
-from database import engine, get_db
+from database import SessionLocal, engine, get_db, migrate_schema
 import models
+import metrics
+import tracing
+import admission
+import profiling
+import sharding
+from sharding import complaint_session, fetch_changed, scatter_complaints
 
-# Create tables if not exist (handled by init_db but good safety)
-models.Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
 
 # Load environment variables
 env_path = Path(__file__).resolve().parent.parent / ".env"
@@ -25,7 +45,68 @@ print(f"DEBUG: Loading env from {env_path}, Exists: {env_path.exists()}")
 load_dotenv(dotenv_path=env_path)
 print(f"DEBUG: OPENAI_API_KEY Loaded: {bool(os.getenv('OPENAI_API_KEY'))}")
 
-app = FastAPI(title="Busan Civil Complaint AI Platform")
+# STARTUP_WARMUP: "0" (default) = everything lazy, "1" = warm up before serving,
+# "background" = start serving immediately and warm up in a thread.
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "0").lower()
+
+# --- Lazy Agents ---
+
+@lru_cache(maxsize=None)
+def get_civil_agent():
+    from agents.civil_complaint import CivilComplaintAgent
+    return CivilComplaintAgent()
+
+@lru_cache(maxsize=None)
+def get_insight_agent():
+    from agents.insight import InsightAgent
+    return InsightAgent()
+
+@lru_cache(maxsize=None)
+def get_perception_agent():
+    from agents.perception import PerceptionAgent
+    return PerceptionAgent()
+
+@lru_cache(maxsize=None)
+def get_planner_agent():
+    from agents.planner import PlannerAgent
+    return PlannerAgent()
+
+def get_analysis_graph():
+    from agents.context_analysis_agent import get_analysis_graph as _get_analysis_graph
+    return _get_analysis_graph()
+
+def warm_up():
+    """Import agent modules, compile the graph and build clients ahead of the first request."""
+    from agents.openai_service import get_openai_service
+    from agents.gazetteer import get_gazetteer
+    from agents.manual_index import get_manual_search_engine
+    get_civil_agent(), get_insight_agent(), get_perception_agent(), get_planner_agent()
+    get_analysis_graph()
+    service = get_openai_service()
+    if not service.mock_mode:
+        service.client
+    get_gazetteer()
+    get_manual_search_engine().reload()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create tables if not exist (handled by init_db but good safety), and add new columns to old DBs
+    migrate_schema(engine)
+    if profiling.ENABLED:
+        profiling.profile_sync_endpoints(app)
+    if STARTUP_WARMUP in ("1", "true"):
+        warm_up()
+    elif STARTUP_WARMUP == "background":
+        task = asyncio.get_running_loop().run_in_executor(None, warm_up)
+        task.add_done_callback(lambda t: t.exception() and logger.error(f"Warm-up failed: {t.exception()}"))
+    check_image_dependencies()
+    get_region_jobs().start()
+    get_word_cloud_worker().start()
+    yield
+    await get_word_cloud_worker().stop()
+    await get_region_jobs().stop()
+
+app = FastAPI(title="Busan Civil Complaint AI Platform", lifespan=lifespan)
 
 # CORS Setup
 app.add_middleware(
@@ -36,12 +117,43 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Agents
-civil_agent = CivilComplaintAgent()
-insight_agent = InsightAgent()
+# Metrics (/metrics): HTTP latency per route, SQL per request, LLM calls, graph nodes
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.instrument_engine(engine)
+
+# Tracing: root span per request (traceparent-aware, sampled), spans for tools/LLM/DB
+app.add_middleware(tracing.TracingMiddleware)
+tracing.instrument_engine(engine)
+
+# Profiling (admin-only X-Profile header, worker sampler, slow-request log); nothing is
+# installed unless PROFILING_ADMIN_TOKEN or PROFILE_SLOW_MS is set
+if profiling.ENABLED:
+    app.add_middleware(profiling.ProfilingMiddleware)
+    profiling.instrument_engine(engine)
+
+# Admission control for LLM-backed routes: bounded queues + deadlines, 429/503/504 with Retry-After
+@app.exception_handler(admission.Overloaded)
+async def overloaded_handler(request: Request, exc: admission.Overloaded):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": "Server busy, please retry later", "reason": exc.reason, "route": exc.route},
+        headers={"Retry-After": str(exc.retry_after), **({"X-Run-Id": exc.run_id} if getattr(exc, "run_id", None) else {})},
+    )
+
+# Admin endpoints that cost real work (profiles, scoring runs, pattern mining) need
+# X-Admin-Token = PROFILING_ADMIN_TOKEN; without that env var they don't exist
+def require_profiling_admin(x_admin_token: Optional[str] = Header(None)):
+    if profiling.ADMIN_TOKEN is None:
+        raise HTTPException(status_code=404, detail="Admin endpoints are not enabled")
+    if not profiling.check_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
 
 # In-Memory Sessions (Simple cache for demo)
 chat_sessions: Dict[str, List[dict]] = {}
+metrics.registry.register(metrics.Gauge(
+    "chat_sessions", "In-memory chat sessions.", lambda: len(chat_sessions)))
+metrics.registry.register(metrics.Gauge(
+    "chat_session_messages", "Messages held across in-memory chat sessions.", lambda: sum(len(h) for h in list(chat_sessions.values()))))
 
 # Models associated with Pydantic for response
 class ChatResponse(BaseModel):
@@ -53,31 +165,77 @@ class ChatResponse(BaseModel):
 def read_root():
     return {"status": "Busan AI Platform Backend Running"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(metrics.registry.exposition(), media_type="text/plain; version=0.0.4")
+
 # --- Dashboard API Endpoints ---
 
+def _map_marker(complaint_id, category, lat, lng, safety_risk_score):
+    # Determine style based on risk
+    is_risky = (safety_risk_score or 0) >= 8
+    return {
+        "id": complaint_id,
+        "text": category or "민원",
+        "lat": lat,
+        "lng": lng,
+        "size": "3rem" if is_risky else "2rem",
+        "class_name": "text-red-600 font-black animate-pulse" if is_risky else "text-blue-600 font-bold",
+        "style": {"zIndex": 1000}
+    }
+
+def _complaint_markers(db, box, category, max_age):
+    snapshot = get_complaint_snapshot(db.get_bind(), max_age)
+    positions = snapshot.select(bbox=box, category=category, placed_only=True)
+    cols = snapshot.cols
+    return [
+        _map_marker(*item) for item in zip(
+            snapshot.ids(positions), snapshot.decode("category", positions),
+            cols["lat"][positions].tolist(), cols["lng"][positions].tolist(), cols["safety"][positions].tolist())
+    ]
+
+def _changes(db, since):
+    """Change-feed delta for since= (None without it); over every shard when sharded."""
+    if since is None:
+        return None
+    if sharding.ENABLED:
+        return sharding.changes_since(db, since)
+    return changes_since(db, since)
+
 @app.get("/api/map/items")
-def get_map_items(db: Session = Depends(get_db)):
-    # 1. Static Word Cloud Items
+def get_map_items(bbox: Optional[str] = None, category: Optional[str] = None, since: Optional[int] = None,
+                  db: Session = Depends(get_db)):
+    """
+    bbox=min_lat,min_lng,max_lat,max_lng and category narrow the complaint markers (word cloud items are always returned).
+    since=<cursor> returns {"cursor", "reset": false, "upserts", "removed"} for complaints changed after the cursor,
+    or {"cursor", "reset": true, "items"} when the client has to start over.
+    """
+    try:
+        box = [float(v) for v in bbox.split(",")] if bbox else None
+    except ValueError:
+        box = []
+    if box is not None and len(box) != 4:
+        raise HTTPException(status_code=400, detail="bbox must be min_lat,min_lng,max_lat,max_lng")
+
+    delta = _changes(db, since)
+    if delta and not delta["reset"]:
+        upserts, removed = [], list(delta["deleted"])
+        for row in fetch_changed(db, delta["changed"], ("category", "lat", "lng", "safety_risk_score")):
+            placed = row["lat"] and row["lng"]
+            inside = box is None or (placed and box[0] <= row["lat"] <= box[2] and box[1] <= row["lng"] <= box[3])
+            if placed and inside and (category is None or row["category"] == category):
+                upserts.append(_map_marker(row["id"], row["category"], row["lat"], row["lng"], row["safety_risk_score"]))
+            else:
+                removed.append(row["id"])
+        return {"cursor": delta["cursor"], "reset": False, "upserts": upserts, "removed": removed}
+
+    # 1. Word Cloud Items (precomputed from complaint text by agents/word_cloud.py)
     static_items = db.query(models.WordCloudItem).all()
     
-    # 2. Real-time Complaints (MockComplaint)
-    complaints = db.query(models.MockComplaint).all()
-    
-    formatted_complaints = []
-    for c in complaints:
-        if c.lat and c.lng:
-            # Determine style based on risk
-            is_risky = (c.safety_risk_score or 0) >= 8
-            
-            formatted_complaints.append({
-                "id": c.id,
-                "text": c.category or "민원",
-                "lat": c.lat,
-                "lng": c.lng,
-                "size": "3rem" if is_risky else "2rem",
-                "class_name": "text-red-600 font-black animate-pulse" if is_risky else "text-blue-600 font-bold",
-                "style": {"zIndex": 1000}
-            })
+    # 2. Real-time Complaints, selected from the columnar snapshot (no ORM rows), per shard when sharded
+    max_age = 0 if delta else REFRESH_SECONDS
+    parts = scatter_complaints(db, lambda cdb: _complaint_markers(cdb, box, category, max_age), bbox=box)
+    formatted_complaints = [marker for part in parts for marker in part]
             
     # Combine (Schema mismatch handling moved to serializer or simple dict return)
     # Since existing static_items are objects, we'll convert them to dicts to match formatted_complaints
@@ -93,30 +251,52 @@ def get_map_items(db: Session = Depends(get_db)):
         })
         
     result.extend(formatted_complaints)
+    if delta:
+        return {"cursor": delta["cursor"], "reset": True, "items": result}
     return result
 
 @app.get("/api/dashboard/patterns")
 def get_complaint_patterns(db: Session = Depends(get_db)):
-    patterns = db.query(models.ComplaintPattern).all()
+    # Mined patterns come ranked; hand-written cards (rank NULL) sort after them
+    patterns = db.query(models.ComplaintPattern).order_by(
+        models.ComplaintPattern.rank.is_(None), models.ComplaintPattern.rank, models.ComplaintPattern.id
+    ).all()
     return patterns
 
+def _high_risk_item(item):
+    return {
+        "id": item["id"],
+        "title": item["summary"] or "긴급 민원",
+        "time_text": "방금 전", # In real app, calculate time diff
+        "location": item["location"],
+        "description": item["description"] + "..." if item["description"] else "",
+        "category": "warning" if (item["safety_risk_score"] or 0) >= 9 else "water_drop" # Simple icon logic
+    }
+
+HIGH_RISK_COLUMNS = ("summary", "location", "safety_risk_score", "substr(original_text, 1, 50) AS description")
+
 @app.get("/api/dashboard/high-risk")
-def get_high_risk_complaints(db: Session = Depends(get_db)):
-    # Fetch real data from Chat interactions (MockComplaint)
-    # Filter for high risk items (e.g., safety_risk_score >= 8)
-    items = db.query(models.MockComplaint).filter(models.MockComplaint.safety_risk_score >= 8).all()
+def get_high_risk_complaints(since: Optional[int] = None, db: Session = Depends(get_db)):
+    """since=<cursor>: {"cursor", "reset", "upserts", "removed"} deltas (see /api/map/items)."""
+    delta = _changes(db, since)
+    if delta and not delta["reset"]:
+        upserts, removed = [], list(delta["deleted"])
+        for row in fetch_changed(db, delta["changed"], HIGH_RISK_COLUMNS):
+            if (row["safety_risk_score"] or 0) >= 8:
+                upserts.append(_high_risk_item(row))
+            else:
+                removed.append(row["id"])
+        return {"cursor": delta["cursor"], "reset": False, "upserts": upserts, "removed": removed}
+
+    # High risk items (safety_risk_score >= 8) are picked from the snapshot; only their text is read from the DB
+    def high_risk(cdb):
+        snapshot = get_complaint_snapshot(cdb.get_bind(), max_age=0 if delta else REFRESH_SECONDS)
+        return fetch_text(cdb, snapshot, snapshot.select(min_risk=8), HIGH_RISK_COLUMNS)
     
     # Format for frontend
-    result = []
-    for item in items:
-        result.append({
-            "title": item.summary or "긴급 민원",
-            "time_text": "방금 전", # In real app, calculate time diff
-            "location": item.location,
-            "description": item.original_text[:50] + "..." if item.original_text else "",
-            "category": "warning" if (item.safety_risk_score or 0) >= 9 else "water_drop" # Simple icon logic
-        })
-        
+    result = [_high_risk_item(item) for part in scatter_complaints(db, high_risk) for item in part]
+    if delta:
+        return {"cursor": delta["cursor"], "reset": True, "items": result}
     return result
 
 @app.get("/api/dashboard/insight")
@@ -127,26 +307,42 @@ async def get_insight(db: Session = Depends(get_db)):
         return {"summary": insight.content}
     
     # Fallback to generating one if empty (or could trigger agent)
-    stats = await get_stats(db)
-    insight_text = await insight_agent.generate_briefing(stats)
+    stats = await get_stats(db=db)
+    async with admission.slot("insight", admission.BACKGROUND):
+        insight_text = await get_insight_agent().generate_briefing(stats)
     return {"summary": insight_text}
 
 @app.get("/api/dashboard/stats")
-async def get_stats(db: Session = Depends(get_db)):
+async def get_stats(since: Optional[int] = None, db: Session = Depends(get_db)):
+    """since=<cursor> adds "cursor"/"reset" and limits categories to those touched since the cursor (current counts)."""
     try:
-        total = db.query(models.MockComplaint).count()
-        # Basic category grouping logic
+        delta = _changes(db, since)
+
+        def shard_stats(cdb):
+            snapshot = get_complaint_snapshot(cdb.get_bind(), max_age=0 if delta else REFRESH_SECONDS)
+            return len(snapshot), resolved_today(cdb), snapshot.counts("category")
+
+        parts = scatter_complaints(db, shard_stats)
+        total = sum(part[0] for part in parts)
+        # Basic category grouping logic (bincount over the dictionary codes)
         categories = {}
-        complaints = db.query(models.MockComplaint).all()
-        for c in complaints:
-            cat = c.category or "기타"
-            categories[cat] = categories.get(cat, 0) + 1
-            
-        return {
+        for _, _, counts in parts:
+            for cat, count in counts.items():
+                cat = cat or "기타"
+                categories[cat] = categories.get(cat, 0) + count
+
+        stats = {
             "active_complaints": total,
-            "resolved_today": 0,
+            "resolved_today": sum(part[1] for part in parts),
             "categories": categories or {"Road": 0} 
         }
+        if delta is None:
+            return stats
+        if not delta["reset"]:
+            touched = {row["category"] for row in fetch_changed(db, delta["changed"], ("category",))}
+            touched |= {previous["category"] for previous in delta["previous"].values() if "category" in previous}
+            stats["categories"] = {cat: categories.get(cat, 0) for cat in {c or "기타" for c in touched}}
+        return {"cursor": delta["cursor"], "reset": delta["reset"], **stats}
     except Exception as e:
         import traceback
         with open("error.log", "a") as f:
@@ -176,6 +372,13 @@ def get_heatmap_data(db: Session = Depends(get_db)):
     ]
     return heatmap_data
 
+# --- Pattern Mining (also runnable as `python -m agents.pattern_mining`) ---
+
+@app.post("/api/admin/patterns/mine", dependencies=[Depends(require_profiling_admin)])
+def mine_complaint_patterns(db: Session = Depends(get_db)):
+    from agents.pattern_mining import mine_patterns
+    return mine_patterns(db)
+
 # --- Chat Endpoint ---
 
 @app.get("/api/dashboard/stats/general")
@@ -204,32 +407,200 @@ async def analyze_region(request: RegionAnalysisRequest, db: Session = Depends(g
     """
     Stateful Analysis Endpoint (LangGraph)
     """
-    initial_state = {
-        "region_polygon": request.polygon,
-        "db_session": db,
-        "raw_complaints": [],
-        "themes": {},
-        "semantic_context": "",
-        "final_report": "",
-        "action_items": []
-    }
+    initial_state = analysis_state(request.polygon)
+    run_id = uuid.uuid4().hex # checkpoint thread: a failed run can be resumed via /runs/{run_id}/retry
     
     # Run Graph
     try:
-        result = await analysis_graph.ainvoke(initial_state)
+        async with admission.slot("analyze_region", admission.INTERACTIVE):
+            result = await get_analysis_graph().ainvoke(initial_state, run_config(run_id, db))
         return {
+            "run_id": run_id,
             "report": result.get("final_report", "Analysis Failed"),
             "context": result.get("semantic_context", ""),
             "themes": result.get("themes", {})
         }
+    except admission.Overloaded as e:
+        e.run_id = run_id # a 504 (deadline overrun) leaves checkpoints behind: resumable
+        raise
     except Exception as e:
         print(f"Graph Error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=500, detail=str(e), headers={"X-Run-Id": run_id})
+
+@app.post("/api/map/analyze-region/stream")
+async def stream_region_analysis(request: RegionAnalysisRequest):
+    """
+    Streaming variant (SSE): {"type": "started", "run_id"}, a "node" event as each node
+    finishes (retrieved count, themes...), "token" events while the report is written, then
+    {"type": "done", "result"} with report, themes, chart_data, urgency_score and
+    sentiment_breakdown. Failures and admission refusals arrive as {"type": "failed"}; the
+    run is checkpointed, so /runs/{run_id}/retry picks it up.
+    """
+    if len(request.polygon) < 3 or any(len(point) != 2 for point in request.polygon):
+        raise HTTPException(status_code=400, detail="polygon needs at least 3 [lat, lng] points")
+    run_id = uuid.uuid4().hex
+
+    # The graph runs in a producer task that holds the admission slot: the slot's deadline
+    # cancels that task, never the response's send(), and the outcome is always an event
+    async def produce(queue):
+        db = SessionLocal()  # the request's session is closed once the response starts
+        try:
+            async with admission.slot("analyze_region", admission.INTERACTIVE):
+                async for event in analysis_events(analysis_state(request.polygon), run_config(run_id, db), tokens=True):
+                    queue.put_nowait(event)
+            state = await get_analysis_graph().aget_state(run_config(run_id))
+            queue.put_nowait({"type": "done", "run_id": run_id, "result": analysis_result(state.values)})
+        except admission.Overloaded as e:
+            queue.put_nowait({"type": "failed", "run_id": run_id, "error": str(e), "status": e.status_code,
+                              "reason": e.reason, "retry_after": e.retry_after})
+        except Exception as e:
+            print(f"Graph Error: {e}")
+            queue.put_nowait({"type": "failed", "run_id": run_id, "error": str(e)})
+        finally:
+            db.close()
+            queue.put_nowait(None)
+
+    async def body():
+        queue = asyncio.Queue()
+        producer = asyncio.create_task(produce(queue))
+        try:
+            yield encode_sse({"type": "started", "run_id": run_id})
+            while (event := await queue.get()) is not None:
+                yield encode_sse(event)
+        finally:
+            producer.cancel()  # no-op when finished; stops the run (and its LLM spend) if the client left
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Run-Id": run_id},
+    )
+
+@app.get("/api/map/analyze-region/runs/{run_id}")
+async def get_region_analysis_run(run_id: str):
+    """Checkpointed progress of a run: next node, per-node timings, node errors, result when done."""
+    status = await run_status(run_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return status
+
+@app.post("/api/map/analyze-region/runs/{run_id}/retry")
+async def retry_region_analysis_run(run_id: str, from_node: Optional[str] = None, db: Session = Depends(get_db)):
+    """
+    Continue a failed run from its last checkpoint (only the failed node runs again), or
+    re-run from `from_node` (e.g. "report") onwards, reusing the earlier nodes' results.
+    """
+    if await run_status(run_id) is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    try:
+        config = await resume_config(run_id, db, from_node)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        async with admission.slot("analyze_region", admission.INTERACTIVE):
+            await get_analysis_graph().ainvoke(None, config)
+    except admission.Overloaded:
+        raise
+    except Exception as e:
+        print(f"Graph Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e), headers={"X-Run-Id": run_id})
+    return await run_status(run_id)
+
+# Asynchronous variant: answers with a job id at once; poll the job or subscribe to its events
+@app.post("/api/map/analyze-region/jobs", status_code=202)
+async def submit_region_analysis(request: RegionAnalysisRequest):
+    if len(request.polygon) < 3 or any(len(point) != 2 for point in request.polygon):
+        raise HTTPException(status_code=400, detail="polygon needs at least 3 [lat, lng] points")
+    job, deduplicated = get_region_jobs().submit(request.polygon)
+    return {"job_id": job.id, "status": job.status, "deduplicated": deduplicated}
+
+@app.get("/api/map/analyze-region/jobs/{job_id}")
+async def get_region_analysis_job(job_id: str):
+    job = get_region_jobs().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job.to_dict()
+
+@app.post("/api/map/analyze-region/jobs/{job_id}/retry", status_code=202)
+async def retry_region_analysis_job(job_id: str, from_node: Optional[str] = None):
+    """Re-queue a finished job; it resumes from its checkpoints (or from `from_node`) instead of starting over."""
+    jobs = get_region_jobs()
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    if not jobs.retry(job, from_node):
+        raise HTTPException(status_code=409, detail="Job is still queued or running")
+    return {"job_id": job.id, "status": job.status}
+
+@app.get("/api/map/analyze-region/jobs/{job_id}/events")
+async def follow_region_analysis_job(job_id: str, after: int = 0):
+    """SSE stream of the job's events (from index `after`, to resume), ending with done/failed."""
+    jobs = get_region_jobs()
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+
+    async def body():
+        async for event in jobs.follow(job, after):
+            yield encode_sse(event)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/api/complaints/search")
+def search_complaints_endpoint(
+    q: str,
+    category: Optional[str] = None,
+    district: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    min_risk: Optional[int] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    try:
+        return search_complaints(db, q, category, district, date_from, date_to, min_risk, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/complaints/export")
+def export_complaints_endpoint(
+    format: str = "csv",
+    columns: Optional[str] = None,
+    category: Optional[str] = None,
+    district: Optional[str] = None,
+    status: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    min_risk: Optional[int] = None,
+):
+    """Streams the whole filtered set; memory stays flat regardless of row count."""
+    try:
+        stream = export_complaints(
+            SessionLocal, format, parse_columns(columns),
+            category=category, district=district, status=status,
+            date_from=date_from, date_to=date_to, min_risk=min_risk,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ImportError as e:
+        raise HTTPException(status_code=501, detail=f"Parquet export unavailable: {e}")
+    filename = f"complaints_{datetime.now():%Y%m%d_%H%M%S}.{format}"
+    return StreamingResponse(
+        stream,
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
 @app.get("/api/complaint/{complaint_id}/analyze")
 async def analyze_complaint_detail(complaint_id: str, db: Session = Depends(get_db)):
     # Fetch complaint
-    complaint = db.query(models.MockComplaint).filter(models.MockComplaint.id == complaint_id).first()
+    with complaint_session(db, complaint_id) as cdb:
+        complaint = cdb.query(models.MockComplaint).filter(models.MockComplaint.id == complaint_id).first()
     if not complaint:
         raise HTTPException(status_code=404, detail="Complaint not found")
         
@@ -243,14 +614,164 @@ async def analyze_complaint_detail(complaint_id: str, db: Session = Depends(get_
         "safety_risk_score": complaint.safety_risk_score
     }
     
-    # Generate AI Report
-    analysis_text = await civil_agent.generate_report(data)
+    # Generate AI Report (reused from complaint_reports until the complaint changes);
+    # a current cached report needs no LLM call, so no admission slot either
+    try:
+        analysis_text, cached = cached_report_for(db, complaint), True
+        if analysis_text is None:
+            async with admission.slot("complaint_analyze", admission.INTERACTIVE):
+                analysis_text, cached = await report_for(db, get_civil_agent(), complaint)
+    except admission.Overloaded:
+        raise
+    except Exception as e:
+        analysis_text, cached = f"리포트 생성 실패: {str(e)}", False
     
     return {
         "complaint": data,
-        "analysis_report": analysis_text
+        "analysis_report": analysis_text,
+        "cached": cached
     }
 
+# --- Batch Reports (NDJSON, or SSE with Accept: text/event-stream) ---
+
+class ReportFilter(BaseModel):
+    category: Optional[str] = None
+    district: Optional[str] = None
+    status: Optional[str] = None
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+    min_risk: Optional[int] = None
+
+class BatchReportRequest(BaseModel):
+    ids: Optional[List[str]] = None # either explicit ids ...
+    filter: Optional[ReportFilter] = None # ... or a filter (riskiest first)
+    limit: int = MAX_BATCH
+    concurrency: int = REPORT_CONCURRENCY
+    refresh: bool = False # regenerate even when a current cached report exists
+
+@app.post("/api/complaints/reports/batch")
+async def batch_reports(request: BatchReportRequest, http_request: Request):
+    if not request.ids and request.filter is None:
+        raise HTTPException(status_code=400, detail="Provide ids or filter")
+    sse = "text/event-stream" in http_request.headers.get("accept", "")
+    encode = encode_sse if sse else encode_ndjson
+    events = stream_batch_reports(
+        SessionLocal, get_civil_agent(), ids=request.ids,
+        filters=request.filter.model_dump() if request.filter else None,
+        limit=request.limit, concurrency=request.concurrency, refresh=request.refresh,
+    )
+
+    async def body():
+        async for event in events:
+            yield encode(event)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# --- Triage (Perception -> Planner, local classifier cascade in front of the LLM) ---
+
+class TriageRequest(BaseModel):
+    message: str
+    image_url: Optional[str] = None
+
+@app.post("/api/triage/classify")
+async def classify_complaint(request: TriageRequest):
+    perception = await get_perception_agent().process(request.message, image_url=request.image_url)
+    plan = await get_planner_agent().create_plan(perception)
+    return {"perception": perception, "plan": plan}
+
+# --- Department Work Queues (agents/triage.py) ---
+
+class ClaimRequest(BaseModel):
+    assignee: str
+    complaint_id: Optional[str] = None # claim a specific complaint instead of the top one
+
+@app.get("/api/triage/queues")
+def get_triage_departments():
+    return get_triage_queues().departments()
+
+@app.get("/api/triage/queues/{department}")
+def peek_triage_queue(department: str, k: int = 5):
+    return get_triage_queues().peek(department, min(max(k, 1), 100))
+
+@app.post("/api/triage/queues/{department}/claim")
+def claim_triage_item(department: str, request: ClaimRequest, db: Session = Depends(get_db)):
+    item = get_triage_queues().claim(db, department, request.assignee, request.complaint_id)
+    if item is None:
+        raise HTTPException(status_code=404, detail="No open complaint to claim")
+    return item
+
+@app.post("/api/triage/complaints/{complaint_id}/release")
+def release_triage_item(complaint_id: str, db: Session = Depends(get_db)):
+    complaint = get_triage_queues().release(db, complaint_id)
+    if complaint is None:
+        raise HTTPException(status_code=404, detail="Complaint not found or not in progress")
+    return {"id": complaint.id, "status": complaint.status}
+
+@app.post("/api/triage/complaints/{complaint_id}/resolve")
+def resolve_triage_item(complaint_id: str, db: Session = Depends(get_db)):
+    complaint = get_triage_queues().resolve(db, complaint_id)
+    if complaint is None:
+        raise HTTPException(status_code=404, detail="Complaint not found")
+    return {"id": complaint.id, "status": complaint.status, "resolved_at": complaint.resolved_at}
+
+@app.get("/api/admin/admission")
+def get_admission_status():
+    return admission.controller.snapshot()
+
+@app.get("/api/admin/region-jobs")
+async def get_region_jobs_status():
+    return get_region_jobs().status()
+
+@app.get("/api/admin/model-routing")
+def get_model_routing_stats():
+    from agents.model_router import get_model_router
+    return get_model_router().snapshot()
+
+@app.get("/api/admin/classifier/stats")
+def get_classifier_stats():
+    return cascade_stats.snapshot()
+
+# --- Profiling (see profiling.py; needs X-Admin-Token) ---
+
+@app.get("/api/admin/profiles", dependencies=[Depends(require_profiling_admin)])
+def list_profiles():
+    return profiling.list_profiles()
+
+@app.get("/api/admin/profiles/{profile_id}", dependencies=[Depends(require_profiling_admin)])
+def download_profile(profile_id: str, format: str = "collapsed"):
+    if format not in ("pstats", "collapsed") or not all(ch.isalnum() or ch == "-" for ch in profile_id):
+        raise HTTPException(status_code=400, detail="format must be pstats or collapsed")
+    path = profiling.profile_path(profile_id, format)
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, filename=path.name, media_type="text/plain" if format == "collapsed" else "application/octet-stream")
+
+@app.post("/api/admin/profile/sample", dependencies=[Depends(require_profiling_admin)])
+async def sample_worker_profile(seconds: float = 10.0, interval: float = 0.005, include_idle: bool = False):
+    try:
+        return await asyncio.to_thread(profiling.sample_worker, seconds, interval, include_idle)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.get("/api/admin/profile/slow", dependencies=[Depends(require_profiling_admin)])
+def get_slow_requests(limit: int = 50):
+    return list(profiling.slow_requests)[-limit:][::-1]
+
+# --- Batch Re-scoring (workers run via `python -m agents.scoring_pipeline`) ---
+
+@app.post("/api/admin/scoring/enqueue", dependencies=[Depends(require_profiling_admin)])
+def enqueue_rescoring(db: Session = Depends(get_db)):
+    queued = enqueue_stale(db)
+    return {"queued": queued, "model_version": SCORING_MODEL_VERSION}
+
+@app.get("/api/admin/scoring/status")
+def get_rescoring_status(db: Session = Depends(get_db)):
+    return queue_status(db)
+
 # --- Chat Endpoint ---
 
 class ChatRequest(BaseModel):
@@ -280,12 +801,14 @@ async def chat_endpoint(request: ChatRequest, db: Session = Depends(get_db)):
 
     # Chat with Boogie Agent
     # Pass DB session for tools to use
-    response_text, updated_history = await civil_agent.chat(
-        message_content, 
-        history=history, 
-        db=db, 
-        image_data=request.image_data
-    )
+    priority = admission.chat_priority(request.message, has_image=bool(image_input))
+    async with admission.slot("chat", priority):
+        response_text, updated_history = await get_civil_agent().chat(
+            message_content, 
+            history=history, 
+            db=db, 
+            image_data=request.image_data
+        )
     
     # Store history
     new_history = [msg for msg in updated_history if msg['role'] != 'system']
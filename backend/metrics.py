@@ -0,0 +1,289 @@
+"""
+Minimal in-process Prometheus-style metrics (text exposition format 0.0.4).
+
+Recording is a dict lookup + bisect + a few additions under an uncontended lock,
+so it is safe to call on every request, query and LLM call.
+"""
+import time
+import bisect
+import asyncio
+import functools
+import threading
+from contextvars import ContextVar
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def collect(self):
+        with self._lock:  # copy, then format outside the lock
+            values = list(self._values.items())
+        lines = self.header()
+        for labels, value in sorted(values):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Gauge(_Metric):
+    """
+    Gauge whose value is read from a callback at scrape time (no hot-path cost).
+    With labelnames, the callback returns {label values tuple: value}.
+    """
+    type_name = "gauge"
+
+    def __init__(self, name, documentation, callback, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def collect(self):
+        if not self.labelnames:
+            return self.header() + [f"{self.name} {self.callback()}"]
+        lines = self.header()
+        for labels, value in sorted(self.callback().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            if i < len(self.buckets):
+                series[i] += 1  # values above the last bound only land in +Inf (= count)
+            series[-2] += value
+            series[-1] += 1
+
+    def collect(self):
+        with self._lock:  # series lists are updated in place, so copy each one
+            snapshot = [(labels, list(series)) for labels, series in self._series.items()]
+        lines = self.header()
+        for labels, series in sorted(snapshot):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def exposition(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# --- HTTP ---
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route", "status")))
+http_request_db_queries = registry.register(Histogram(
+    "http_request_db_queries", "SQL statements executed per HTTP request.", ("route",), COUNT_BUCKETS))
+http_request_db_seconds = registry.register(Histogram(
+    "http_request_db_seconds", "Time spent in SQL per HTTP request.", ("route",), DB_BUCKETS))
+
+# --- DB ---
+db_query_duration = registry.register(Histogram(
+    "db_query_duration_seconds", "SQL statement latency by statement type.", ("statement",), DB_BUCKETS))
+
+# --- LLM ---
+llm_request_duration = registry.register(Histogram(
+    "llm_request_duration_seconds", "OpenAI call latency.", ("agent", "model")))
+llm_tokens = registry.register(Counter(
+    "llm_tokens_total", "OpenAI tokens consumed.", ("agent", "model", "kind")))
+llm_errors = registry.register(Counter(
+    "llm_errors_total", "OpenAI call errors.", ("agent", "model")))
+llm_cost = registry.register(Counter(
+    "llm_cost_usd_total", "Estimated OpenAI spend from token usage and the routing policy's prices.", ("agent", "model")))
+llm_route_decisions = registry.register(Counter(
+    "llm_route_decisions_total", "Model tier chosen per call by agents/model_router.py.", ("agent", "stage", "tier")))
+
+# --- Admission control (admission.py) ---
+admission_shed = registry.register(Counter(
+    "admission_shed_total", "LLM-backed requests refused or cut off by admission control.", ("route", "priority", "reason")))
+admission_wait = registry.register(Histogram(
+    "admission_wait_seconds", "Time admitted requests spent queued for an LLM slot.", ("route", "priority")))
+
+# --- Complaint photos (agents/image_cache.py) ---
+image_cache_lookups = registry.register(Counter(
+    "image_cache_lookups_total", "Complaint photos looked up in the perceptual-hash cache.", ("result",)))
+
+# --- LangGraph ---
+graph_node_duration = registry.register(Histogram(
+    "graph_node_duration_seconds", "LangGraph node execution time.", ("graph", "node")))
+
+
+# Per-request accumulator for SQL stats; set by the HTTP middleware
+_request_db_stats: ContextVar = ContextVar("request_db_stats", default=None)
+
+
+def begin_request_db_stats():
+    stats = [0, 0.0]  # queries, seconds
+    _request_db_stats.set(stats)
+    return stats
+
+
+def record_query(statement: str, seconds: float):
+    kind = statement.lstrip().split(None, 1)[0].upper() if statement else "OTHER"
+    db_query_duration.observe(seconds, kind)
+    stats = _request_db_stats.get()
+    if stats is not None:
+        stats[0] += 1
+        stats[1] += seconds
+
+
+def instrument_engine(engine):
+    """Time every statement via SQLAlchemy cursor events."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("query_start")
+        if starts:
+            record_query(statement, time.perf_counter() - starts.pop())
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        starts = exception_context.connection.info.get("query_start") if exception_context.connection else None
+        if starts:
+            starts.pop()
+
+
+def record_llm_call(agent: str, model: str, seconds: float, usage=None, error: bool = False):
+    """usage: OpenAI `response.usage` or LangChain `usage_metadata` (dict)."""
+    llm_request_duration.observe(seconds, agent, model)
+    if error:
+        llm_errors.inc(1, agent, model)
+    if usage is None:
+        return
+    prompt, completion = token_counts(usage)
+    llm_tokens.inc(prompt, agent, model, "prompt")
+    llm_tokens.inc(completion, agent, model, "completion")
+
+
+def token_counts(usage):
+    """(prompt, completion) from OpenAI `response.usage` or LangChain `usage_metadata`."""
+    if usage is None:
+        return 0, 0
+    if isinstance(usage, dict):
+        return usage.get("input_tokens", 0) or 0, usage.get("output_tokens", 0) or 0
+    return getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0
+
+
+def timed_node(graph: str, node: str, fn):
+    """
+    Wrap a LangGraph node function to record its duration.
+    functools.wraps keeps the original signature visible, so LangGraph still injects `config`.
+    """
+    if asyncio.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(state, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await fn(state, *args, **kwargs)
+            finally:
+                graph_node_duration.observe(time.perf_counter() - start, graph, node)
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(state, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(state, *args, **kwargs)
+        finally:
+            graph_node_duration.observe(time.perf_counter() - start, graph, node)
+    return wrapper
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (no BaseHTTPMiddleware task/stream overhead).
+    Labels by route template (e.g. /api/complaint/{complaint_id}/analyze) to keep cardinality bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        db_stats = begin_request_db_stats()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            http_request_duration.observe(time.perf_counter() - start, scope["method"], route, str(status[0]))
+            http_request_db_queries.observe(db_stats[0], route)
+            http_request_db_seconds.observe(db_stats[1], route)
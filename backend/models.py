@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, Float, Text, JSON, DateTime
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, Float, Text, JSON, DateTime, UniqueConstraint, LargeBinary
 from sqlalchemy.sql import func
 from database import Base
 
@@ -13,6 +15,11 @@ class WordCloudItem(Base):
     class_name = Column(String) # Tailwind classes
     style = Column(JSON, nullable=True) # Custom styles if any
 
+    # Set by agents/word_cloud.py; NULL cell = hand-written item
+    cell = Column(String, nullable=True, index=True) # "row:col" of the map grid
+    weight = Column(Float, nullable=True) # TF-IDF score before size mapping
+    updated_at = Column(DateTime(timezone=True), nullable=True)
+
 class ComplaintPattern(Base):
     __tablename__ = "complaint_patterns"
 
@@ -21,6 +28,14 @@ class ComplaintPattern(Base):
     description = Column(Text)
     percentage = Column(Integer, nullable=True) # For progress bars if needed
 
+    # Set by agents/pattern_mining.py; NULL kind = hand-written card
+    kind = Column(String, nullable=True) # time, weekday, surge
+    district = Column(String, nullable=True)
+    category = Column(String, nullable=True)
+    score = Column(Float, nullable=True) # z-score, higher = stronger evidence
+    rank = Column(Integer, nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=True)
+
 class HighRiskComplaint(Base):
     __tablename__ = "high_risk_complaints"
 
@@ -48,6 +63,7 @@ class MockComplaint(Base):
     location = Column(String)
     lat = Column(Float, nullable=True) # New: For Map
     lng = Column(Float, nullable=True) # New: For Map
+    district = Column(String, nullable=True, index=True) # 구, from the gazetteer (older rows backfilled by migrate_schema)
     category = Column(String)
     
     # 10+ AI Metrics
@@ -64,7 +80,24 @@ class MockComplaint(Base):
     department_in_charge = Column(String)
     
     status = Column(String)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Naive local time like the other timestamps; SQLite's CURRENT_TIMESTAMP default would be UTC
+    created_at = Column(DateTime(timezone=True), default=datetime.now, server_default=func.now(), index=True)
+
+    # Triage workflow (see agents/triage.py): 접수완료 -> 처리중 -> 처리완료
+    claimed_by = Column(String, nullable=True)
+    claimed_at = Column(DateTime(timezone=True), nullable=True)
+    resolved_at = Column(DateTime(timezone=True), nullable=True, index=True)
+
+    # Batch re-scoring bookkeeping (see agents/scoring_pipeline.py)
+    scoring_model_version = Column(String, nullable=True) # e.g. "gpt-4o:v1", NULL = chat-time/unscored
+    scored_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Legacy: stamped by the snapshot's old refresh trigger, no longer maintained (see complaint_changes)
+    updated_at = Column(String, nullable=True, index=True)
+
+    # Photo fingerprint (see agents/image_cache.py) and the earlier complaint filed with the same photo
+    image_hash = Column(String, nullable=True, index=True)
+    duplicate_of = Column(String, nullable=True, index=True)
 
 class DashboardStat(Base):
     __tablename__ = "dashboard_stats"
@@ -72,3 +105,137 @@ class DashboardStat(Base):
     key = Column(String, primary_key=True)
     value = Column(String)
     description = Column(String)
+
+class ScoringJob(Base):
+    __tablename__ = "scoring_jobs"
+    __table_args__ = (UniqueConstraint("complaint_id", "model_version"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    complaint_id = Column(String, index=True)
+    model_version = Column(String)
+    status = Column(String, index=True, default="pending") # pending, running, done, failed
+    attempts = Column(Integer, default=0)
+    worker_id = Column(String, nullable=True)
+    lease_until = Column(DateTime(timezone=True), nullable=True) # running jobs past this are reclaimed
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class PatternCell(Base):
+    """Complaint counts per district x category x ISO week x weekday x hour (pattern mining cube)."""
+    __tablename__ = "pattern_cells"
+    __table_args__ = (UniqueConstraint("district", "category", "week", "weekday", "hour"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    district = Column(String)
+    category = Column(String)
+    week = Column(String, index=True) # Monday of the week, "YYYY-MM-DD"
+    weekday = Column(Integer) # 0 = Monday
+    hour = Column(Integer) # 0-23
+    count = Column(Integer, default=0)
+
+class AnalyticsCursor(Base):
+    """High-water mark of MockComplaint rows already folded into an incremental analytics job."""
+    __tablename__ = "analytics_cursors"
+
+    name = Column(String, primary_key=True)
+    last_seq = Column(Integer, nullable=True) # change-log seq (word cloud) or mock_complaints rowid (patterns)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class WordCloudCell(Base):
+    """Per map cell complaint count and coordinate sums (word placement at the centroid)."""
+    __tablename__ = "word_cloud_cells"
+
+    cell = Column(String, primary_key=True) # "row:col"
+    docs = Column(Integer, default=0)
+    lat_sum = Column(Float, default=0.0)
+    lng_sum = Column(Float, default=0.0)
+
+class WordCloudDoc(Base):
+    """What one complaint contributes to the word cloud counts, so an update or delete can take it back out."""
+    __tablename__ = "word_cloud_docs"
+
+    complaint_id = Column(String, primary_key=True)
+    cell = Column(String, index=True)
+    lat = Column(Float)
+    lng = Column(Float)
+    terms = Column(JSON) # distinct terms counted in the cell
+
+class WordCloudTerm(Base):
+    """Number of complaints in a map cell mentioning a term (document frequency within the cell)."""
+    __tablename__ = "word_cloud_terms"
+    __table_args__ = (UniqueConstraint("cell", "term"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    cell = Column(String, index=True)
+    term = Column(String, index=True)
+    df = Column(Integer, default=0)
+
+class ComplaintReport(Base):
+    """Cached AI analysis report per complaint (agents/complaint_reports.py); stale once the inputs change."""
+    __tablename__ = "complaint_reports"
+
+    complaint_id = Column(String, primary_key=True)
+    input_hash = Column(String) # sha256 of the fields the report prompt is built from
+    model = Column(String, nullable=True)
+    report = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class ComplaintChange(Base):
+    """Append-only change log of mock_complaints, written by triggers (agents/complaint_changes.py)."""
+    __tablename__ = "complaint_changes"
+    __table_args__ = {"sqlite_autoincrement": True} # cursors must never be reused
+
+    seq = Column(Integer, primary_key=True)
+    op = Column(String) # insert, update, delete; truncated = compaction floor
+    complaint_id = Column(String, nullable=True, index=True)
+    fields = Column(Text, nullable=True) # JSON {field: previous value}
+    changed_at = Column(String)
+
+class ShardCursor(Base):
+    """since= cursor of the sharded layout: stands for every shard's change-log seq (sharding.changes_since)."""
+    __tablename__ = "shard_cursors"
+    __table_args__ = {"sqlite_autoincrement": True} # handed-out cursors must never be reused
+
+    id = Column(Integer, primary_key=True)
+    heads = Column(String, unique=True) # JSON {shard: seq}, sorted keys
+
+class AnalysisCheckpoint(Base):
+    """LangGraph checkpoints of region analysis runs (agents/analysis_checkpoints.py)."""
+    __tablename__ = "analysis_checkpoints"
+
+    thread_id = Column(String, primary_key=True) # run id
+    checkpoint_ns = Column(String, primary_key=True, default="")
+    checkpoint_id = Column(String, primary_key=True) # uuid6: sorts by creation time
+    parent_checkpoint_id = Column(String, nullable=True)
+    type = Column(String) # serializer type tag
+    checkpoint = Column(LargeBinary)
+    meta = Column("metadata", Text) # JSON
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+class AnalysisCheckpointWrite(Base):
+    """Pending writes of a checkpoint: finished nodes' outputs (and errors) of an unfinished step."""
+    __tablename__ = "analysis_checkpoint_writes"
+
+    thread_id = Column(String, primary_key=True)
+    checkpoint_ns = Column(String, primary_key=True, default="")
+    checkpoint_id = Column(String, primary_key=True)
+    task_id = Column(String, primary_key=True)
+    idx = Column(Integer, primary_key=True)
+    channel = Column(String)
+    type = Column(String)
+    value = Column(LargeBinary)
+    task_path = Column(String, default="")
+
+class ImageFingerprint(Base):
+    """Perceptual hash -> vision analysis of a complaint photo (agents/image_cache.py), LRU-bounded."""
+    __tablename__ = "image_fingerprints"
+
+    photo_id = Column(String, primary_key=True) # 64-bit hash as 16 hex digits
+    kind = Column(String) # dhash, or sha256 without Pillow (exact re-sends only)
+    description = Column(Text)
+    severity = Column(Integer, nullable=True) # 1-10, visual
+    complaint_id = Column(String, nullable=True) # first complaint filed with this photo
+    hits = Column(Integer, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_used_at = Column(DateTime, index=True) # LRU eviction order
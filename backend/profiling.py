@@ -0,0 +1,371 @@
+"""
+On-demand profiling for production workers (admin only).
+
+  - Per-request cProfile: send `X-Profile: 1` with `X-Admin-Token: $PROFILING_ADMIN_TOKEN`.
+    The response carries `X-Profile-Id`; the profile is saved as <id>.pstats (snakeviz,
+    pstats) and <id>.collapsed (flamegraph.pl / speedscope). Captures the event loop thread
+    and sync endpoint bodies in the threadpool; work handed to other threads (LangGraph
+    nodes, to_thread) shows up as waiting - use the sampler for those. The event-loop profiler
+    also sees every other coroutine that runs on the loop meanwhile, so a profile taken while
+    other requests were in flight mixes their work in; such profiles carry
+    `X-Profile-Overlap: <n requests>` (and "profile_overlap" in the slow log).
+  - Worker sampler: POST /api/admin/profile/sample?seconds=10 samples every thread's stack
+    for a bounded time (sys._current_frames, no tracing hooks) and saves collapsed stacks.
+  - Slow-request log: with PROFILE_SLOW_MS set, every request slower than that is logged
+    with its SQL statements to slow_requests.jsonl; a PROFILE_SLOW_SAMPLE_RATE fraction of
+    requests runs under cProfile so slow ones among them come with a profile too. Sampled
+    captures only start when the request is the only one in flight.
+
+Config:
+    PROFILING_ADMIN_TOKEN     enables the X-Profile header and /api/admin/profile* endpoints
+                              (and guards the scoring enqueue / pattern mining admin POSTs)
+    PROFILE_SLOW_MS           slow-request threshold in ms (default 0 = log off)
+    PROFILE_SLOW_SAMPLE_RATE  fraction of requests profiled in case they turn out slow (default 0 = off)
+    PROFILE_DIR               output directory (default ./profiles)
+
+With neither PROFILING_ADMIN_TOKEN nor PROFILE_SLOW_MS set, main.py installs no middleware,
+engine listeners or endpoint wrappers, so requests pay nothing.
+
+    python -m profiling profiles/<id>.pstats [--sort tottime] [--limit 30]
+"""
+import os
+import sys
+import json
+import hmac
+import time
+import uuid
+import random
+import asyncio
+import cProfile
+import pstats
+import logging
+import functools
+import threading
+from collections import Counter, defaultdict, deque
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+ADMIN_TOKEN = os.getenv("PROFILING_ADMIN_TOKEN") or None
+SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "0"))
+SLOW_SAMPLE_RATE = float(os.getenv("PROFILE_SLOW_SAMPLE_RATE", "0"))
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "profiles"))
+ENABLED = bool(ADMIN_TOKEN or SLOW_MS)
+
+MAX_SAMPLE_SECONDS = 60
+MAX_SQL_PER_REQUEST = 200
+MAX_STACK_DEPTH = 128
+MIN_STACK_US = 50  # collapsed-stack paths below this are dropped
+ADMIN_PREFIX = "/api/admin/profile"  # the profiling endpoints themselves are never profiled or logged
+IDLE_FILES = ("threading.py", "selectors.py", "queue.py")  # leaf frames of parked threads
+
+_capture: ContextVar = ContextVar("profile_capture", default=None)
+# cProfile is one profiler per thread (3.11), so only one request is captured at a time
+_profile_lock = threading.Lock()
+_in_flight = 0  # requests inside the middleware; touched on the event loop only
+_active = None  # the Capture currently profiling the event loop
+_sampler_lock = threading.Lock()
+slow_requests = deque(maxlen=100)
+
+
+def check_admin(token) -> bool:
+    return ADMIN_TOKEN is not None and token is not None and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+def new_profile_id(prefix: str = "req") -> str:
+    return f"{prefix}-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+
+def profile_path(profile_id: str, fmt: str) -> Path:
+    """fmt: pstats | collapsed"""
+    return PROFILE_DIR / f"{profile_id}.{fmt}"
+
+
+class Capture:
+    """One request's profiling state: cProfile objects (event loop + threadpool) and SQL statements."""
+
+    def __init__(self, profile: bool, sql: bool):
+        self.id = new_profile_id() if profile else None
+        self.main = cProfile.Profile() if profile else None
+        self.threads = []
+        self.sql = [] if sql else None
+        self.overlap = 0  # other requests that ran on the loop during the capture
+
+    def stats(self):
+        stats = pstats.Stats(self.main)
+        for profile in self.threads:
+            stats.add(profile)
+        return stats
+
+
+# --- Collapsed stacks ---
+
+def _label(func):
+    filename, line, name = func
+    if filename == "~":  # builtins: "<built-in method time.sleep>"
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def collapsed_stacks(stats) -> str:
+    """
+    "frame;frame;frame microseconds" lines from cProfile data. cProfile keeps caller->callee
+    edges, not whole stacks, so a function's time is split across the paths reaching it in
+    proportion to each edge's cumulative time (the flameprof approximation).
+    """
+    callees = defaultdict(dict)
+    for func, (cc, nc, tt, ct, callers) in stats.stats.items():
+        for caller, edge in callers.items():
+            callees[caller][func] = edge[3]
+
+    lines = Counter()
+
+    def walk(func, stack, share):
+        cc, nc, tt, ct, callers = stats.stats[func]
+        stack = stack + (_label(func),)
+        fraction = share / ct if ct else 0.0
+        self_us = int(tt * fraction * 1e6)
+        if self_us:
+            lines[";".join(stack)] += self_us
+        if len(stack) >= MAX_STACK_DEPTH:
+            return
+        for callee, edge_ct in callees.get(func, {}).items():
+            child = edge_ct * fraction
+            if child * 1e6 >= MIN_STACK_US and _label(callee) not in stack:  # recursion is folded
+                walk(callee, stack, child)
+
+    for func, (cc, nc, tt, ct, callers) in stats.stats.items():
+        if not callers:
+            walk(func, (), ct)
+    return "".join(f"{stack} {us}\n" for stack, us in lines.most_common())
+
+
+def save_profile(capture: Capture) -> str:
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    stats = capture.stats()
+    stats.dump_stats(profile_path(capture.id, "pstats"))
+    profile_path(capture.id, "collapsed").write_text(collapsed_stacks(stats), encoding="utf-8")
+    return capture.id
+
+
+def list_profiles():
+    if not PROFILE_DIR.exists():
+        return []
+    files = sorted(PROFILE_DIR.glob("*.collapsed"), key=lambda p: p.stat().st_mtime, reverse=True)
+    return [{"id": p.stem, "formats": [fmt for fmt in ("pstats", "collapsed") if profile_path(p.stem, fmt).exists()],
+             "created_at": datetime.fromtimestamp(p.stat().st_mtime).isoformat(timespec="seconds")} for p in files]
+
+
+# --- Whole-worker sampler ---
+
+def sample_worker(seconds: float = 10.0, interval: float = 0.005, include_idle: bool = False):
+    """
+    Sample every thread's Python stack for `seconds` (capped at MAX_SAMPLE_SECONDS). Saves
+    <id>.collapsed weighted by sample count and returns a summary with the hottest leaf frames.
+    Raises RuntimeError if a sampling run is already in progress.
+    """
+    if not _sampler_lock.acquire(blocking=False):
+        raise RuntimeError("a sampling run is already in progress")
+    try:
+        seconds = max(0.1, min(seconds, MAX_SAMPLE_SECONDS))
+        interval = max(0.001, interval)
+        me = threading.get_ident()
+        stacks = Counter()
+        leaves = Counter()
+        ticks = 0
+        started = time.monotonic()
+        deadline = started + seconds
+        while time.monotonic() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                leaf = frame.f_code
+                if not include_idle and os.path.basename(leaf.co_filename) in IDLE_FILES:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                stacks[";".join(reversed(stack))] += 1
+                leaves[stack[0]] += 1
+            ticks += 1
+            time.sleep(interval)
+    finally:
+        _sampler_lock.release()
+
+    profile_id = new_profile_id("sample")
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    profile_path(profile_id, "collapsed").write_text(
+        "".join(f"{stack} {count}\n" for stack, count in stacks.most_common()), encoding="utf-8")
+    return {
+        "id": profile_id,
+        "seconds": round(time.monotonic() - started, 3),
+        "ticks": ticks,
+        "samples": sum(stacks.values()),
+        "top_frames": [{"frame": frame, "samples": count} for frame, count in leaves.most_common(20)],
+    }
+
+
+# --- Request hooks ---
+
+def _log_slow(scope, status, seconds, capture, profile_id):
+    sql = capture.sql or []
+    entry = {
+        "time": datetime.now().isoformat(timespec="milliseconds"),
+        "method": scope["method"],
+        "path": scope["path"],
+        "route": getattr(scope.get("route"), "path", None),
+        "status": status,
+        "seconds": round(seconds, 4),
+        "db_queries": len(sql),
+        "db_seconds": round(sum(s for _, s in sql), 4),
+        "sql": [{"statement": statement, "seconds": round(s, 5)} for statement, s in sql[:MAX_SQL_PER_REQUEST]],
+        "profile_id": profile_id,
+        "profile_overlap": capture.overlap if profile_id else None,
+    }
+    slow_requests.append(entry)
+    logger.warning(f"Slow request {entry['method']} {entry['path']}: {seconds * 1000:.0f}ms, "
+                   f"{len(sql)} queries" + (f", profile {profile_id}" if profile_id else ""))
+    try:
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        with open(PROFILE_DIR / "slow_requests.jsonl", "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    except OSError as e:
+        logger.error(f"Writing slow request log failed: {e}")
+
+
+class ProfilingMiddleware:
+    """Pure ASGI; installed only when profiling is configured (see module docstring)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(ADMIN_PREFIX):
+            return await self.app(scope, receive, send)
+
+        global _in_flight, _active
+        requested = False
+        if ADMIN_TOKEN:
+            headers = dict(scope.get("headers", ()))
+            if headers.get(b"x-profile") in (b"1", b"true"):
+                requested = check_admin(headers.get(b"x-admin-token", b"").decode("latin-1"))
+        sampled = SLOW_MS > 0 and _in_flight == 0 and random.random() < SLOW_SAMPLE_RATE
+        capturing = (requested or sampled) and _profile_lock.acquire(blocking=False)
+        capture = Capture(profile=capturing, sql=SLOW_MS > 0)
+        if _active is not None:
+            _active.overlap += 1
+        elif capturing:
+            capture.overlap = _in_flight
+        _in_flight += 1
+        token = _capture.set(capture)
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                if requested:  # "busy": another capture holds the profiler
+                    extra = [(b"x-profile-id", (capture.id or "busy").encode())]
+                    if capture.overlap:
+                        extra.append((b"x-profile-overlap", str(capture.overlap).encode()))
+                    message["headers"] = list(message.get("headers", [])) + extra
+            await send(message)
+
+        start = time.perf_counter()
+        if capturing:
+            _active = capture
+            capture.main.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _in_flight -= 1
+            if capturing:
+                capture.main.disable()
+                _active = None
+                _profile_lock.release()
+            _capture.reset(token)
+            seconds = time.perf_counter() - start
+            slow = SLOW_MS > 0 and seconds * 1000 >= SLOW_MS
+            profile_id = None
+            if capturing and (requested or slow):
+                try:
+                    profile_id = save_profile(capture)
+                except Exception as e:
+                    logger.error(f"Saving profile failed: {e}")
+            if slow:
+                _log_slow(scope, status[0], seconds, capture, profile_id)
+
+
+def _profiled(fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        capture = _capture.get()
+        if capture is None or capture.main is None:
+            return fn(*args, **kwargs)
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.disable()
+            capture.threads.append(profile)
+    wrapper.__profiled__ = True
+    return wrapper
+
+
+def profile_sync_endpoints(app):
+    """Sync endpoints run in the threadpool, out of the event-loop profiler's sight: give them their own."""
+    from fastapi.routing import APIRoute
+
+    for route in app.routes:
+        call = getattr(route, "dependant", None) and route.dependant.call
+        if isinstance(route, APIRoute) and not asyncio.iscoroutinefunction(call) and not getattr(call, "__profiled__", False):
+            route.dependant.call = _profiled(call)
+
+
+def instrument_engine(engine):
+    """Record SQL statements of the current request when the slow-request log is on."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        capture = _capture.get()
+        conn.info.setdefault("profile_query_start", []).append(
+            time.perf_counter() if capture is not None and capture.sql is not None else None)
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("profile_query_start")
+        start = starts.pop() if starts else None
+        if start is not None:
+            capture = _capture.get()
+            if capture is not None and capture.sql is not None:
+                capture.sql.append((statement[:1000], time.perf_counter() - start))
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        starts = exception_context.connection.info.get("profile_query_start") if exception_context.connection else None
+        if starts:
+            starts.pop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Print a saved request profile")
+    parser.add_argument("path", type=Path, help="profiles/<id>.pstats")
+    parser.add_argument("--sort", default="cumulative", help="pstats sort key (cumulative, tottime, ncalls, ...)")
+    parser.add_argument("--limit", type=int, default=30)
+    parser.add_argument("--collapsed", action="store_true", help="print collapsed stacks instead")
+    args = parser.parse_args()
+
+    stats = pstats.Stats(str(args.path))
+    if args.collapsed:
+        sys.stdout.write(collapsed_stacks(stats))
+    else:
+        stats.strip_dirs().sort_stats(args.sort).print_stats(args.limit)
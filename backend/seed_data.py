@@ -269,5 +269,15 @@ def seed_data():
     db.commit()
     print(f"Successfully seeded {len(complaints)} detailed Mock Complaints.")
 
+    # Seeded rows only carry hand-written scores; queue them for model scoring
+    from agents.scoring_pipeline import enqueue_stale
+    print(f"Queued {enqueue_stale(db)} complaints for batch scoring (run: python -m agents.scoring_pipeline).")
+
+    from agents.complaint_search import backfill_districts
+    backfill_districts(db)
+
+    from agents.word_cloud import refresh_word_cloud
+    print(f"Built word cloud for {refresh_word_cloud(db)} map cells.")
+
 if __name__ == "__main__":
     seed_data()
@@ -0,0 +1,439 @@
+"""
+Optional per-district (구) sharding of mock_complaints.
+
+With COMPLAINT_SHARDS_DIR set, complaints live in one SQLite file per 구 under that
+directory (<구>.db, plus _unassigned.db for complaints without a known district), so writes
+from different districts no longer contend on one writer lock and dashboard queries only
+touch the files they need.
+
+Shard-aware paths:
+  - writes: chat saves are routed by district; triage claim/release/resolve update the
+    shard holding the complaint (complaint_session)
+  - reads: map items, dashboard stats and high-risk scatter to every shard, region analysis
+    only to shards whose district bounds intersect the region; shards are queried in
+    parallel (SHARD_SCATTER_WORKERS threads) and the results merged
+  - triage queues load open complaints from all shards; complaint detail looks the id up
+
+Search, export and background jobs walk every shard:
+  - search and batch reports query the shards in parallel and merge the ranked results; a
+    search cursor carries the position reached in each shard
+  - export merges the per-shard streams in (created_at, id) order
+  - word cloud and pattern mining fold each shard's change log / rowids under their own
+    cursor (AnalyticsCursor "<job>:<shard>"); counts stay in complaints.db
+  - the scoring pipeline keeps its job table in complaints.db and scores complaints on the
+    shard holding them
+  - since= change cursors: each shard has its own change log, so the cursor handed out is a
+    ShardCursor id standing for every shard's seq (the last SHARD_CURSOR_KEEP are kept;
+    an older one resets)
+Everything else (reports cache, word cloud, patterns, jobs, checkpoints...) stays in complaints.db.
+
+Complaint id -> shard lookups are remembered (LOCATION_CACHE_SIZE ids, LRU) and verified
+with one primary-key query on the remembered shard; only unknown or moved ids scatter.
+
+    python -m sharding migrate [--purge]    # split complaints.db into shards (idempotent)
+    python -m sharding rebalance            # move rows whose district no longer matches their shard
+    python -m sharding status
+"""
+import os
+import json
+import logging
+import threading
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from sqlalchemy import create_engine, select, delete, func, literal_column
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import sessionmaker
+
+logger = logging.getLogger(__name__)
+
+SHARDS_DIR = os.getenv("COMPLAINT_SHARDS_DIR") or None
+ENABLED = SHARDS_DIR is not None
+SCATTER_WORKERS = int(os.getenv("SHARD_SCATTER_WORKERS", "8"))
+UNASSIGNED = "_unassigned"
+BBOX_MARGIN = 0.01  # degrees; geocoded points can sit slightly outside the 동 polygons
+MOVE_BATCH = 5000
+LOCATION_CACHE_SIZE = int(os.getenv("SHARD_LOCATION_CACHE_SIZE", "100000"))
+CURSOR_KEEP = int(os.getenv("SHARD_CURSOR_KEEP", "10000"))
+_ROWID = literal_column("rowid")  # sqlite pseudo-column: stable batch order for copying
+
+
+class Shards:
+    def __init__(self, directory):
+        from agents.gazetteer import get_gazetteer
+
+        self.directory = Path(directory)
+        gazetteer = get_gazetteer()
+        self.districts = list(gazetteer.districts)
+        self._known = set(self.districts)
+        self.names = self.districts + [UNASSIGNED]
+        self.bounds = {}  # 구 -> (min_lat, min_lng, max_lat, max_lng) over its 동 polygons
+        for gu, _, _, (lat0, lng0, lat1, lng1) in gazetteer.dongs:
+            b = self.bounds.get(gu, (lat0, lng0, lat1, lng1))
+            self.bounds[gu] = (min(b[0], lat0), min(b[1], lng0), max(b[2], lat1), max(b[3], lng1))
+        self._engines = {}
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._locations = OrderedDict()  # complaint id -> shard name, least recently used first
+        self._pool = ThreadPoolExecutor(max_workers=SCATTER_WORKERS, thread_name_prefix="shard")
+
+    def name_for(self, district):
+        return district if district in self._known else UNASSIGNED
+
+    def engine(self, name):
+        with self._lock:
+            engine = self._engines.get(name)
+            if engine is None:
+                import metrics
+                import tracing
+                import profiling
+                from database import migrate_schema
+
+                self.directory.mkdir(parents=True, exist_ok=True)
+                engine = create_engine(f"sqlite:///{self.directory / name}.db", connect_args={"check_same_thread": False})
+                metrics.instrument_engine(engine)
+                tracing.instrument_engine(engine)
+                if profiling.ENABLED:
+                    profiling.instrument_engine(engine)
+                migrate_schema(engine)
+                self._engines[name] = engine
+                self._sessions[name] = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        return engine
+
+    def session(self, name):
+        self.engine(name)
+        return self._sessions[name]()
+
+    def for_bbox(self, bbox):
+        """Shards that can hold complaints inside (min_lat, min_lng, max_lat, max_lng)."""
+        min_lat, min_lng, max_lat, max_lng = bbox
+        names = [
+            gu for gu, (lat0, lng0, lat1, lng1) in self.bounds.items()
+            if lat0 - BBOX_MARGIN <= max_lat and min_lat <= lat1 + BBOX_MARGIN
+            and lng0 - BBOX_MARGIN <= max_lng and min_lng <= lng1 + BBOX_MARGIN
+        ]
+        return names + [UNASSIGNED]
+
+    def scatter(self, fn, names=None):
+        """fn(name, db) on each shard in parallel, each with its own session. Returns {name: result}."""
+        names = list(self.names if names is None else names)
+
+        def run(name):
+            db = self.session(name)
+            try:
+                return fn(name, db)
+            finally:
+                db.close()
+
+        # copy_context per task: spans and request-scoped metrics follow into the pool threads
+        futures = [self._pool.submit(contextvars.copy_context().run, run, name) for name in names]
+        return {name: future.result() for name, future in zip(names, futures)}
+
+    def remember(self, complaint_id, name):
+        with self._lock:
+            self._locations[complaint_id] = name
+            self._locations.move_to_end(complaint_id)
+            while len(self._locations) > LOCATION_CACHE_SIZE:
+                self._locations.popitem(last=False)
+
+    def locate(self, complaint_id):
+        """Name of the shard holding complaint_id, or None."""
+        from models import MockComplaint
+
+        def holds(name, db):
+            return db.execute(select(MockComplaint.id).where(MockComplaint.id == complaint_id)).first() is not None
+
+        with self._lock:
+            name = self._locations.get(complaint_id)
+        if name is not None:
+            db = self.session(name)
+            try:
+                if holds(name, db):
+                    self.remember(complaint_id, name)
+                    return name
+            finally:
+                db.close()
+        # Unknown, or moved by a rebalance since
+        found = self.scatter(holds)
+        name = next((name for name, hit in found.items() if hit), None)
+        if name is not None:
+            self.remember(complaint_id, name)
+        return name
+
+    def counts(self):
+        from models import MockComplaint
+        return self.scatter(lambda name, db: db.execute(select(func.count(MockComplaint.id))).scalar())
+
+
+# Singleton Instance (only when COMPLAINT_SHARDS_DIR is set)
+shards = None
+def get_shards():
+    global shards
+    if shards is None:
+        shards = Shards(SHARDS_DIR)
+    return shards
+
+
+@contextmanager
+def district_session(district):
+    """Session on the shard a complaint in `district` is written to."""
+    db = get_shards().session(get_shards().name_for(district))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@contextmanager
+def complaint_session(db, complaint_id):
+    """`db` itself, or a session on the shard holding complaint_id when sharding is on."""
+    name = get_shards().locate(complaint_id) if ENABLED else None
+    if name is None:
+        yield db
+        return
+    shard_db = get_shards().session(name)
+    try:
+        yield shard_db
+    finally:
+        shard_db.close()
+
+
+def scatter_complaints(db, fn, bbox=None):
+    """
+    [fn(db)] in the single-file layout; in sharded mode fn(shard_db) on every shard (only the
+    ones that can intersect `bbox` when given), in parallel. Callers merge the parts.
+    """
+    if not ENABLED:
+        return [fn(db)]
+    target = get_shards()
+    names = target.for_bbox(bbox) if bbox is not None else None
+    return list(target.scatter(lambda name, shard_db: fn(shard_db), names).values())
+
+
+def source_key(base, name):
+    """Per-shard key of a job cursor: "word_cloud" in the single-file layout, "word_cloud:<shard>" otherwise."""
+    return base if name is None else f"{base}:{name}"
+
+
+@contextmanager
+def complaint_sources(db):
+    """
+    [(shard name, session)] over every database holding complaints, for background jobs that
+    walk all of them: [(None, db)] in the single-file layout, else one session per shard.
+    """
+    if not ENABLED:
+        yield [(None, db)]
+        return
+    sessions = [(name, get_shards().session(name)) for name in get_shards().names]
+    try:
+        yield sessions
+    finally:
+        for _, session in sessions:
+            session.close()
+
+
+@contextmanager
+def complaints_by_source(db, complaint_ids):
+    """[(session, ids)]: complaint_ids grouped by the database holding them; ids found nowhere are left out."""
+    if not ENABLED:
+        yield [(db, list(complaint_ids))]
+        return
+    groups = {}
+    for complaint_id in complaint_ids:
+        name = get_shards().locate(complaint_id)
+        if name is not None:
+            groups.setdefault(name, []).append(complaint_id)
+    sessions = [(get_shards().session(name), ids) for name, ids in groups.items()]
+    try:
+        yield sessions
+    finally:
+        for session, _ in sessions:
+            session.close()
+
+
+# --- Change feed over shards ---
+
+def changes_since(db, since: int):
+    """
+    agents.complaint_changes.changes_since over every shard. Each shard logs its own seq, so the
+    returned cursor is the id of a ShardCursor row (in complaints.db) holding all of them.
+    """
+    from agents import complaint_changes
+    from models import ShardCursor
+
+    previous = None
+    if since > 0:
+        row = db.get(ShardCursor, since)
+        previous = json.loads(row.heads) if row is not None else None  # pruned: start over
+
+    def delta(name, shard_db):
+        head = complaint_changes.current_cursor(shard_db)
+        seq = None if previous is None else previous.get(name, 0)
+        if seq is None or (seq == 0 and head > 0):
+            return {"cursor": head, "reset": True}
+        if seq == head:
+            return {"cursor": head, "reset": False, "changed": [], "deleted": [], "previous": {}}
+        return complaint_changes.changes_since(shard_db, seq)
+
+    parts = get_shards().scatter(delta)
+    result = {"cursor": _intern_cursor(db, {name: part["cursor"] for name, part in parts.items()}),
+              "reset": any(part["reset"] for part in parts.values()), "changed": [], "deleted": [], "previous": {}}
+    if result["reset"]:
+        return result
+    changed = set()
+    for part in parts.values():
+        changed.update(part["changed"])
+        result["previous"].update(part["previous"])
+    # a rebalance logs a delete on the old shard and an insert on the new one
+    result["deleted"] = sorted({cid for part in parts.values() for cid in part["deleted"]} - changed)
+    result["changed"] = sorted(changed)
+    return result
+
+
+def _intern_cursor(db, heads):
+    """ShardCursor id for a {shard: seq} vector (one row per distinct vector); prunes old rows."""
+    from models import ShardCursor
+
+    key = json.dumps(heads, sort_keys=True, ensure_ascii=False)
+    db.execute(insert(ShardCursor).values(heads=key).on_conflict_do_nothing(index_elements=["heads"]))
+    cursor_id = db.execute(select(ShardCursor.id).where(ShardCursor.heads == key)).scalar()
+    db.execute(delete(ShardCursor).where(ShardCursor.id <= cursor_id - CURSOR_KEEP))
+    db.commit()
+    return cursor_id
+
+
+def fetch_changed(db, ids, columns):
+    """agents.complaint_changes.fetch_changed, over every shard when sharded."""
+    from agents import complaint_changes
+    return [row for part in scatter_complaints(db, lambda cdb: complaint_changes.fetch_changed(cdb, ids, columns)) for row in part]
+
+
+# --- Migration / rebalancing ---
+
+def _resolve_district(row):
+    """District of a row, geocoding it when the column is empty."""
+    if row["district"]:
+        return row["district"]
+    from agents.gazetteer import get_gazetteer
+    gazetteer = get_gazetteer()
+    district = gazetteer.district_of(row["lat"], row["lng"])
+    if district is None and row["location"]:
+        hit = gazetteer.forward(row["location"])
+        district = hit["district"] if hit else None
+    return district
+
+
+def _copy(rows, target_engine, table):
+    """Insert rows into a shard; rows already there are left alone, so reruns are safe."""
+    with target_engine.begin() as conn:
+        conn.execute(insert(table).on_conflict_do_nothing(index_elements=["id"]), rows)
+
+
+def migrate(source_engine, target: Shards, batch_size: int = MOVE_BATCH, purge: bool = False):
+    """Copy every complaint of the single-file layout into its district shard. Returns {shard: rows}."""
+    from models import MockComplaint
+
+    table = MockComplaint.__table__
+    copied = {}
+    last_rowid = 0
+    while True:
+        with source_engine.connect() as conn:
+            rows = conn.execute(
+                select(_ROWID.label("_rowid"), *table.columns)
+                .where(_ROWID > last_rowid).order_by(_ROWID).limit(batch_size)
+            ).mappings().all()
+        if not rows:
+            break
+        last_rowid = rows[-1]["_rowid"]
+        by_shard = {}
+        for row in rows:
+            data = {k: v for k, v in row.items() if k != "_rowid"}
+            data["district"] = _resolve_district(row) or row["district"]
+            by_shard.setdefault(target.name_for(data["district"]), []).append(data)
+        for name, shard_rows in by_shard.items():
+            _copy(shard_rows, target.engine(name), table)
+            copied[name] = copied.get(name, 0) + len(shard_rows)
+        logger.info(f"Migrated up to rowid {last_rowid}")
+
+    with source_engine.connect() as conn:
+        source_ids = conn.execute(select(func.count(table.c.id))).scalar()
+    sharded = sum(target.counts().values())
+    if sharded < source_ids:
+        raise RuntimeError(f"Shards hold {sharded} complaints, source has {source_ids}; not purging")
+    if purge:
+        with source_engine.begin() as conn:
+            conn.execute(delete(table))
+        logger.info(f"Purged {source_ids} complaints from the source database")
+    return copied
+
+
+def rebalance(target: Shards, batch_size: int = MOVE_BATCH):
+    """Move rows whose (possibly newly geocoded) district belongs to another shard. Returns moved count."""
+    from models import MockComplaint
+
+    table = MockComplaint.__table__
+    moved = 0
+    for name in target.names:
+        source = target.engine(name)
+        last_rowid = 0
+        while True:
+            with source.connect() as conn:
+                rows = conn.execute(
+                    select(_ROWID.label("_rowid"), *table.columns)
+                    .where(_ROWID > last_rowid).order_by(_ROWID).limit(batch_size)
+                ).mappings().all()
+            if not rows:
+                break
+            last_rowid = rows[-1]["_rowid"]
+            misplaced = {}
+            for row in rows:
+                district = _resolve_district(row)
+                owner = target.name_for(district)
+                if owner != name:
+                    data = {k: v for k, v in row.items() if k != "_rowid"}
+                    data["district"] = district
+                    misplaced.setdefault(owner, []).append(data)
+            for owner, shard_rows in misplaced.items():
+                _copy(shard_rows, target.engine(owner), table)  # copy first: a crash leaves a duplicate, never a loss
+                with source.begin() as conn:
+                    conn.execute(delete(table).where(table.c.id.in_([r["id"] for r in shard_rows])))
+                moved += len(shard_rows)
+                logger.info(f"Moved {len(shard_rows)} complaints {name} -> {owner}")
+    return moved
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Per-district complaint shards")
+    parser.add_argument("command", choices=("migrate", "rebalance", "status"))
+    parser.add_argument("--dir", default=SHARDS_DIR, help="shard directory (default: COMPLAINT_SHARDS_DIR)")
+    parser.add_argument("--batch-size", type=int, default=MOVE_BATCH)
+    parser.add_argument("--purge", action="store_true", help="migrate: delete complaints from complaints.db once copied")
+    args = parser.parse_args()
+    if not args.dir:
+        parser.error("set COMPLAINT_SHARDS_DIR or pass --dir")
+
+    logging.basicConfig(level=logging.INFO)
+    from database import engine, migrate_schema
+    migrate_schema()
+
+    target = Shards(args.dir)
+    if args.command == "migrate":
+        print(migrate(engine, target, args.batch_size, args.purge))
+    elif args.command == "rebalance":
+        moved = rebalance(target, args.batch_size)
+        print(f"Moved {moved} complaints")
+        if moved:  # moved rows got new rowids in their new shard: refold the pattern cube
+            from database import SessionLocal
+            from agents.pattern_mining import reset_cursors
+            db = SessionLocal()
+            try:
+                reset_cursors(db)
+            finally:
+                db.close()
+    for name, count in target.counts().items():
+        print(f"  {name:<12} {count:>10,}")
@@ -0,0 +1,29 @@
+import sys
+from pathlib import Path
+
+# Tests import backend modules the way the app does (run from backend/)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pytest
+from sqlalchemy import create_engine, text
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """A migrated, empty complaints database of its own."""
+    from database import migrate_schema
+    bind = create_engine(f"sqlite:///{tmp_path / 'complaints.db'}", connect_args={"check_same_thread": False})
+    migrate_schema(bind)
+    yield bind
+    bind.dispose()
+
+
+def insert_complaints(bind, n, start_index=0):
+    """n synthetic complaints (benchmarks/snapshot.py), ids bench-00000000..."""
+    from benchmarks.snapshot import synthetic_rows
+    with bind.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO mock_complaints (id, summary, original_text, location, district, category, lat, lng, "
+            "urgency_score, safety_risk_score, status, created_at) VALUES (:id, :summary, :original_text, :location, "
+            ":district, :category, :lat, :lng, :urgency, :safety, :status, :created_at)"
+        ), list(synthetic_rows(n, start_index)))
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, Overloaded, RoutePolicy, BACKGROUND, INTERACTIVE, URGENT
+
+
+def _controller(concurrency=1, queue=1, deadline=5.0):
+    return AdmissionController({"test": RoutePolicy("test", concurrency, queue, deadline)}, max_concurrency=4)
+
+
+def test_full_queue_sheds_and_higher_priority_preempts():
+    controller = _controller()
+
+    async def main():
+        release = asyncio.Event()
+
+        async def hold(priority):
+            async with controller.slot("test", priority):
+                await release.wait()
+
+        running = asyncio.ensure_future(hold(INTERACTIVE))
+        await asyncio.sleep(0)
+        queued = asyncio.ensure_future(hold(BACKGROUND))
+        await asyncio.sleep(0)
+
+        with pytest.raises(Overloaded) as refused:  # same priority as the queue: no room
+            await hold(BACKGROUND)
+        assert (refused.value.status_code, refused.value.reason) == (429, "queue_full")
+        assert refused.value.retry_after >= 1
+
+        urgent = asyncio.ensure_future(hold(URGENT))  # takes the background waiter's place
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as preempted:
+            await queued
+        assert (preempted.value.status_code, preempted.value.reason) == (503, "preempted")
+
+        release.set()
+        await asyncio.gather(running, urgent)
+
+    asyncio.run(main())
+    assert controller.in_flight["test"] == 0 and controller.waiting["test"] == 0
+    assert controller.shed == {("test", "background", "queue_full"): 1, ("test", "background", "preempted"): 1}
+
+
+def test_estimated_wait_beyond_deadline_is_refused_up_front():
+    controller = _controller(queue=8, deadline=1.0)
+    controller.service_seconds["test"] = 2.0
+
+    async def main():
+        release = asyncio.Event()
+
+        async def hold():
+            async with controller.slot("test"):
+                await release.wait()
+
+        running = asyncio.ensure_future(hold())
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as refused:
+            await hold()
+        release.set()
+        await running
+        return refused.value
+
+    refused = asyncio.run(main())
+    assert (refused.status_code, refused.reason) == (503, "deadline")
+    assert refused.retry_after == 4  # 2s service time x (1 running + this one) / concurrency 1
+
+
+def test_overrunning_work_is_cancelled_with_504():
+    controller = _controller(deadline=0.05)
+
+    async def main():
+        async with controller.slot("test"):
+            await asyncio.sleep(1)
+
+    with pytest.raises(Overloaded) as overran:
+        asyncio.run(main())
+    assert (overran.value.status_code, overran.value.reason) == (504, "deadline_exceeded")
+    assert controller.in_flight["test"] == 0
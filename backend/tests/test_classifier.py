@@ -0,0 +1,14 @@
+from agents.classifier import CONFIDENCE_THRESHOLD, LocalClassifier
+
+
+def test_obvious_complaints_stay_local_without_a_trained_model(tmp_path):
+    classifier = LocalClassifier(tmp_path / "missing.json")
+    for text, category in (("도로에 구멍이 났어요", "Road"), ("광안리 폭죽 소음 때문에 잠을 못 자요", "Environment")):
+        perception = classifier.perceive(text)
+        assert perception["category"] == category
+        assert perception["confidence"] >= CONFIDENCE_THRESHOLD
+
+
+def test_unmatched_text_goes_to_the_llm(tmp_path):
+    classifier = LocalClassifier(tmp_path / "missing.json")
+    assert classifier.perceive("공중화장실 문짝이 떨어졌어요")["confidence"] < CONFIDENCE_THRESHOLD
@@ -0,0 +1,56 @@
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from agents.complaint_changes import changes_since, compact_change_log, current_cursor
+from conftest import insert_complaints
+
+
+def _update(engine, statement):
+    with engine.begin() as conn:
+        conn.execute(text(statement))
+
+
+def test_cursor_delta_reports_changes_with_oldest_previous_values(engine):
+    insert_complaints(engine, 5)
+    with Session(engine) as db:
+        first = changes_since(db, 0)
+        assert first["reset"] and first["cursor"] == current_cursor(db) == 5
+
+        _update(engine, "UPDATE mock_complaints SET status = '처리중' WHERE id = 'bench-00000001'")
+        _update(engine, "UPDATE mock_complaints SET status = '처리완료' WHERE id = 'bench-00000001'")
+        _update(engine, "UPDATE mock_complaints SET updated_at = '2026-01-01' WHERE id = 'bench-00000002'")  # untracked
+        _update(engine, "DELETE FROM mock_complaints WHERE id = 'bench-00000003'")
+        insert_complaints(engine, 1, start_index=5)
+
+        delta = changes_since(db, first["cursor"])
+        assert not delta["reset"]
+        assert sorted(delta["changed"]) == ["bench-00000001", "bench-00000005"]
+        assert delta["deleted"] == ["bench-00000003"]
+        assert delta["previous"]["bench-00000001"] == {"status": "접수완료"}
+        assert delta["previous"]["bench-00000003"]["status"] == "접수완료"
+
+        again = changes_since(db, delta["cursor"])
+        assert not again["reset"] and again["changed"] == again["deleted"] == []
+        assert changes_since(db, delta["cursor"] + 1)["reset"]  # ahead of the head: table was rebuilt
+
+
+def test_compaction_folds_entries_and_resets_cursors_below_the_floor(engine):
+    insert_complaints(engine, 2)
+    with Session(engine) as db:
+        old_cursor = current_cursor(db)
+        insert_complaints(engine, 2, start_index=2)
+        _update(engine, "UPDATE mock_complaints SET status = '처리중' WHERE id = 'bench-00000000'")
+        _update(engine, "UPDATE mock_complaints SET category = '기타', status = '처리완료' WHERE id = 'bench-00000000'")
+        head = current_cursor(db)
+
+        assert compact_change_log(engine, max_rows=100) == {"folded": 2, "truncated": 0}
+        fields = db.execute(text("SELECT fields FROM complaint_changes WHERE seq = :seq"), {"seq": head}).scalar()
+        assert '"status": "접수완료"' in fields and '"category"' in fields
+
+        assert compact_change_log(engine, max_rows=2)["truncated"] > 0
+        assert db.execute(text("SELECT COUNT(*) FROM complaint_changes")).scalar() == 2
+        assert changes_since(db, old_cursor)["reset"]  # entries after it were dropped
+        assert not changes_since(db, old_cursor + 2)["reset"]  # at the floor: nothing lost
+        assert current_cursor(db) == head
+        latest = changes_since(db, head)
+        assert not latest["reset"] and latest["changed"] == []
@@ -0,0 +1,23 @@
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from agents.complaint_search import search_complaints
+
+
+def test_snippets_escape_stored_text(engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO mock_complaints (id, summary, original_text, location, status, created_at) "
+            "VALUES ('xss', '<b>보도블록</b> 파손', :body, '부산 수영구', '접수완료', '2025-01-01 10:00:00')"
+        ), {"body": '<img src=x onerror="alert(1)"> 보도블록이 깨져서 소음이 납니다'})
+    db = sessionmaker(bind=engine)()
+    try:
+        for query in ("보도블록", "소음"):  # FTS snippet()/highlight(), then the LIKE-only path
+            [item] = search_complaints(db, query)["items"]
+            for field in ("snippet", "summary_highlight"):
+                assert "<img" not in item[field] and "<b>" not in item[field]
+            assert "onerror=&quot;alert(1)&quot;&gt;" in item["snippet"]
+            assert f"<mark>{query}</mark>" in item["snippet"]
+        assert "<mark>보도블록</mark>" in search_complaints(db, "보도블록")["items"][0]["summary_highlight"]
+    finally:
+        db.close()
@@ -0,0 +1,64 @@
+from sqlalchemy import text
+
+from agents.complaint_changes import compact_change_log
+from agents.complaint_snapshot import ComplaintSnapshot
+from conftest import insert_complaints
+
+
+def _safety(snapshot, complaint_id):
+    view = snapshot.view()
+    position = view.ids(range(len(view))).index(complaint_id)
+    return int(view.cols["safety"][position])
+
+
+def _refresh(snapshot, engine):
+    with engine.connect() as conn:
+        return snapshot.refresh(conn)
+
+
+def test_refresh_folds_in_new_and_updated_rows(engine):
+    insert_complaints(engine, 50)
+    snapshot = ComplaintSnapshot()
+    assert _refresh(snapshot, engine) == (50, 0)
+
+    insert_complaints(engine, 5, start_index=50)
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE mock_complaints SET safety_risk_score = 10 WHERE id IN ('bench-00000003', 'bench-00000007')"))
+    assert _refresh(snapshot, engine) == (5, 2)
+    assert _safety(snapshot, "bench-00000003") == 10
+    assert _refresh(snapshot, engine) == (0, 0)
+
+
+def test_update_committed_after_a_refresh_is_not_lost(engine):
+    insert_complaints(engine, 10)
+    snapshot = ComplaintSnapshot()
+    _refresh(snapshot, engine)
+
+    writer = engine.connect()
+    try:
+        writer.execute(text("UPDATE mock_complaints SET safety_risk_score = 10, status = '처리완료' WHERE id = 'bench-00000004'"))
+        _refresh(snapshot, engine)  # runs while the update is still uncommitted
+        assert snapshot.view().decode("status", [4]) == ["접수완료"]
+        writer.commit()
+    finally:
+        writer.close()
+
+    assert _refresh(snapshot, engine) == (0, 1)
+    assert _safety(snapshot, "bench-00000004") == 10
+    assert snapshot.view().decode("status", [4]) == ["처리완료"]
+
+
+def test_cursor_below_the_compaction_floor_reloads(engine):
+    insert_complaints(engine, 20)
+    snapshot = ComplaintSnapshot()
+    _refresh(snapshot, engine)
+
+    with engine.begin() as conn:
+        for score in range(1, 6):
+            conn.execute(text("UPDATE mock_complaints SET safety_risk_score = :s WHERE id = 'bench-00000001'"), {"s": score})
+    compact_change_log(engine, max_rows=1)  # the update entry itself becomes the floor
+
+    appended, _ = _refresh(snapshot, engine)
+    assert appended == 20  # full reload
+    assert len(snapshot.view()) == 20
+    assert _safety(snapshot, "bench-00000001") == 5
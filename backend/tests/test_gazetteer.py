@@ -0,0 +1,22 @@
+from agents.gazetteer import get_gazetteer
+
+
+def test_district_starting_with_city_name():
+    for address in ("부산진구", "부산진구 서면", "부산진구 부전동"):
+        hit = get_gazetteer().forward(address)
+        assert hit is not None, address
+        assert hit["district"] == "부산진구"
+
+
+def test_city_prefix_before_district_starting_with_city_name():
+    for address in ("부산광역시 부산진구 서면", "부산 부산진구", "부산시 부산진구 부전동"):
+        hit = get_gazetteer().forward(address)
+        assert hit is not None, address
+        assert hit["district"] == "부산진구"
+    assert get_gazetteer().forward("부산광역시 부산진구 부전동")["dong"] == "부전동"
+
+
+def test_city_prefix_stripped():
+    hit = get_gazetteer().forward("부산광역시 수영구 광안동")
+    assert (hit["district"], hit["dong"]) == ("수영구", "광안동")
+    assert get_gazetteer().forward("부산") is None
@@ -0,0 +1,32 @@
+from agents.manual_index import ManualSearchEngine, build_index
+
+
+def _titles(hits):
+    return [hit["title"] for hit in hits]
+
+
+def test_reload_swaps_index_and_keeps_pinned_reader_open(tmp_path):
+    index_path = tmp_path / "manual_index.bin"
+    build_index([("도로 > 포트홀", "도로 파손 포트홀 긴급 보수"), ("환경 > 쓰레기", "무단 투기 쓰레기 수거")], index_path)
+    engine = ManualSearchEngine(index_path, tmp_path, check_interval=3600)
+    assert _titles(engine.search("포트홀 파손", top_k=1)) == ["도로 > 포트홀"]
+
+    old = engine._reader
+    assert old.acquire()  # a search still in flight on the old mapping
+    build_index([("안전 > 싱크홀", "싱크홀 도로 함몰 통제")], index_path)
+    new = engine.reload()
+    assert new is not old
+    assert _titles(engine.search("싱크홀")) == ["안전 > 싱크홀"]
+
+    assert not old._closed and _titles(old.search("포트홀", top_k=1)) == ["도로 > 포트홀"]
+    old.release()
+    assert old._closed and not old.acquire()
+
+
+def test_unchanged_index_is_not_remapped(tmp_path):
+    index_path = tmp_path / "manual_index.bin"
+    build_index([("도로 > 포트홀", "도로 파손 포트홀")], index_path)
+    engine = ManualSearchEngine(index_path, tmp_path, check_interval=0)
+    reader = engine.reload()
+    engine.search("포트홀")
+    assert engine.reload() is reader and reader._refs == 0 and not reader._closed
@@ -0,0 +1,15 @@
+import numpy as np
+
+from agents.pattern_mining import find_patterns
+
+
+def test_descriptions_escape_category_and_district():
+    # district 0 files its category almost only at 02:00, the rest of the city all day
+    cube = np.ones((2, 1, 1, 7, 24), dtype=np.int64)
+    cube[0, 0, 0, :, 2] = 20
+    findings = find_patterns(cube, ["<b>구</b>", "수영구"], ['<img src=x onerror="alert(1)">'])
+    assert findings
+    for finding in findings:
+        assert "<img" not in finding["description"] and "<b>" not in finding["description"]
+        assert "&lt;img src=x onerror=&quot;alert(1)&quot;&gt;" in finding["description"]
+        assert finding["description"].count("<span") == 1
@@ -0,0 +1,61 @@
+import asyncio
+
+import profiling
+
+
+def _scope(headers=()):
+    return {"type": "http", "method": "GET", "path": "/api/test", "headers": list(headers)}
+
+
+async def _receive():
+    return {"type": "http.request", "body": b""}
+
+
+def test_sampled_capture_skips_overlapping_requests(monkeypatch):
+    monkeypatch.setattr(profiling, "SLOW_MS", 1e9)
+    monkeypatch.setattr(profiling, "SLOW_SAMPLE_RATE", 1.0)
+    captures = []
+
+    async def app(scope, receive, send):
+        captures.append(profiling._capture.get())
+        await asyncio.sleep(0.01)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+
+    async def noop(message):
+        pass
+
+    async def main():
+        middleware = profiling.ProfilingMiddleware(app)
+        await asyncio.gather(*(middleware(_scope(), _receive, noop) for _ in range(3)))
+
+    asyncio.run(main())
+    assert [c.main is not None for c in captures] == [True, False, False]
+    assert captures[0].overlap == 2
+    assert profiling._in_flight == 0 and profiling._active is None
+
+
+def test_requested_profile_reports_overlap(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(profiling, "PROFILE_DIR", tmp_path)
+    started = []
+
+    async def app(scope, receive, send):
+        await asyncio.sleep(0.01)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+
+    async def main():
+        middleware = profiling.ProfilingMiddleware(app)
+        plain = asyncio.ensure_future(middleware(_scope(), _receive, lambda m: asyncio.sleep(0)))
+        await asyncio.sleep(0)
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                started.append(dict(message["headers"]))
+
+        await middleware(_scope([(b"x-profile", b"1"), (b"x-admin-token", b"secret")]), _receive, send)
+        await plain
+
+    asyncio.run(main())
+    assert started[0][b"x-profile-id"].startswith(b"req-")
+    assert started[0][b"x-profile-overlap"] == b"1"
+    assert (tmp_path / (started[0][b"x-profile-id"].decode() + ".pstats")).exists()
@@ -0,0 +1,72 @@
+import asyncio
+from collections import Counter
+
+import pytest
+from langgraph.graph import StateGraph, END
+
+from agents import context_analysis_agent
+from agents.analysis_checkpoints import SqliteCheckpointSaver
+from agents.context_analysis_agent import AnalysisState
+from agents.region_jobs import analysis_events, analysis_state, resume_config, run_config, run_status
+
+POLYGON = [[35.1, 129.0], [35.1, 129.1], [35.2, 129.1]]
+
+
+@pytest.fixture
+def calls(engine, monkeypatch):
+    """The analysis graph's shape over the real checkpointer, with stub nodes; `report` fails once."""
+    calls = Counter()
+
+    def node(name, update):
+        def run(state):
+            calls[name] += 1
+            if name == "report" and calls[name] == 1:
+                raise RuntimeError("model timed out")
+            return {**update, "node_timings": {name: 0.01}}
+        return run
+
+    workflow = StateGraph(AnalysisState)
+    workflow.add_node("retrieve", node("retrieve", {"complaint_ids": ["a", "b"]}))
+    workflow.add_node("analyze", node("analyze", {"semantic_context": "ctx", "themes": {"도로": ["포트홀"]}}))
+    workflow.add_node("report", node("report", {"final_report": "보고서"}))
+    workflow.set_entry_point("retrieve")
+    workflow.add_edge("retrieve", "analyze")
+    workflow.add_edge("analyze", "report")
+    workflow.add_edge("report", END)
+    monkeypatch.setattr(context_analysis_agent, "analysis_graph",
+                        workflow.compile(checkpointer=SqliteCheckpointSaver(engine)))
+    return calls
+
+
+async def _run(inputs, config):
+    return [event["node"] async for event in analysis_events(inputs, config)]
+
+
+def test_failed_run_resumes_at_the_failed_node(calls):
+    async def main():
+        with pytest.raises(RuntimeError):
+            await _run(analysis_state(POLYGON), run_config("run-1"))
+        status = await run_status("run-1")
+        assert not status["done"] and status["next"] == ["report"] and status["complaint_count"] == 2
+
+        assert await _run(None, await resume_config("run-1", None)) == ["report"]
+        return await run_status("run-1")
+
+    status = asyncio.run(main())
+    assert calls == {"retrieve": 1, "analyze": 1, "report": 2}
+    assert status["done"] and status["result"]["report"] == "보고서"
+
+
+def test_resume_from_node_reruns_it_and_the_nodes_after(calls):
+    async def main():
+        with pytest.raises(RuntimeError):
+            await _run(analysis_state(POLYGON), run_config("run-2"))
+        await _run(None, await resume_config("run-2", None))
+
+        assert await _run(None, await resume_config("run-2", None, from_node="analyze")) == ["analyze", "report"]
+        with pytest.raises(ValueError):
+            await resume_config("run-2", None, from_node="missing")
+        assert await run_status("unknown-run") is None
+
+    asyncio.run(main())
+    assert calls == {"retrieve": 1, "analyze": 2, "report": 3}
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from agents.scoring_pipeline import MAX_TOTAL_ATTEMPTS, claim_batch, enqueue_stale, recover_expired
+from conftest import insert_complaints
+from models import ScoringJob
+
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def _jobs(db):
+    return {job.complaint_id: job for job in db.query(ScoringJob).populate_existing()}
+
+
+def test_expired_lease_goes_back_to_pending(db, engine):
+    insert_complaints(engine, 3)
+    assert enqueue_stale(db, "m:v1") == 3
+    leased = claim_batch(db, "dead-worker", size=2)
+    assert len(leased) == 2
+    assert recover_expired(db) == 0  # leases still valid
+
+    for job in leased:
+        job.lease_until = datetime.now() - timedelta(seconds=1)
+    db.commit()
+    assert recover_expired(db) == 2
+    jobs = _jobs(db)
+    assert all(job.status == "pending" and job.worker_id is None for job in jobs.values())
+    assert {job.complaint_id for job in claim_batch(db, "live-worker", size=3)} == set(jobs)
+
+
+def test_enqueue_retries_failed_jobs_below_the_limit(db, engine):
+    insert_complaints(engine, 4)
+    enqueue_stale(db, "m:v1")
+    jobs = _jobs(db)
+    statuses = {"bench-00000000": ("running", 1), "bench-00000001": ("done", 1),
+                "bench-00000002": ("failed", 3), "bench-00000003": ("failed", MAX_TOTAL_ATTEMPTS)}
+    for complaint_id, (status, attempts) in statuses.items():
+        jobs[complaint_id].status, jobs[complaint_id].attempts = status, attempts
+    db.commit()
+
+    assert enqueue_stale(db, "m:v1") == 1
+    jobs = _jobs(db)
+    assert jobs["bench-00000002"].status == "pending" and jobs["bench-00000002"].attempts == 3
+    assert [jobs[c].status for c in ("bench-00000000", "bench-00000001", "bench-00000003")] == ["running", "done", "failed"]
+    assert enqueue_stale(db, "m:v1") == 0
@@ -0,0 +1,19 @@
+import json
+
+import tracing
+
+
+def test_export_writes_one_otlp_request_per_trace(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing, "exporter", tracing.JsonLinesExporter(tmp_path / "traces.jsonl"))
+    with tracing.start_trace("GET /api/map/items", traceparent=f"00-{'a' * 32}-{'b' * 16}-01", **{"http.status_code": 200}):
+        with tracing.span("db.query", **{"db.rows": 3}):
+            pass
+
+    [line] = (tmp_path / "traces.jsonl").read_text(encoding="utf-8").splitlines()
+    [resource_spans] = json.loads(line)["resourceSpans"]
+    assert resource_spans["resource"]["attributes"] == [{"key": "service.name", "value": {"stringValue": tracing.SERVICE_NAME}}]
+    [scope_spans] = resource_spans["scopeSpans"]
+    child, root = scope_spans["spans"]
+    assert "resource" not in root and root["traceId"] == child["traceId"] == "a" * 32
+    assert child["parentSpanId"] == root["spanId"]
+    assert {"key": "db.rows", "value": {"intValue": "3"}} in child["attributes"]
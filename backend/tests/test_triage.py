@@ -0,0 +1,67 @@
+import threading
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+import agents.triage as triage
+from agents.triage import STATUS_IN_PROGRESS, UNASSIGNED, TriageQueues
+from conftest import insert_complaints
+
+
+@pytest.fixture
+def queues(engine):
+    insert_complaints(engine, 20)
+    return TriageQueues(sessionmaker(bind=engine))
+
+
+def test_concurrent_claims_never_share_a_complaint(queues):
+    claimed, barrier = [], threading.Barrier(8)
+
+    def worker(n):
+        db = queues.session_factory()
+        try:
+            barrier.wait()
+            claimed.append(queues.claim(db, UNASSIGNED, f"worker-{n}")["id"])
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(claimed)) == 8
+    assert queues.departments() == {UNASSIGNED: 12}
+
+
+def test_claim_skips_a_complaint_claimed_by_another_process(queues, engine):
+    db = queues.session_factory()
+    try:
+        top = queues.peek(UNASSIGNED, 2)
+        with engine.begin() as conn:
+            conn.execute(text("UPDATE mock_complaints SET status = :s WHERE id = :id"), {"s": STATUS_IN_PROGRESS, "id": top[0]["id"]})
+        assert queues.claim(db, UNASSIGNED, "me")["id"] == top[1]["id"]
+        assert queues.departments() == {UNASSIGNED: 18}
+    finally:
+        db.close()
+
+
+def test_failed_claim_puts_the_complaint_back(queues, monkeypatch):
+    @contextmanager
+    def locked(db, complaint_id):
+        raise OperationalError("UPDATE", {}, Exception("database is locked"))
+        yield
+
+    db = queues.session_factory()
+    try:
+        top = queues.peek(UNASSIGNED, 1)[0]
+        monkeypatch.setattr(triage, "complaint_session", locked)
+        with pytest.raises(OperationalError):
+            queues.claim(db, UNASSIGNED, "me")
+        assert queues.peek(UNASSIGNED, 1)[0]["id"] == top["id"]
+        assert queues.departments() == {UNASSIGNED: 20}
+    finally:
+        db.close()
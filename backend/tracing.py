@@ -0,0 +1,294 @@
+"""
+Lightweight request-scoped tracing.
+
+Spans follow the current trace through a ContextVar (works across awaits, threadpool
+endpoints and LangGraph's executor) and are written to a local JSON-lines file, one OTLP/JSON
+ExportTraceServiceRequest per line ({"resourceSpans": [{"resource", "scopeSpans": [{"scope",
+"spans"}]}]}), so a line can be POSTed as-is to a collector's /v1/traces. Unsampled requests
+get a shared no-op span, so the hot path only pays for one ContextVar lookup.
+
+Config:
+    TRACE_SAMPLE_RATE   fraction of root requests to trace (default 0 = only forced)
+    TRACE_EXPORT_PATH   output file (default ./traces.jsonl)
+    An incoming W3C `traceparent` header with the sampled flag always forces tracing.
+"""
+import os
+import json
+import time
+import random
+import asyncio
+import functools
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+SERVICE_NAME = "busan-complaint-backend"
+SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "traces.jsonl")
+
+# OTLP span kinds / status codes
+KIND_INTERNAL, KIND_SERVER, KIND_CLIENT = 1, 2, 3
+STATUS_UNSET, STATUS_OK, STATUS_ERROR = 0, 1, 2
+
+_current_span: ContextVar = ContextVar("current_span", default=None)
+
+
+def _attr_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_span_id", "name", "kind", "start_ns", "end_ns", "attributes", "status", "status_message", "is_root")
+    sampled = True
+
+    def __init__(self, name, trace_id, parent_span_id=None, kind=KIND_INTERNAL, attributes=None, is_root=False):
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_span_id = parent_span_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes) if attributes else {}
+        self.status = STATUS_UNSET
+        self.status_message = ""
+        self.is_root = is_root
+
+    def set_attribute(self, key, value):
+        if value is not None:
+            self.attributes[key] = value
+
+    def record_exception(self, exc):
+        self.status = STATUS_ERROR
+        self.status_message = f"{type(exc).__name__}: {exc}"
+
+    def end(self):
+        self.end_ns = time.time_ns()
+        exporter.export(self)
+
+    def to_otlp(self):
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": k, "value": _attr_value(v)} for k, v in self.attributes.items()],
+            "status": {"code": self.status, "message": self.status_message} if self.status else {"code": STATUS_UNSET},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        return span
+
+
+def otlp_request(spans):
+    """OTLP/JSON ExportTraceServiceRequest for finished spans (one resource, one scope)."""
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": _attr_value(SERVICE_NAME)}]},
+        "scopeSpans": [{"scope": {"name": __name__}, "spans": [s.to_otlp() for s in spans]}],
+    }]}
+
+
+class _NoopSpan:
+    sampled = False
+    trace_id = None
+    span_id = None
+
+    def set_attribute(self, key, value):
+        pass
+
+    def record_exception(self, exc):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class JsonLinesExporter:
+    """Buffers finished spans and appends them as one OTLP request line when a trace's root span ends."""
+
+    def __init__(self, path, max_buffer=512):
+        self.path = path
+        self.max_buffer = max_buffer
+        self._buffer = []
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        with self._lock:
+            self._buffer.append(span)
+            if not (span.is_root or len(self._buffer) >= self.max_buffer):
+                return
+            spans, self._buffer = self._buffer, []
+        line = json.dumps(otlp_request(spans), ensure_ascii=False) + "\n"
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+exporter = JsonLinesExporter(EXPORT_PATH)
+
+
+def current_trace_id():
+    span = _current_span.get()
+    return span.trace_id if span is not None and span.sampled else None
+
+
+def _parse_traceparent(header):
+    """W3C traceparent: 00-<trace_id>-<parent_id>-<flags>"""
+    try:
+        version, trace_id, parent_id, flags = header.strip().split("-")
+        if len(trace_id) == 32 and len(parent_id) == 16:
+            return trace_id, parent_id, bool(int(flags, 16) & 1)
+    except (AttributeError, ValueError):
+        pass
+    return None
+
+
+@contextmanager
+def start_trace(name, traceparent=None, kind=KIND_SERVER, **attributes):
+    """Root span for an entry point (HTTP request, CLI job). Makes the sampling decision."""
+    parsed = _parse_traceparent(traceparent) if traceparent else None
+    if parsed:
+        trace_id, parent_id, sampled = parsed
+    else:
+        trace_id, parent_id = None, None
+        sampled = SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE
+
+    if not sampled:
+        token = _current_span.set(NOOP_SPAN)
+        try:
+            yield NOOP_SPAN
+        finally:
+            _current_span.reset(token)
+        return
+
+    root = Span(name, trace_id or f"{random.getrandbits(128):032x}", parent_id, kind, attributes, is_root=True)
+    token = _current_span.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.record_exception(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        root.end()
+
+
+@contextmanager
+def span(name, kind=KIND_INTERNAL, **attributes):
+    """Child span of the current one; a no-op outside a sampled trace."""
+    parent = _current_span.get()
+    if parent is None or not parent.sampled:
+        yield NOOP_SPAN
+        return
+
+    child = Span(name, parent.trace_id, parent.span_id, kind, attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.record_exception(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        child.end()
+
+
+def set_llm_usage(llm_span, usage):
+    if not llm_span.sampled or usage is None:
+        return
+    from metrics import token_counts
+    prompt, completion = token_counts(usage)
+    llm_span.set_attribute("llm.usage.prompt_tokens", prompt)
+    llm_span.set_attribute("llm.usage.completion_tokens", completion)
+
+
+def traced_node(graph: str, node: str, fn):
+    """Wrap a LangGraph node function in a span (signature preserved for config injection)."""
+    if asyncio.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(state, *args, **kwargs):
+            with span(f"{graph}.{node}", **{"graph.name": graph, "graph.node": node}):
+                return await fn(state, *args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(state, *args, **kwargs):
+        with span(f"{graph}.{node}", **{"graph.name": graph, "graph.node": node}):
+            return fn(state, *args, **kwargs)
+    return wrapper
+
+
+def instrument_engine(engine):
+    """One CLIENT span per SQL statement while a sampled trace is active."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        parent = _current_span.get()
+        if parent is None or not parent.sampled:
+            conn.info.setdefault("trace_spans", []).append(None)
+            return
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement else "OTHER"
+        conn.info.setdefault("trace_spans", []).append(Span(
+            f"db.{operation.lower()}", parent.trace_id, parent.span_id, KIND_CLIENT,
+            {"db.system": "sqlite", "db.operation": operation, "db.statement": statement[:500]},
+        ))
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get("trace_spans")
+        if spans:
+            db_span = spans.pop()
+            if db_span is not None:
+                db_span.end()
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        spans = conn.info.get("trace_spans") if conn is not None else None
+        if spans:
+            db_span = spans.pop()
+            if db_span is not None:
+                db_span.record_exception(exception_context.original_exception)
+                db_span.end()
+
+
+class TracingMiddleware:
+    """Root span per HTTP request; echoes the trace id back as X-Trace-Id when sampled."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        traceparent = None
+        for key, value in scope.get("headers", ()):
+            if key == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+
+        with start_trace(f"{scope['method']} {scope['path']}", traceparent, **{"http.method": scope["method"], "http.target": scope["path"]}) as root:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start" and root.sampled:
+                    root.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        root.status = STATUS_ERROR
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [(b"x-trace-id", root.trace_id.encode())]
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
+            route = getattr(scope.get("route"), "path", None)
+            if route and root.sampled:
+                # Rename to the route template once routing has resolved it
+                root.name = f"{scope['method']} {route}"
+                root.set_attribute("http.route", route)